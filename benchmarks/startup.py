@@ -0,0 +1,64 @@
+'''Measures cold start of the CLI: a new process importing main.py, and converting a small image with a warm palette cache.
+Exits with an error if the median time goes over --max_seconds, so it can be run as a regression check.
+
+python benchmarks/startup.py --runs 10 --max_seconds 1.5'''
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["moviepy", "scipy", "requests", "tqdm", "mcschematic"]
+
+def time_command(command, runs: int) -> float:
+	'''Returns median wall time of running command in a new process.'''
+	times = list()
+	for _ in range(runs):
+		start = time.perf_counter()
+		subprocess.run(command, cwd=ROOT, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+		times.append(time.perf_counter() - start)
+	return statistics.median(times)
+
+def get_imported_heavy_modules() -> list:
+	'''Returns heavy modules that get imported by importing main.py.'''
+	code = f"import sys; sys.argv = ['main.py']; import main; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+	output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True).stdout
+	return output.split()
+
+def main():
+	parser = argparse.ArgumentParser(description='CLI startup benchmark')
+	parser.add_argument('--runs', type=int, default=5, help='Amount of runs, median is reported')
+	parser.add_argument('--max_seconds', type=float, default=None, help='Fail if converting the small image takes longer than this')
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as folder:
+		image_path = os.path.join(folder, "small.png")
+		output_path = os.path.join(folder, "small_out.png")
+		Image.fromarray(np.random.default_rng(0).integers(0, 256, (64, 64, 3), dtype=np.uint8)).save(image_path)
+
+		main_py = os.path.join(ROOT, "main.py")
+		# Fills the palette cache, so the runs below measure the startup of the usual case
+		subprocess.run([sys.executable, main_py, image_path, output_path], cwd=ROOT, check=True, stderr=subprocess.DEVNULL)
+
+		results = {
+			"import": time_command([sys.executable, "-c", "import sys; sys.argv = ['main.py']; import main"], args.runs),
+			"help": time_command([sys.executable, main_py, "-h"], args.runs),
+			"convert 64x64 png": time_command([sys.executable, main_py, image_path, output_path], args.runs),
+		}
+
+	for name, seconds in results.items():
+		print(f"{name:<20} {seconds * 1000:8.1f} ms")
+	heavy = get_imported_heavy_modules()
+	print(f"heavy modules imported by main.py: {', '.join(heavy) or 'none'}")
+
+	if args.max_seconds is not None and results["convert 64x64 png"] > args.max_seconds:
+		sys.exit(f"Startup regression: converting took {results['convert 64x64 png']:.2f} s, over {args.max_seconds} s")
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,284 @@
+'''Benchmark suite of the conversion pipeline, on synthetic images and frames, so results are reproducible on any machine.
+Measures palette building, every matching method (with a cold and a warm lookup table), Launch.get_blocks_2d_matrix,
+Launch.convert_image, schematic writing and video frame conversion, at several resolutions, compression levels and palette sizes.
+
+Every result holds median time, throughput, peak RSS and lookup table hit rate (fraction of lookups answered without matching).
+
+python benchmarks/suite.py --output results.json
+python benchmarks/suite.py --compare results.json --tolerance 0.15'''
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+from typing import Any, Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Atlas files are found relative to the working directory
+os.chdir(ROOT)
+
+import numpy as np
+from PIL import Image
+
+from main import Launch
+from src import find_closest
+from src import palette_cache
+from src import generate_schematic
+from src.convert_video import TemporalFrameConverter
+from src.utils import get_chunk_medians, resource_path
+
+FILTER = ["white_wool", "orange_wool", "magenta_wool", "light_blue_wool", "yellow_wool", "lime_wool", "pink_wool", "gray_wool",
+	"light_gray_wool", "cyan_wool", "purple_wool", "blue_wool", "brown_wool", "green_wool", "red_wool", "black_wool"]
+PALETTES = {"full": None, "wool": FILTER}
+PNG_ATLAS_FILENAME = resource_path("minecraft_textures_atlas_blocks.png_0.png")
+TXT_ATLAS_FILENAME = resource_path("minecraft_textures_atlas_blocks.png.txt")
+
+def make_image(width: int, height: int, seed: int = 0, shift: float = 0.0) -> np.ndarray:
+	'''Returns (height, width, 3) image of smooth color gradients with some noise, so chunk medians are spread over many colors.
+	shift moves the gradients, for consecutive frames of a video.'''
+	rng = np.random.default_rng(seed)
+	y, x = np.mgrid[0:height, 0:width].astype(np.float64)
+	channels = list()
+	for phase in rng.uniform(0, 2 * np.pi, 3):
+		frequency = rng.uniform(2, 6)
+		channels.append(np.sin(frequency * np.pi * (x + shift) / width + phase) * np.cos(frequency * np.pi * y / height - phase))
+	image = (np.stack(channels, axis=2) + 1) * 110 + rng.normal(0, 8, (height, width, 3))
+	return np.clip(image, 0, 255).astype(np.uint8)
+
+def reset_peak_rss() -> None:
+	'''Resets peak RSS of this process where the OS allows it (Linux), otherwise peak RSS is the peak of the whole run.'''
+	try:
+		with open("/proc/self/clear_refs", "w") as f:
+			f.write("5")
+	except OSError:
+		pass
+
+def get_peak_rss_mb() -> float:
+	try:
+		with open("/proc/self/status", "r") as f:
+			for line in f:
+				if line.startswith("VmHWM:"):
+					return int(line.split()[1]) / 1024
+	except OSError:
+		pass
+	import resource
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# Bytes on macOS, kilobytes everywhere else
+	return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+class Suite:
+	def __init__(self, repeat: int = 3) -> None:
+		self.repeat = repeat
+		self.results: List[Dict[str, Any]] = list()
+
+	def measure(self, name: str, params: Dict[str, Any], function: Callable[[Any], Any], amount: int, unit: str,
+			setup: Callable[[], Any] = None, method_settings: Callable[[Any], find_closest.Method] = None) -> Dict[str, Any]:
+		'''Runs function(setup()) repeat times, and records median time, throughput of amount units, and peak RSS.
+		method_settings returns the Method used by a run, to record the fraction of its lookups answered by the lookup table,
+		from its lut_hits and lut_misses counters.'''
+		times = list()
+		peaks = list()
+		hit_rates = list()
+		for _ in range(self.repeat):
+			state = setup() if setup is not None else None
+			if method_settings:
+				hits, misses = method_settings(state).lut_hits, method_settings(state).lut_misses
+			reset_peak_rss()
+			start = time.perf_counter()
+			function(state)
+			times.append(time.perf_counter() - start)
+			peaks.append(get_peak_rss_mb())
+			if method_settings:
+				hits = method_settings(state).lut_hits - hits
+				misses = method_settings(state).lut_misses - misses
+				if hits + misses:
+					hit_rates.append(hits / (hits + misses))
+
+		seconds = statistics.median(times)
+		result = {
+			"name": name,
+			"params": params,
+			"seconds": seconds,
+			"throughput": amount / seconds if seconds else float("inf"),
+			"unit": unit,
+			"peak_rss_mb": max(peaks),
+			"lut_hit_rate": statistics.mean(hit_rates) if hit_rates else None,
+		}
+		self.results.append(result)
+		print(format_result(result), flush=True)
+		return result
+
+def get_key(result: Dict[str, Any]) -> str:
+	return result["name"] + " " + " ".join(f"{key}={value}" for key, value in sorted(result["params"].items()))
+
+def format_result(result: Dict[str, Any]) -> str:
+	hit_rate = "" if result["lut_hit_rate"] is None else f"  hit {result['lut_hit_rate']:6.1%}"
+	return (f"{get_key(result):<70} {result['seconds'] * 1000:10.2f} ms  {result['throughput']:12.1f} {result['unit']:<9}"
+		f"  {result['peak_rss_mb']:7.1f} MB{hit_rate}")
+
+def bench_palettes(suite: Suite) -> None:
+	for palette_name, filter in PALETTES.items():
+		with tempfile.TemporaryDirectory() as cache_folder:
+			load = lambda _: palette_cache.load_palette(cache_folder, PNG_ATLAS_FILENAME, TXT_ATLAS_FILENAME, filter)
+			blocks = len(load(None).names)
+			suite.measure("palette/build", {"palette": palette_name}, load, blocks, "blocks/s",
+				setup=lambda: shutil.rmtree(cache_folder, ignore_errors=True))
+			suite.measure("palette/load", {"palette": palette_name}, load, blocks, "blocks/s")
+
+def bench_methods(suite: Suite, launches: Dict[str, Launch], sizes: List[int], compression_levels: List[int], methods: List[str]) -> None:
+	for size in sizes:
+		medians = get_chunk_medians(make_image(size, size))
+		chunks = medians.shape[0] * medians.shape[1]
+		for palette_name, launch in launches.items():
+			for compression_level in compression_levels:
+				for method in methods:
+					params = {"size": size, "palette": palette_name, "compression": compression_level, "method": method}
+					new_method = lambda: find_closest.Method(launch.blocks, compression_level)
+					suite.measure("match/cold", params, lambda method_settings: method_settings.find_closest_blocks(medians, method),
+						chunks, "chunks/s", setup=new_method, method_settings=lambda state: state)
+
+					warm = new_method()
+					warm.find_closest_blocks(medians, method)
+					suite.measure("match/warm", params, lambda _: warm.find_closest_blocks(medians, method),
+						chunks, "chunks/s", method_settings=lambda _: warm)
+
+def bench_pipeline(suite: Suite, launches: Dict[str, Launch], sizes: List[int], compression_levels: List[int]) -> None:
+	for size in sizes:
+		image = Image.fromarray(make_image(size, size))
+		chunks = (size // 16) ** 2
+		for palette_name, base_launch in launches.items():
+			for compression_level in compression_levels:
+				launch = get_launch(base_launch, compression_level)
+				params = {"size": size, "palette": palette_name, "compression": compression_level, "method": launch.method_name}
+				reset = launch.method_settings.luts.clear
+				suite.measure("pipeline/get_blocks_2d_matrix", params, lambda _: launch.get_blocks_2d_matrix(image),
+					chunks, "chunks/s", setup=reset, method_settings=lambda _: launch.method_settings)
+				suite.measure("pipeline/convert_image", params, lambda _: launch.convert_image(image),
+					chunks, "chunks/s", setup=reset, method_settings=lambda _: launch.method_settings)
+
+				if compression_level == compression_levels[0]:
+					index_matrix = launch.get_blocks_index_matrix(image)
+					with tempfile.TemporaryDirectory() as folder:
+						path = os.path.join(folder, "output.schem")
+						suite.measure("schematic/write", {"size": size, "palette": palette_name},
+							lambda _: generate_schematic.write_2d_schematic(index_matrix, launch.method_settings.names, path),
+							chunks * 2, "blocks/s")
+
+def bench_video(suite: Suite, launches: Dict[str, Launch], compression_levels: List[int], frames_count: int = 24, size: int = 256) -> None:
+	'''Converts frames of a small synthetic video with a moving gradient, without encoding it, so only conversion is measured.'''
+	frames = [make_image(size, size, shift=frame * 4) for frame in range(frames_count)]
+	for palette_name, base_launch in launches.items():
+		for compression_level in compression_levels:
+			launch = get_launch(base_launch, compression_level)
+			params = {"size": size, "frames": frames_count, "palette": palette_name, "compression": compression_level}
+
+			def convert_all(_):
+				for frame in frames:
+					launch.convert_image(Image.fromarray(frame))
+			suite.measure("video/frames", params, convert_all, frames_count, "frames/s",
+				setup=launch.method_settings.luts.clear, method_settings=lambda _: launch.method_settings)
+
+			converters = list()
+			def new_converter():
+				launch.method_settings.luts.clear()
+				converters.append(TemporalFrameConverter(launch, 0))
+				return converters[-1]
+			def convert_temporal(converter):
+				for frame in frames:
+					converter.convert_frame(frame)
+			result = suite.measure("video/temporal", params, convert_temporal, frames_count, "frames/s",
+				setup=new_converter, method_settings=lambda _: launch.method_settings)
+			result["reused_fraction"] = converters[-1].reused_fraction
+
+def bench_pruning(suite: Suite, launch: Launch, sizes: List[int], tolerances: List[int], clusters: List[int]) -> None:
+	'''Matches with deduplicated palettes and cluster levels, with a cold lookup table, against the full palette compared exactly.
+	Quality is the fraction of chunks that got a block of the same color as the exact match, and the mean sum of absolute RGB differences
+	between chunk medians and their blocks.'''
+	configs = [(None, 0)] + [(tolerance, 0) for tolerance in tolerances] + [(None, k) for k in clusters] + [(tolerances[-1], clusters[-1])]
+	for size in sizes:
+		medians = get_chunk_medians(make_image(size, size))
+		colors = medians.reshape(-1, 3).astype(np.float64)
+		chunks = len(colors)
+		for method in find_closest.CLUSTERED_METHODS:
+			exact = None
+			for tolerance, k in configs:
+				palette = launch.palette if tolerance is None else launch.palette.deduplicate(tolerance)
+				new_method = lambda: find_closest.Method(palette.to_blocks(), 0, clusters=k)
+				params = {"size": size, "method": method, "tolerance": tolerance, "clusters": k, "blocks": len(palette.names)}
+				result = suite.measure("pruning/match", params, lambda method_settings: method_settings.find_closest_blocks(medians, method),
+					chunks, "chunks/s", setup=new_method)
+
+				method_settings = new_method()
+				matched = method_settings.palette[method_settings.find_closest_blocks(colors, method)]
+				if exact is None:
+					exact = matched
+				result["same_fraction"] = float(np.mean((matched == exact).all(axis=1)))
+				result["mean_error"] = float(np.abs(matched - colors).sum(axis=1).mean())
+				print(f"{'':<70} same {result['same_fraction']:6.1%}  error {result['mean_error']:6.2f}", flush=True)
+
+def get_launch(launch: Launch, compression_level: int) -> Launch:
+	'''Returns launch with its own Method for compression_level, sharing the palette.'''
+	copy = Launch.__new__(Launch)
+	copy.__dict__.update(launch.__dict__)
+	copy.method_settings = find_closest.Method(launch.blocks, compression_level)
+	return copy
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> bool:
+	'''Prints time of every result relative to the baseline, and returns False if any got slower by more than tolerance.'''
+	with open(baseline_path, "r") as f:
+		baseline = {get_key(result): result for result in json.load(f)["results"]}
+
+	ok = True
+	print(f"\nCompared with {baseline_path} (tolerance {tolerance:.0%}):")
+	for result in results:
+		key = get_key(result)
+		if key not in baseline:
+			continue
+		ratio = result["seconds"] / baseline[key]["seconds"]
+		status = "slower" if ratio > 1 + tolerance else "faster" if ratio < 1 - tolerance else ""
+		ok = ok and status != "slower"
+		print(f"{key:<70} {ratio:6.2f}x  {status}")
+	return ok
+
+def main():
+	parser = argparse.ArgumentParser(description='Conversion pipeline benchmark suite')
+	parser.add_argument('--sizes', type=int, nargs='+', default=[256, 1024], help='Width and height of synthetic images')
+	parser.add_argument('--compression_levels', type=int, nargs='+', default=[0, 16], help='Compression levels to measure')
+	parser.add_argument('--methods', type=str, nargs='+', default=find_closest.METHODS, choices=find_closest.METHODS, help='Matching methods to measure')
+	parser.add_argument('--only', type=str, nargs='+', default=["palette", "match", "pipeline", "video", "pruning"], choices=["palette", "match", "pipeline", "video", "pruning"], help='Groups of benchmarks to run')
+	parser.add_argument('--tolerances', type=int, nargs='+', default=[0, 8], help='Palette deduplication tolerances to measure')
+	parser.add_argument('--clusters', type=int, nargs='+', default=[16, 32], help='Amounts of palette clusters to measure')
+	parser.add_argument('--repeat', type=int, default=3, help='Runs of every benchmark, median time is reported')
+	parser.add_argument('--output', type=str, default=None, help='Write results to this JSON file')
+	parser.add_argument('--compare', type=str, default=None, help='JSON results of a previous run to compare against, exits with an error on regressions')
+	parser.add_argument('--tolerance', type=float, default=0.15, help='Allowed slowdown relative to --compare results')
+	args = parser.parse_args()
+
+	suite = Suite(args.repeat)
+	if "palette" in args.only:
+		bench_palettes(suite)
+	launches = {name: Launch(filter) for name, filter in PALETTES.items()}
+	if "match" in args.only:
+		bench_methods(suite, launches, args.sizes, args.compression_levels, args.methods)
+	if "pipeline" in args.only:
+		bench_pipeline(suite, launches, args.sizes, args.compression_levels)
+	if "video" in args.only:
+		bench_video(suite, launches, args.compression_levels)
+	if "pruning" in args.only:
+		bench_pruning(suite, launches["full"], args.sizes, args.tolerances, args.clusters)
+
+	if args.output:
+		with open(args.output, "w") as f:
+			json.dump({"python": platform.python_version(), "numpy": np.__version__, "machine": platform.platform(),
+				"results": suite.results}, f, indent=1)
+
+	if args.compare and not compare(suite.results, args.compare, args.tolerance):
+		sys.exit("Some benchmarks got slower than the baseline")
+
+if __name__ == "__main__":
+	main()
@@ -1,52 +1,91 @@
 import os
-import json
-import pathlib
-from typing import List, Literal, Dict
+import time
+import multiprocessing
+from typing import Dict, List, Literal, Tuple, Union
 
 import argparse
-import moviepy.editor as mp
+import numpy as np
 from PIL import Image
-from tqdm import tqdm
 
-from src import calculate_minecraft_blocks_median
 from src import download
-from src import convert_video
-from src.utils import is_video_file, resource_path, get_execution_folder, crop_to_make_divisible, resize_image
-from src import generate_schematic
+from src.utils import is_video_file, resource_path, get_execution_folder, crop_to_make_divisible, resize_image, get_chunks_view, get_medians, get_signatures, get_area_means, get_area_signatures, get_preview_textures
 from src import find_closest
-
+from src import render
+from src import palette_cache
+from src import streaming
+from src import batch
+from src.stats import Stats, FORMATS as STATS_FORMATS, format_stats
+from src.dithering import DITHERING, dither
+from src.block_matrix import BlockMatrix
+from src.threads import get_threads_count, get_bands, thread_map
+
+# Outputs that are written from a block matrix instead of a rendered image
+BLOCK_MATRIX_EXTENSIONS = (".schem", ".npz")
 
 class Launch:
 	def __init__(self, filter: List[str] = None,
 			scale_factor: int = 0,
-		    method: Literal["abs_diff", "euclidean", "chebyshev_distance", "manhattan_distance", "cosine_similarity", "hamming_distance", "canberra_distance"] = "canberra_distance",
+		    method: Literal["abs_diff", "euclidean", "chebyshev_distance", "manhattan_distance", "cosine_similarity", "hamming_distance", "canberra_distance", "delta_e76", "delta_e2000", "texture"] = "canberra_distance",
 		    compression_level: int = 16,
 			png_atlas_filename: str=resource_path("minecraft_textures_atlas_blocks.png_0.png"),
-			txt_atlas_filename: str=resource_path("minecraft_textures_atlas_blocks.png.txt")) -> None:
+			txt_atlas_filename: str=resource_path("minecraft_textures_atlas_blocks.png.txt"),
+			workers: int = 1,
+			reuse_threshold: float = None,
+			valid_blocks_filename: str = None,
+			refresh_blocks: bool = False,
+			streaming: bool = False,
+			stats: Stats = None,
+			dithering: Literal["none", "ordered", "floyd_steinberg"] = "none",
+			target_blocks: Tuple[int, int] = None,
+			block_pixels: int = None,
+			png_compression: int = 6,
+			raw_video: bool = False,
+			dedupe_tolerance: int = None,
+			clusters: int = 0,
+			threads: int = 0) -> None:
 
 		self.PNG_ATLAS_FILENAME = png_atlas_filename
 		self.TXT_ATLAS_FILENAME = txt_atlas_filename
-		self.CACHE_FILENAME = os.path.join(get_execution_folder(), "blocks.json")
+		self.CACHE_FOLDER = os.path.join(get_execution_folder(), "palette_cache")
+		self.VALID_BLOCKS_FILENAME = download.get_valid_blocks_filename(valid_blocks_filename, refresh_blocks)
+		self.method_name = method
 		self.method = method
 
 		self.scale_factor = scale_factor
-
-		self.blocks_image = Image.open(self.PNG_ATLAS_FILENAME, "r")
-		
-
-		blocks = self._get_blocks_from_cache()
-
-		if filter:
-			filtered_blocks = list()
-			for block in blocks:
-				if block[0] in filter:
-					filtered_blocks.append(block)
-			blocks = filtered_blocks
-
-		self.blocks = blocks
-
-
-		method_settings = find_closest.Method(self.blocks, compression_level=compression_level)
+		self.workers = workers
+		# Threads converting bands of a single image, one per core by default unless images are split between worker processes
+		self.threads = get_threads_count(threads, workers)
+		self.reuse_threshold = reuse_threshold
+		self.streaming = streaming
+		if dithering not in DITHERING:
+			raise ValueError(f"Unknown dithering {dithering!r}, expected one of {DITHERING}")
+		if dithering != "none" and method == find_closest.TEXTURE_METHOD:
+			raise ValueError(f"dithering can't be used with {find_closest.TEXTURE_METHOD} method, it needs a single color for every chunk")
+		self.dithering = dithering
+		if target_blocks is not None and scale_factor:
+			raise ValueError("scale_factor can't be used with target_blocks, the size comes from target_blocks")
+		self.target_blocks = target_blocks
+		if not 0 <= png_compression <= 9:
+			raise ValueError("png_compression has to be from 0 to 9")
+		self.png_compression = png_compression
+		self.raw_video = raw_video
+		self.stats = stats if stats is not None else Stats()
+
+		if dedupe_tolerance is not None and dedupe_tolerance < 0:
+			raise ValueError("dedupe_tolerance can't be negative")
+		self.palette = self._get_palette_from_cache(filter, dedupe_tolerance)
+		self.blocks = self.palette.to_blocks()
+
+		if clusters < 0:
+			raise ValueError("clusters can't be negative")
+		method_settings = find_closest.Method(self.blocks, compression_level=compression_level, signatures=self.palette.signatures, clusters=clusters)
+		method_settings.threads = self.threads
+		self.method_settings = method_settings
+		self.textures = self.palette.textures
+		if block_pixels is not None:
+			if not 0 < block_pixels <= self.textures.shape[1]:
+				raise ValueError(f"block_pixels has to be from 1 to {self.textures.shape[1]}")
+			self.textures = get_preview_textures(self.textures, block_pixels)
 		if self.method == "euclidean":
 			self.method = method_settings.find_closest_block_euclidean_distance
 		elif self.method == "abs_diff":
@@ -61,39 +100,203 @@ class Launch:
 			self.method = method_settings.find_closest_block_hamming_distance
 		elif self.method == "canberra_distance":
 			self.method = method_settings.find_closest_block_canberra_distance
-
-	def _get_blocks_from_cache(self) -> Dict:
-		'''Gets the blocks from cache, and if it doesn't exist, re-validate everything from internet,
-		and cache blocks and their medians.'''
-		if pathlib.Path(self.CACHE_FILENAME).exists():
-			with open(self.CACHE_FILENAME, "r") as f:
-				blocks = json.load(f)
-		else:
-			valid_client = download.ValidBlocksClient(self.TXT_ATLAS_FILENAME)
-			blocks = valid_client.exclude_invalid_blocks()
-			calculate_median = calculate_minecraft_blocks_median.CalculateMinecraftBlocksMedian(blocks, self.PNG_ATLAS_FILENAME)
-			blocks = calculate_median.get_blocks_with_rgb_medians()
-
-			with open(self.CACHE_FILENAME, "w") as f:
-				json.dump(blocks, f, indent=4)
-		return blocks
+		elif self.method == "delta_e76":
+			self.method = method_settings.find_closest_block_delta_e76
+		elif self.method == "delta_e2000":
+			self.method = method_settings.find_closest_block_delta_e2000
+		elif self.method == find_closest.TEXTURE_METHOD:
+			self.method = method_settings.find_closest_block_texture
+
+	def _get_palette_from_cache(self, filter: List[str] = None, dedupe_tolerance: int = None) -> palette_cache.Palette:
+		'''Gets the palette from cache, and if it doesn't exist or was made from a different atlas or valid blocks file,
+		re-validate everything, and cache blocks, their medians and textures. Deduplicated palettes are cached too.'''
+		return palette_cache.load_palette(self.CACHE_FOLDER, self.PNG_ATLAS_FILENAME, self.TXT_ATLAS_FILENAME, filter,
+			valid_blocks_filename=self.VALID_BLOCKS_FILENAME, dedupe_tolerance=dedupe_tolerance)
 
 	def convert(self, path: str, output_path: str, show_progress: bool = True) -> None:
 		if is_video_file(path):
-			video = mp.VideoFileClip(path)
-			converted_video = convert_video.process_video_with_pil(video, self.convert_image)
-			converted_video.write_videofile(output_path, fps=video.fps, logger=None if not show_progress else "bar")
+			self.convert_video(path, output_path, show_progress)
 
-		elif output_path.endswith(".schem"):
-			with Image.open(path, "r") as img:
-				generate_schematic.create_2d_schematic(
-					self.get_blocks_2d_matrix(img, show_progress=show_progress),
-					output_path)
+		elif self.is_streamed(path, output_path):
+			self.convert_streaming(path, output_path, show_progress=show_progress)
 
 		else:
+			image = self.decode(path)
+			converted = self.convert_decoded(image, output_path, show_progress=show_progress)
+			self.encode(converted, output_path)
+
+		self.count_conversion()
+
+	def is_streamed(self, path: str, output_path: str) -> bool:
+		'''Returns True if the image is converted in strips, outputs and inputs that are block matrices are never streamed.'''
+		return self.streaming and not output_path.endswith(BLOCK_MATRIX_EXTENSIONS) and not path.endswith(".npz")
+
+	def is_image_job(self, path: str, output_path: str) -> bool:
+		'''Returns True if the job is converted by decode, convert_decoded and encode, which can run in different threads.
+		Videos and streamed images are read and written while they are converted.'''
+		return not is_video_file(path) and not self.is_streamed(path, output_path)
+
+	def decode(self, path: str) -> Union[Image.Image, BlockMatrix]:
+		'''Opens and fully reads an image, so it can be converted after its file is closed.
+		.npz files are block matrices saved by an earlier conversion.'''
+		with self.stats.stage("decode"):
+			if path.endswith(".npz"):
+				return BlockMatrix.load(path)
 			with Image.open(path, "r") as img:
-				converted_image = self.convert_image(img, show_progress=show_progress)
-				converted_image.save(output_path)
+				img.load()
+		return img
+
+	def convert_decoded(self, image: Union[Image.Image, BlockMatrix], output_path: str, show_progress: bool = False) -> Union[Image.Image, BlockMatrix]:
+		'''Returns what encode writes to output_path: block matrix of a .schem or .npz, or the converted image.
+		Block matrices are only rendered, without matching them again.'''
+		if isinstance(image, BlockMatrix):
+			if output_path.endswith(BLOCK_MATRIX_EXTENSIONS):
+				return image
+			with self.stats.stage("rendering"):
+				return Image.fromarray(image.render(self.textures, self.method_settings.names, self.threads))
+		if output_path.endswith(BLOCK_MATRIX_EXTENSIONS):
+			return self.get_block_matrix(image, show_progress=show_progress)
+		return self.convert_image(image, show_progress=show_progress)
+
+	def encode(self, converted: Union[Image.Image, BlockMatrix], output_path: str) -> None:
+		'''Writes result of convert_decoded to output_path, PNG images are compressed with png_compression.'''
+		if output_path.endswith(".schem"):
+			with self.stats.stage("schematic_save"):
+				converted.write_schematic(output_path)
+		elif output_path.endswith(".npz"):
+			with self.stats.stage("encode"):
+				converted.save(output_path)
+		else:
+			with self.stats.stage("encode"):
+				converted.save(output_path, compress_level=self.png_compression)
+
+	def pop_stats_delta(self) -> Dict:
+		'''Returns stats counted since the last call and resets them, for sending from a worker process, see Stats.pop_delta.'''
+		return self.stats.pop_delta(self.method_settings)
+
+	def merge_stats_delta(self, delta: Dict) -> None:
+		'''Adds stats delta of a worker process to the stats of this Launch.'''
+		self.stats.merge(delta, self.method_settings)
+
+	def count_conversion(self) -> None:
+		'''Counts a finished conversion in stats, and reports them to stats.on_convert.'''
+		self.stats.conversions += 1
+		if self.stats.on_convert is not None:
+			self.stats.on_convert(self.stats.to_dict(self.method_settings))
+
+	def convert_video(self, path: str, output_path: str, show_progress: bool = True) -> None:
+		if self.raw_video:
+			self.convert_video_raw(path, output_path, show_progress)
+			return
+		# Video dependencies take most of the startup time, so they are only imported for videos
+		import moviepy.editor as mp
+		from src import convert_video
+
+		start = time.perf_counter()
+		# Frames are converted while the video is written, time spent in other stages is subtracted at the end
+		other_stages = sum(self.stats.stages.values())
+		if self.reuse_threshold is not None and self.dithering != "none":
+			raise ValueError("dithering can't be used with reuse_threshold, dithered chunks depend on their neighbours")
+		if self.reuse_threshold is not None and self.target_blocks is not None:
+			raise ValueError("target_blocks can't be used with reuse_threshold, it only reuses whole 16 pixel chunks")
+		video = mp.VideoFileClip(path)
+		if self.reuse_threshold is not None:
+			converter = convert_video.TemporalFrameConverter(self, self.reuse_threshold)
+			converted_video = convert_video.process_video_incremental(video, converter)
+		elif self.workers == 1:
+			converted_video = convert_video.process_video_with_pil(video, self.convert_image)
+		else:
+			self.share()
+			converted_video = convert_video.process_video_parallel(video, self.convert_image, self.workers,
+				pop_stats=self.pop_stats_delta, merge_stats=self.merge_stats_delta)
+		converted_video.write_videofile(output_path, fps=video.fps, logger=None if not show_progress else "bar")
+		if self.reuse_threshold is not None and show_progress:
+			print(f"Reused {converter.reused_fraction:.1%} of chunks from previous frames")
+
+		if self.reuse_threshold is None and self.workers != 1:
+			# Stages of worker processes overlap with reading and writing the video here, which takes the whole time
+			video_io = time.perf_counter() - start
+		else:
+			video_io = time.perf_counter() - start - (sum(self.stats.stages.values()) - other_stages)
+		self.stats.stages["video_io"] = self.stats.stages.get("video_io", 0.0) + video_io
+
+	def convert_video_raw(self, path: str, output_path: str, show_progress: bool = True) -> None:
+		'''Converts video through ffmpeg pipes in a single process, see raw_video.convert_video.'''
+		if self.reuse_threshold is not None:
+			raise ValueError("reuse_threshold can't be used with raw_video")
+		from src import raw_video
+		raw_video.convert_video(self, path, output_path, show_progress)
+
+	def share(self) -> None:
+		'''Prepares for converting in worker processes. The lookup table of the method is moved into shared memory,
+		so all workers fill one table. Palette arrays are memory mapped from the cache already, and workers map the same files.'''
+		self.method_settings.share_luts([self.method_name])
+
+	def convert_streaming(self, path: str, output_path: str, show_progress: bool = True, strip_rows: int = 8, chunk_size: int = 16) -> None:
+		'''Converts image in horizontal strips of strip_rows block rows, and writes every strip to output_path (.png or .npy)
+		as soon as it's rendered, so memory doesn't grow with image size. Can't be used with scale_factor.'''
+		if self.scale_factor or self.target_blocks is not None:
+			raise ValueError("scale_factor and target_blocks can't be used when streaming, resizing needs the whole image")
+		from tqdm import tqdm
+
+		with streaming.StripReader(path) as reader:
+			width, height = reader.size
+			chunks_x = width // chunk_size
+			chunks_y = height // chunk_size
+			block_size = self.textures.shape[1]
+
+			# Floyd-Steinberg errors of the last row of a strip are diffused into the next one
+			errors = None
+			with streaming.open_strip_writer(output_path, chunks_x * block_size, chunks_y * block_size, self.png_compression) as writer:
+				for top in tqdm(range(0, chunks_y, strip_rows), disable=not show_progress):
+					bottom = min(top + strip_rows, chunks_y)
+					with self.stats.stage("decode"):
+						strip = reader.read(top * chunk_size, bottom * chunk_size)
+					with self.stats.stage("medians"):
+						medians = self.get_array_colors(strip, chunk_size)
+					with self.stats.stage("matching"):
+						index_matrix, errors = dither(medians, self.method_settings, self.method_name, self.dithering, top, errors)
+					with self.stats.stage("rendering"):
+						rendered = render.render_blocks(index_matrix, self.textures, self.threads)
+					with self.stats.stage("encode"):
+						writer.write(rendered)
+					self.stats.chunks += index_matrix.size
+
+	def get_chunk_colors(self, chunks: np.ndarray) -> np.ndarray:
+		'''Returns what (..., chunk_size, chunk_size, 3) chunks are matched by: their medians,
+		or texture signatures with the texture method.'''
+		if self.method_name == find_closest.TEXTURE_METHOD:
+			return get_signatures(chunks)
+		return get_medians(chunks)
+
+	def get_array_colors(self, array: np.ndarray, chunk_size: int = 16) -> np.ndarray:
+		'''Same as get_chunk_colors of every chunk of a (height, width, 3) image array, with bands of chunk rows
+		calculated in parallel threads, and joined into one (chunks_x, chunks_y, ...) array.'''
+		bands = get_bands(array.shape[0] // chunk_size, self.threads)
+		if len(bands) == 1:
+			return self.get_chunk_colors(get_chunks_view(array, chunk_size))
+		def get_band_colors(band):
+			return self.get_chunk_colors(get_chunks_view(array[band[0] * chunk_size:band[1] * chunk_size], chunk_size))
+		return np.concatenate(thread_map(get_band_colors, bands, self.threads), axis=1)
+
+	def get_target_blocks(self, width: int, height: int) -> Tuple[int, int]:
+		'''Returns amount of blocks in both directions for an image of the given size, 0 in target_blocks keeps the aspect ratio.'''
+		blocks_x, blocks_y = self.target_blocks
+		if not blocks_x and not blocks_y:
+			raise ValueError("At least one of target_blocks has to be above 0")
+		if not blocks_x:
+			blocks_x = max(1, round(blocks_y * width / height))
+		if not blocks_y:
+			blocks_y = max(1, round(blocks_x * height / width))
+		return blocks_x, blocks_y
+
+	def get_area_colors(self, array: np.ndarray) -> np.ndarray:
+		'''Same as get_chunk_colors, for target_blocks equal areas of an image array,
+		with mean colors instead of medians, so the image doesn't have to be resized.'''
+		blocks_x, blocks_y = self.get_target_blocks(array.shape[1], array.shape[0])
+		if self.method_name == find_closest.TEXTURE_METHOD:
+			return get_area_signatures(array, blocks_x, blocks_y)
+		return get_area_means(array, blocks_x, blocks_y)
 
 	def preprocess_image(self, image: Image) -> Image:
 		cropped_image = crop_to_make_divisible(image)
@@ -104,86 +307,130 @@ class Launch:
 
 		return cropped_image
 
+	def get_blocks_index_matrix(self, image: Image, show_progress: bool = False, chunk_size: int = 16) -> np.ndarray:
+		'''Returns a (chunks_x, chunks_y) matrix of indices into self.method_settings.names.
+		Medians of all chunks are calculated at once (in bands of rows, one per thread), and then matched against the palette in batches.
+		With target_blocks chunks are target_blocks equal areas of the image instead.'''
+		if self.target_blocks is not None:
+			with self.stats.stage("preprocess"):
+				array = np.asarray(image if image.mode == "RGB" else image.convert("RGB"))
+			with self.stats.stage("medians"):
+				medians = self.get_area_colors(array)
+		else:
+			with self.stats.stage("preprocess"):
+				preprocessed_image = self.preprocess_image(image)
+			with self.stats.stage("medians"):
+				medians = self.get_array_colors(np.asarray(preprocessed_image), chunk_size)
+		with self.stats.stage("matching"):
+			if self.dithering == "none":
+				index_matrix = self.method_settings.find_closest_blocks(medians, self.method_name, show_progress=show_progress)
+			else:
+				index_matrix, _ = dither(medians, self.method_settings, self.method_name, self.dithering)
+		self.stats.chunks += index_matrix.size
+		return index_matrix
+
+	def get_block_matrix(self, image: Image, show_progress: bool = False, chunk_size: int = 16) -> BlockMatrix:
+		'''Returns blocks of the image as a compact uint16 index matrix with block names, which can be saved,
+		rendered and written as a schematic without matching again.'''
+		return BlockMatrix(self.get_blocks_index_matrix(image, show_progress, chunk_size), self.method_settings.names)
+
 	def get_blocks_2d_matrix(self, image: Image, show_progress: bool = False, chunk_size: int = 16) -> List[List[str]]:
 		'''Returns a matrix of strings containing block names.'''
-		preprocessed_image = self.preprocess_image(image)
-		width, height = preprocessed_image.size
-		chunks_x = width // chunk_size
-		chunks_y = height // chunk_size
-
-		blocks_matrix = [[None] * chunks_y for _ in range(chunks_x)]
-		total_iterations = chunks_x * chunks_y
-
-		# Create a progress bar
-		progress_bar = tqdm(total=total_iterations, disable=not show_progress)
-
-		for x in range(chunks_x):
-			for y in range(chunks_y):
-				left = x * chunk_size
-				upper = y * chunk_size
-				right = left + chunk_size
-				lower = upper + chunk_size
-				chunk = preprocessed_image.crop((left, upper, right, lower))
-
-				closest_block = self.method(chunk)
-				blocks_matrix[x][y] = closest_block
-
-				progress_bar.update(1)
-
-		# Close the progress bar
-		progress_bar.close()
-		return blocks_matrix
+		return self.get_block_matrix(image, show_progress, chunk_size).to_names()
 
 	def convert_image(self, image: Image, show_progress: bool = False) -> Image:
-		blocks_matrix = self.get_blocks_2d_matrix(image, show_progress)
-		matrix_width = len(blocks_matrix)
-		matrix_height = len(blocks_matrix[0])
-		new_image = Image.new("RGB", size=(matrix_width * 16, matrix_height * 16))
-
-		total_iterations = matrix_width * matrix_height
-
-		# Create a progress bar
-		progress_bar = tqdm(total=total_iterations, disable=not show_progress)
-
-		for x, row in enumerate(blocks_matrix):
-			for y, block_name in enumerate(row):
-				block_info = self.blocks.get(block_name)
-				block_x, block_y = block_info["x"], block_info["y"]
-				block_image = self.blocks_image.crop((block_x, block_y, block_x + 16, block_y + 16))
-				new_image.paste(block_image, (x * 16, y * 16))
-
-				progress_bar.update(1)
-
-		# Close the progress bar
-		progress_bar.close()
-
-		return new_image
+		index_matrix = self.get_blocks_index_matrix(image, show_progress)
+		with self.stats.stage("rendering"):
+			return Image.fromarray(render.render_blocks(index_matrix, self.textures, self.threads))
 
 def main():
 	parser = argparse.ArgumentParser(description='Launch class arguments')
 
 	# Add the required arguments
-	parser.add_argument('path_to_file', type=str, help='Path to the input file')
-	parser.add_argument('output_file', type=str, help='Path to the output file')
+	parser.add_argument('path_to_file', type=str, help='Path to the input file. With --batch: manifest file, glob pattern of input files, or - to read jobs from stdin')
+	parser.add_argument('output_file', type=str, nargs='?', help='Path to the output file. With --batch: folder for files matching the glob pattern')
 
 	# Add the optional arguments
 	parser.add_argument('--filter', nargs='+', help='Filter options')
 	parser.add_argument('--scale_factor', type=float, help='Scale factor', default=0)
-	parser.add_argument('--compression_level', type=int, help='Compression level, greatly improves conversion speed, and loses some information along the way, do not set higher than 20, as it will cause very high memory consumption.', default=16)
+	parser.add_argument('--compression_level', type=int, help='Compression level, greatly improves conversion speed, and loses some information along the way. Colors up to this sum of absolute RGB differences apart share the same block, 0 matches every color exactly. Memory used by the color lookup table is fixed.', default=16)
 	parser.add_argument('--method', type=str,
-		    choices=["abs_diff", "euclidean", "chebyshev_distance", "manhattan_distance", "cosine_similarity", "hamming_distance", "canberra_distance"], help='Method of finding the closest color to block', default="canberra_distance", required=False)
+		    choices=find_closest.METHODS + [find_closest.TEXTURE_METHOD], help='Method of finding the closest color to block. texture compares mean colors of chunk quarters and their variance with those of block textures, so patterned blocks match better', default="canberra_distance", required=False)
 	parser.add_argument('--png_atlas_filename', type=str, default=resource_path('minecraft_textures_atlas_blocks.png_0.png'), help='PNG atlas filename')
 	parser.add_argument('--txt_atlas_filename', type=str, default=resource_path('minecraft_textures_atlas_blocks.png.txt'), help='TXT atlas filename')
+	parser.add_argument('--valid_blocks_filename', type=str, default=None, help='List of blocks that can be placed, either .nbtdoc or a plain list with a block on every line. Defaults to .nbtdoc downloaded by --refresh_blocks, or the bundled list')
+	parser.add_argument('--refresh_blocks', action='store_true', help='Download the latest list of blocks that can be placed')
+	parser.add_argument('--streaming', action='store_true', help='Convert image in strips, writing them to the output (.png or .npy) as they are done, so memory stays the same for any image size. Inputs are read strip by strip from .npy, .ppm/.pgm and uncompressed .tif files, other formats like .png and .jpg are decoded in full first')
+	parser.add_argument('--workers', type=int, default=1, help='Amount of processes converting video frames or --batch jobs in parallel, 0 uses all CPU cores')
+	parser.add_argument('--batch', action='store_true', help='Convert many files with one warm palette and lookup table. Jobs are "input<TAB>output" lines of a manifest file or stdin, or files matching a glob pattern. --workers sets the amount of processes converting them')
+	parser.add_argument('--prefetch', type=int, default=2, help='With --batch and a single worker, amount of images decoded ahead and waiting to be encoded in background threads while others are converted, 0 converts them one after another')
+	parser.add_argument('--png_compression', type=int, choices=range(10), default=6, metavar='{0..9}', help='PNG compression level of the output, lower is faster to write and bigger')
+	parser.add_argument('--output_extension', type=str, default=None, help='Extension of the outputs of files matching a --batch glob pattern, like .png. Defaults to the extension of every input')
+	parser.add_argument('--stats', type=str, choices=STATS_FORMATS, default=None, help='Print time spent in every conversion stage, converted chunks (and video chunks reused from previous frames with --reuse_threshold) and lookup table hits, misses and size when done')
+	parser.add_argument('--dithering', type=str, choices=DITHERING, default="none", help='Spread the difference between chunk colors and their blocks over neighbouring chunks: ordered adds a Bayer pattern, floyd_steinberg diffuses the error of every chunk to its right and bottom neighbours. Can\'t be used with --reuse_threshold or the texture method')
+	parser.add_argument('--blocks', type=parse_target_blocks, default=None, help='Size of the output in blocks, like 128x128. 0 on one side keeps the aspect ratio, like 128x0. Every block gets the mean color of its area of the image, without resizing it first. Can\'t be used with --scale_factor, --streaming and --reuse_threshold')
+	parser.add_argument('--block_pixels', type=int, default=None, help='Pixels per block side of the rendered image, from 1 (mean color of every block, for map art previews) to 16 (full textures)')
+	parser.add_argument('--raw_video', action='store_true', help='Read and write video frames through ffmpeg pipes, and convert them in place in preallocated buffers. Faster than the default path, in a single process, can\'t be used with --reuse_threshold')
+	parser.add_argument('--dedupe_tolerance', type=int, default=None, help='Leave out blocks whose color is at most this sum of absolute RGB differences away from another block, preferring full blocks with uniform textures. 0 only leaves out blocks with the same color')
+	parser.add_argument('--clusters', type=int, default=0, help=f'Split the palette into this many clusters of similar colors, and compare every color only with blocks of its closest clusters. Faster and approximate, for {" and ".join(find_closest.CLUSTERED_METHODS)}. 0 compares with every block')
+	parser.add_argument('--threads', type=int, default=0, help='Threads converting bands of rows of a single image in parallel, 0 uses all CPU cores (a single thread with several --workers)')
+	parser.add_argument('--reuse_threshold', type=float, default=None, help='Only match video chunks whose mean absolute pixel difference since they were last matched is above this threshold, others reuse their previous block (0 reuses only unchanged chunks). Frames are converted in a single process')
 
 	args = parser.parse_args()
+	if not args.batch and args.output_file is None:
+		parser.error("the following arguments are required: output_file")
 
 	launch = Launch(args.filter,
 		args.scale_factor,
 		args.method,
 		args.compression_level,
 		args.png_atlas_filename,
-		args.txt_atlas_filename)
-	launch.convert(args.path_to_file, args.output_file)
+		args.txt_atlas_filename,
+		args.workers,
+		args.reuse_threshold,
+		args.valid_blocks_filename,
+		args.refresh_blocks,
+		args.streaming,
+		dithering=args.dithering,
+		target_blocks=args.blocks,
+		block_pixels=args.block_pixels,
+		png_compression=args.png_compression,
+		raw_video=args.raw_video,
+		dedupe_tolerance=args.dedupe_tolerance,
+		clusters=args.clusters,
+		threads=args.threads)
+
+	if args.batch:
+		run_batch(launch, args.path_to_file, args.output_file, args.output_extension, args.workers, args.prefetch)
+	else:
+		launch.convert(args.path_to_file, args.output_file)
+	if args.stats:
+		print(format_stats(launch.stats.to_dict(launch.method_settings), args.stats))
+
+def parse_target_blocks(value: str) -> Tuple[int, int]:
+	'''Parses WIDTHxHEIGHT block size of the --blocks argument.'''
+	try:
+		blocks_x, blocks_y = (int(size) for size in value.lower().split("x"))
+	except ValueError:
+		raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, like 128x128, got {value!r}")
+	if blocks_x < 0 or blocks_y < 0 or not (blocks_x or blocks_y):
+		raise argparse.ArgumentTypeError(f"sizes can't be negative, and at least one has to be above 0, got {value!r}")
+	return blocks_x, blocks_y
+
+def run_batch(launch: Launch, source: str, output_folder: str = None, output_extension: str = None, workers: int = 1, prefetch: int = 2) -> None:
+	'''Converts every job from source with the same Launch, printing every job's latency as it finishes,
+	and throughput at the end. With a single worker, up to prefetch images are decoded and encoded while others are converted.'''
+	jobs = batch.get_jobs(source, output_folder, output_extension)
+	if output_folder:
+		os.makedirs(output_folder, exist_ok=True)
+
+	if workers != 1:
+		launch.share()
+	start = time.perf_counter()
+	results = batch.run_jobs(launch, jobs, workers, on_result=lambda result: print(result, flush=True), prefetch=prefetch)
+	print(batch.get_summary(results, time.perf_counter() - start), flush=True)
 
 if __name__ == "__main__":
+	# Worker processes of frozen executables (PyInstaller) start here, and have to run the task instead of main
+	multiprocessing.freeze_support()
 	main()
\ No newline at end of file
@@ -0,0 +1,228 @@
+import os
+import sys
+import glob
+import time
+import queue
+import threading
+import functools
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from .utils import get_workers_count
+
+Job = Tuple[str, str]
+
+class JobResult:
+	'''Outcome of one input -> output conversion, latency is the time spent converting it, in seconds.
+	Jobs converted in a worker process carry its stats delta (see Stats.pop_delta), which run_jobs merges into the Launch.'''
+	def __init__(self, input_path: str, output_path: str, latency: float, error: Optional[str] = None, stats: Optional[Dict[str, Any]] = None) -> None:
+		self.input_path = input_path
+		self.output_path = output_path
+		self.latency = latency
+		self.error = error
+		self.stats = stats
+
+	def __str__(self) -> str:
+		status = f"failed: {self.error}" if self.error else "ok"
+		return f"{self.latency * 1000:.1f} ms\t{self.input_path} -> {self.output_path}\t{status}"
+
+def parse_job_line(line: str) -> Optional[Job]:
+	'''Parses "input<TAB>output" line, returns None for empty lines and lines starting with #.'''
+	line = line.strip()
+	if not line or line.startswith("#"):
+		return None
+	try:
+		input_path, output_path = line.split("\t")
+	except ValueError:
+		raise ValueError(f"Expected input and output path separated by a tab, got {line!r}") from None
+	return input_path.strip(), output_path.strip()
+
+def iter_job_lines(lines: Iterable[str]) -> Iterator[Job]:
+	'''Yields jobs from manifest lines as they are read, so it works on a stream like stdin.'''
+	for line in lines:
+		job = parse_job_line(line)
+		if job is not None:
+			yield job
+
+def read_manifest(path: str) -> List[Job]:
+	'''Reads manifest file with an "input<TAB>output" job on every line.'''
+	with open(path, "r", encoding="utf-8") as f:
+		return list(iter_job_lines(f))
+
+def glob_jobs(pattern: str, output_folder: str, output_extension: str = None) -> List[Job]:
+	'''Returns a job for every file matching pattern, writing it to output_folder under the same name,
+	with output_extension (like ".png") if given.'''
+	jobs = list()
+	for input_path in sorted(glob.glob(pattern, recursive=True)):
+		name = os.path.basename(input_path)
+		if output_extension:
+			name = os.path.splitext(name)[0] + output_extension
+		jobs.append((input_path, os.path.join(output_folder, name)))
+	return jobs
+
+def get_jobs(source: str, output_folder: str = None, output_extension: str = None, stdin: TextIO = None) -> Iterable[Job]:
+	'''Returns jobs from source: "-" streams them from stdin, a path to an existing file is read as a manifest,
+	and anything else is a glob pattern, whose files are written to output_folder.'''
+	if source == "-":
+		return iter_job_lines(stdin or sys.stdin)
+	if os.path.isfile(source):
+		return read_manifest(source)
+	if not output_folder:
+		raise ValueError("Converting files matching a pattern needs an output folder")
+	return glob_jobs(source, output_folder, output_extension)
+
+def convert_job(launch: Any, job: Job) -> JobResult:
+	'''Converts one job with an already created Launch, errors are returned in the result instead of raised.'''
+	input_path, output_path = job
+	start = time.perf_counter()
+	try:
+		launch.convert(input_path, output_path, show_progress=False)
+		error = None
+	except Exception as e:
+		error = f"{type(e).__name__}: {e}"
+	return JobResult(input_path, output_path, time.perf_counter() - start, error)
+
+# Launch of the current worker process, set once by _init_worker,
+# so the palette and lookup tables are sent to every worker once and stay warm between its jobs.
+_worker_launch: Any = None
+
+def _init_worker(launch: Any) -> None:
+	global _worker_launch
+	_worker_launch = launch
+	# Worker processes can't start their own pools for videos
+	_worker_launch.workers = 1
+
+def _convert_job_in_worker(job: Job) -> JobResult:
+	result = convert_job(_worker_launch, job)
+	if hasattr(_worker_launch, "pop_stats_delta"):
+		result.stats = _worker_launch.pop_stats_delta()
+	return result
+
+def _get_result_collector(results: List[JobResult], on_result: Optional[Callable[[JobResult], None]]) -> Callable[[JobResult], None]:
+	'''Returns function that appends a result to results and reports it, from any thread.'''
+	lock = threading.Lock()
+
+	def add_result(result: JobResult) -> None:
+		with lock:
+			results.append(result)
+			if on_result is not None:
+				on_result(result)
+	return add_result
+
+def run_jobs(launch: Any, jobs: Iterable[Job], workers: int = 1, max_pending: int = 0, on_result: Callable[[JobResult], None] = None, prefetch: int = 0) -> List[JobResult]:
+	'''Converts all jobs with one Launch instance, and returns their results in the order they finished.
+	With workers 1 jobs run in this process (in run_jobs_pipelined if prefetch is above 0),
+	otherwise in a pool of worker processes (0 is one per CPU core),
+	taking jobs while at most max_pending (2 per worker by default) are unfinished.
+	on_result is called with every result as soon as its job is done.'''
+	results = list()
+	add_result = _get_result_collector(results, on_result)
+
+	if workers == 1:
+		if prefetch > 0:
+			return run_jobs_pipelined(launch, jobs, prefetch, on_result)
+		for job in jobs:
+			add_result(convert_job(launch, job))
+		return results
+
+	workers = get_workers_count(workers)
+	slots = threading.BoundedSemaphore(max_pending or workers * 2)
+
+	def job_done(job: Job, future: Future) -> None:
+		try:
+			result = future.result()
+		except Exception as e:
+			# The worker itself failed, like when it was killed
+			result = JobResult(job[0], job[1], 0.0, f"{type(e).__name__}: {e}")
+		if result.stats is not None:
+			launch.merge_stats_delta(result.stats)
+			result.stats = None
+		add_result(result)
+		slots.release()
+
+	with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(launch,)) as executor:
+		for job in jobs:
+			slots.acquire()
+			future = executor.submit(_convert_job_in_worker, job)
+			future.add_done_callback(functools.partial(job_done, job))
+	return results
+
+def run_jobs_pipelined(launch: Any, jobs: Iterable[Job], prefetch: int = 2, on_result: Callable[[JobResult], None] = None) -> List[JobResult]:
+	'''Converts all jobs in this process like run_jobs with 1 worker, while the next images are decoded in one background thread
+	and previous ones are encoded in another. PIL releases the GIL while it reads and compresses images, so disk I/O and
+	PNG compression overlap with conversion. At most prefetch images are decoded ahead and at most prefetch converted ones
+	wait to be encoded, so memory stays bounded. Jobs that aren't images (see Launch.is_image_job) are converted as a whole in turn.
+	Jobs are read in a background thread too, so a job from a stream like stdin is converted as soon as it arrives,
+	without waiting for the next ones. Latency of a job is counted from the start of its decoding to the end of its encoding.'''
+	results = list()
+	add_result = _get_result_collector(results, on_result)
+	encode_slots = threading.BoundedSemaphore(prefetch)
+	decode_slots = threading.BoundedSemaphore(prefetch)
+	# Jobs with their decoding futures, then None, or the exception raised by jobs
+	decoded_jobs = queue.Queue()
+	jobs = iter(jobs)
+
+	def decode(job: Job) -> Tuple[float, Any]:
+		start = time.perf_counter()
+		return start, launch.decode(job[0]) if launch.is_image_job(*job) else None
+
+	def encode(job: Job, start: float, converted: Any) -> None:
+		try:
+			launch.encode(converted, job[1])
+			launch.count_conversion()
+			error = None
+		except Exception as e:
+			error = f"{type(e).__name__}: {e}"
+		encode_slots.release()
+		add_result(JobResult(job[0], job[1], time.perf_counter() - start, error))
+
+	with ThreadPoolExecutor(1) as decoder, ThreadPoolExecutor(1) as encoder:
+		def read_jobs() -> None:
+			try:
+				while True:
+					decode_slots.acquire()
+					job = next(jobs, None)
+					if job is None:
+						break
+					decoded_jobs.put((job, decoder.submit(decode, job)))
+				decoded_jobs.put(None)
+			except Exception as e:
+				decoded_jobs.put(e)
+
+		# Daemon, so a stream that never ends doesn't keep the program running after an error
+		threading.Thread(target=read_jobs, daemon=True).start()
+		while True:
+			item = decoded_jobs.get()
+			if item is None:
+				break
+			if isinstance(item, Exception):
+				raise item
+			job, decoded = item
+			decode_slots.release()
+			start = time.perf_counter()
+			try:
+				start, image = decoded.result()
+				if image is None:
+					add_result(convert_job(launch, job))
+					continue
+				converted = launch.convert_decoded(image, job[1])
+			except Exception as e:
+				add_result(JobResult(job[0], job[1], time.perf_counter() - start, f"{type(e).__name__}: {e}"))
+				continue
+			encode_slots.acquire()
+			encoder.submit(encode, job, start, converted)
+	return results
+
+def get_summary(results: List[JobResult], wall_time: float) -> str:
+	'''Returns a line with amount of jobs, failures, throughput and latency percentiles.'''
+	if not results:
+		return "No jobs converted"
+	latencies = sorted(result.latency for result in results)
+	failed = sum(result.error is not None for result in results)
+
+	def percentile(fraction: float) -> float:
+		return latencies[min(int(fraction * len(latencies)), len(latencies) - 1)] * 1000
+
+	return (f"Converted {len(results) - failed}/{len(results)} jobs in {wall_time:.2f} s, "
+		f"{len(results) / wall_time:.1f} jobs/s, latency p50 {percentile(0.5):.1f} ms, "
+		f"p95 {percentile(0.95):.1f} ms, max {latencies[-1] * 1000:.1f} ms")
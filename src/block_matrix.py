@@ -0,0 +1,64 @@
+from typing import List, Optional
+
+import numpy as np
+
+from . import generate_schematic
+from .render import render_blocks
+
+# Block indices are stored as uint16, so palettes can't have more blocks
+MAX_BLOCKS = np.iinfo(np.uint16).max + 1
+
+class BlockMatrix:
+	'''Result of matching an image: (chunks_x, chunks_y) uint16 matrix of indices into names,
+	in the same layout as Launch.get_blocks_index_matrix. It can be saved to an .npz file,
+	and rendered or written as a schematic any amount of times without matching again.'''
+	def __init__(self, indices: np.ndarray, names: List[str]) -> None:
+		if len(names) > MAX_BLOCKS:
+			raise ValueError(f"Block matrix can't hold more than {MAX_BLOCKS} different blocks, got {len(names)}")
+		indices = np.asarray(indices)
+		if indices.size and (indices.min() < 0 or indices.max() >= len(names)):
+			raise ValueError("Block indices have to be below the amount of names")
+		self.indices = indices.astype(np.uint16, copy=False)
+		self.names = list(names)
+
+	@property
+	def shape(self):
+		return self.indices.shape
+
+	def save(self, path: str) -> None:
+		'''Writes indices and names into a compressed .npz file, that doesn't need pickle to be loaded.'''
+		np.savez_compressed(path, indices=self.indices, names=np.array(self.names, dtype=str))
+
+	@classmethod
+	def load(cls, path: str) -> "BlockMatrix":
+		'''Reads block matrix written by save.'''
+		with np.load(path, allow_pickle=False) as data:
+			try:
+				return cls(data["indices"], data["names"].tolist())
+			except KeyError:
+				raise ValueError(f"{path!r} isn't a block matrix, it needs indices and names arrays") from None
+
+	def get_palette_indices(self, palette_names: List[str]) -> np.ndarray:
+		'''Returns (chunks_x, chunks_y) matrix of indices into palette_names, for rendering with textures of another palette.
+		Raises ValueError if a used block isn't in palette_names.'''
+		positions = {name: i for i, name in enumerate(palette_names)}
+		used = np.unique(self.indices)
+		missing = [self.names[i] for i in used if self.names[i] not in positions]
+		if missing:
+			raise ValueError(f"Blocks aren't in the palette: {', '.join(missing)}")
+		mapping = np.zeros(len(self.names), dtype=np.intp)
+		mapping[used] = [positions[self.names[i]] for i in used]
+		return mapping[self.indices]
+
+	def render(self, textures: np.ndarray, palette_names: Optional[List[str]] = None, threads: int = 1) -> np.ndarray:
+		'''Returns (height, width, 3) image array of the blocks, with textures in the order of palette_names (names by default).'''
+		indices = self.indices if palette_names is None else self.get_palette_indices(palette_names)
+		return render_blocks(indices, textures, threads)
+
+	def write_schematic(self, output_path: str, bottom_block: str = "black_wool") -> None:
+		'''Writes the blocks into a Sponge .schem file, see generate_schematic.write_2d_schematic.'''
+		generate_schematic.write_2d_schematic(self.indices, self.names, output_path, bottom_block)
+
+	def to_names(self) -> List[List[str]]:
+		'''Returns a matrix of strings containing block names.'''
+		return np.array(self.names, dtype=object)[self.indices].tolist()
@@ -1,23 +1,60 @@
-from typing import Dict
+from typing import Dict, Iterable
 
-from PIL import Image, ImageStat
+import numpy as np
+from PIL import Image
 
-from .utils import has_transparency, resource_path
+from .utils import resource_path, get_chunks_view, get_medians
+
+STATISTICS = ["median", "mean", "alpha_coverage", "transparent"]
 
 class CalculateMinecraftBlocksMedian:
 	def __init__(self, blocks: Dict, png_atlas_filename: str) -> None:
 		self.PNG_ATLAS_FILENAME = png_atlas_filename
 		self.blocks = blocks
 
+	def get_tiles(self, atlas: np.ndarray, block_size: int = 16) -> np.ndarray:
+		'''Returns (n_blocks, block_size, block_size, channels) tiles of all blocks from an atlas array, in the order of self.blocks.
+		Tiles are taken from a tile grid view of the atlas, or gathered by coordinates if some block isn't aligned to it.'''
+		xs = np.array([self.blocks[block]["x"] for block in self.blocks], dtype=np.intp)
+		ys = np.array([self.blocks[block]["y"] for block in self.blocks], dtype=np.intp)
+		if (xs % block_size == 0).all() and (ys % block_size == 0).all():
+			return get_chunks_view(atlas, block_size)[xs // block_size, ys // block_size]
+
+		offsets = np.arange(block_size)
+		rows = ys[:, None, None] + offsets[None, :, None]
+		columns = xs[:, None, None] + offsets[None, None, :]
+		return atlas[rows, columns]
+
+	def get_blocks_statistics(self, statistics: Iterable[str] = ("median", "transparent")) -> Dict[str, np.ndarray]:
+		'''Calculates the given statistics of all blocks at once, each one is an array in the order of self.blocks.
+		median (same as ImageStat.Stat(...).median) and mean are (n_blocks, 3) RGB arrays,
+		alpha_coverage is the fraction of pixels that aren't fully transparent, and transparent is True if any pixel isn't fully opaque.'''
+		with Image.open(resource_path(self.PNG_ATLAS_FILENAME), "r") as blocks_image:
+			atlas = np.asarray(blocks_image.convert("RGBA"))
+		tiles = self.get_tiles(atlas)
+		alpha = tiles[..., 3]
+
+		results = dict()
+		for statistic in statistics:
+			if statistic == "median":
+				results[statistic] = get_medians(tiles[..., :3])
+			elif statistic == "mean":
+				results[statistic] = tiles[..., :3].mean(axis=(1, 2))
+			elif statistic == "alpha_coverage":
+				results[statistic] = (alpha > 0).mean(axis=(1, 2))
+			elif statistic == "transparent":
+				results[statistic] = (alpha < 255).any(axis=(1, 2))
+			else:
+				raise ValueError(f"Unknown statistic {statistic!r}, expected one of {STATISTICS}")
+		return results
+
 	def get_blocks_with_rgb_medians(self) -> Dict:
 		'''Returns list with blocks, and adds list with medians in each channel (RGB)'''
 		blocks_with_median = dict()
-		with Image.open(resource_path(self.PNG_ATLAS_FILENAME), "r") as blocks_image:
-			for block in self.blocks:
-				block_val = self.blocks[block]
-				cropped = blocks_image.crop([block_val["x"], block_val["y"], block_val["x"]+16, block_val["y"]+16])
-				median = ImageStat.Stat(cropped).median
-				if not has_transparency(cropped):
-					blocks_with_median.update({block: {"x": block_val["x"], "y": block_val["y"], "median": [median[0],median[1], median[2]]}})
-				
+		statistics = self.get_blocks_statistics(("median", "transparent"))
+		for block, median, transparent in zip(self.blocks, statistics["median"].tolist(), statistics["transparent"].tolist()):
+			block_val = self.blocks[block]
+			if not transparent:
+				blocks_with_median.update({block: {"x": block_val["x"], "y": block_val["y"], "median": median}})
+
 		return blocks_with_median
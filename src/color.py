@@ -0,0 +1,108 @@
+import numpy as np
+
+# sRGB (D65) to CIE XYZ, and the D65 reference white
+RGB_TO_XYZ = np.array([
+	[0.4124564, 0.3575761, 0.1804375],
+	[0.2126729, 0.7151522, 0.0721750],
+	[0.0193339, 0.1191920, 0.9503041]])
+WHITE_D65 = np.array([0.95047, 1.0, 1.08883])
+
+def rgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+	'''Converts (..., 3) sRGB colors with channels from 0 to 255 to CIELAB (D65).'''
+	srgb = np.asarray(rgb, dtype=np.float64) / 255
+	linear = np.where(srgb <= 0.04045, srgb / 12.92, ((srgb + 0.055) / 1.055) ** 2.4)
+	xyz = linear @ RGB_TO_XYZ.T / WHITE_D65
+
+	delta = 6 / 29
+	f = np.where(xyz > delta ** 3, np.cbrt(xyz), xyz / (3 * delta ** 2) + 4 / 29)
+	lab = np.empty_like(f)
+	lab[..., 0] = 116 * f[..., 1] - 16
+	lab[..., 1] = 500 * (f[..., 0] - f[..., 1])
+	lab[..., 2] = 200 * (f[..., 1] - f[..., 2])
+	return lab
+
+def delta_e_76(lab1: np.ndarray, lab2: np.ndarray) -> np.ndarray:
+	'''Returns CIE76 color difference (euclidean distance in Lab) of broadcastable (..., 3) Lab arrays.'''
+	return np.sqrt(((lab1 - lab2) ** 2).sum(axis=-1))
+
+def delta_e_2000(lab1: np.ndarray, lab2: np.ndarray) -> np.ndarray:
+	'''Returns CIEDE2000 color difference of broadcastable (..., 3) Lab arrays,
+	following Sharma, Wu and Dalal, "The CIEDE2000 color-difference formula" (2005).'''
+	# Contiguous channels, as strided ones make every operation below a lot slower
+	L1, a1, b1 = np.ascontiguousarray(np.moveaxis(lab1, -1, 0), dtype=np.float64)
+	L2, a2, b2 = np.ascontiguousarray(np.moveaxis(lab2, -1, 0), dtype=np.float64)
+
+	C_mean = (np.hypot(a1, b1) + np.hypot(a2, b2)) / 2
+	C_mean_7 = C_mean ** 7
+	G = 0.5 * (1 - np.sqrt(C_mean_7 / (C_mean_7 + 25.0 ** 7)))
+	a1_prime = (1 + G) * a1
+	a2_prime = (1 + G) * a2
+	C1_prime = np.hypot(a1_prime, b1)
+	C2_prime = np.hypot(a2_prime, b2)
+	h1_prime = np.arctan2(b1, a1_prime) % (2 * np.pi)
+	h2_prime = np.arctan2(b2, a2_prime) % (2 * np.pi)
+
+	# Hue difference and mean hue are taken the short way around, and are undefined (0) for achromatic colors
+	chromatic = (C1_prime * C2_prime) != 0
+	h_difference = h2_prime - h1_prime
+	h_difference = np.where(h_difference > np.pi, h_difference - 2 * np.pi, np.where(h_difference < -np.pi, h_difference + 2 * np.pi, h_difference))
+	h_difference = np.where(chromatic, h_difference, 0)
+	H_difference = 2 * np.sqrt(C1_prime * C2_prime) * np.sin(h_difference / 2)
+
+	h_sum = h1_prime + h2_prime
+	h_mean = np.where(np.abs(h1_prime - h2_prime) <= np.pi, h_sum / 2, np.where(h_sum < 2 * np.pi, (h_sum + 2 * np.pi) / 2, (h_sum - 2 * np.pi) / 2))
+	h_mean = np.where(chromatic, h_mean, h_sum)
+
+	L_difference = L2 - L1
+	C_difference = C2_prime - C1_prime
+	L_mean = (L1 + L2) / 2
+	C_prime_mean = (C1_prime + C2_prime) / 2
+
+	# Cosines of multiples of the mean hue come from its cosine and sine, which is a lot faster than calling cos for each
+	cos_1, sin_1 = np.cos(h_mean), np.sin(h_mean)
+	cos_2, sin_2 = 2 * cos_1 * cos_1 - 1, 2 * sin_1 * cos_1
+	cos_3, sin_3 = cos_1 * (2 * cos_2 - 1), sin_1 * (2 * cos_2 + 1)
+	cos_4, sin_4 = 2 * cos_2 * cos_2 - 1, 2 * sin_2 * cos_2
+	T = (1 - 0.17 * (cos_1 * np.cos(np.radians(30)) + sin_1 * np.sin(np.radians(30))) + 0.24 * cos_2
+		+ 0.32 * (cos_3 * np.cos(np.radians(6)) - sin_3 * np.sin(np.radians(6)))
+		- 0.20 * (cos_4 * np.cos(np.radians(63)) + sin_4 * np.sin(np.radians(63))))
+	theta_difference = np.radians(30) * np.exp(-((np.degrees(h_mean) - 275) / 25) ** 2)
+	C_prime_mean_7 = C_prime_mean ** 7
+	R_C = 2 * np.sqrt(C_prime_mean_7 / (C_prime_mean_7 + 25.0 ** 7))
+	L_offset = (L_mean - 50) ** 2
+	S_L = 1 + 0.015 * L_offset / np.sqrt(20 + L_offset)
+	S_C = 1 + 0.045 * C_prime_mean
+	S_H = 1 + 0.015 * C_prime_mean * T
+	R_T = -np.sin(2 * theta_difference) * R_C
+
+	L_term = L_difference / S_L
+	C_term = C_difference / S_C
+	H_term = H_difference / S_H
+	return np.sqrt(L_term ** 2 + C_term ** 2 + H_term ** 2 + R_T * C_term * H_term)
+
+def delta_e_2000_lower_bound(lab1: np.ndarray, lab2: np.ndarray) -> np.ndarray:
+	'''Returns (n, m) squared lower bound of CIEDE2000 difference between (n, 3) and (m, 3) Lab arrays, that is much cheaper to calculate.
+
+	In delta_e_2000, squared chroma and hue differences add up to the squared distance between (a', b') points,
+	which is at least their (a, b) distance with a scaled by 1 + G. S_C and S_H are at most 1 + 0.045 * C'_mean,
+	C'_mean is at most (1 + G) times the mean chroma, and the rotation term R_T * C * H is at least
+	-|R_T| / 2 * (C ** 2 + H ** 2), where |R_T| <= sin(60 degrees) * R_C.'''
+	L1, L2 = lab1[:, 0, None], lab2[None, :, 0]
+	L_offset = (L1 + L2) / 2 - 50
+	L_offset *= L_offset
+	S_L = 1 + 0.015 * L_offset / np.sqrt(20 + L_offset)
+	L_term = (L1 - L2) / S_L
+
+	C_mean = (np.hypot(lab1[:, 1], lab1[:, 2])[:, None] + np.hypot(lab2[:, 1], lab2[:, 2])[None, :]) / 2
+	C_mean_7 = C_mean * C_mean
+	C_mean_7 = C_mean_7 * C_mean_7 * C_mean_7 * C_mean
+	a_scale = 1.5 - 0.5 * np.sqrt(C_mean_7 / (C_mean_7 + 25.0 ** 7))
+	a_difference = (lab1[:, 1, None] - lab2[None, :, 1]) * a_scale
+	b_difference = lab1[:, 2, None] - lab2[None, :, 2]
+
+	C_prime_max = a_scale * C_mean
+	C_prime_max_7 = C_prime_max * C_prime_max
+	C_prime_max_7 = C_prime_max_7 * C_prime_max_7 * C_prime_max_7 * C_prime_max
+	R_C_max = 2 * np.sqrt(C_prime_max_7 / (C_prime_max_7 + 25.0 ** 7))
+	S_C_max = 1 + 0.045 * C_prime_max
+	return L_term * L_term + (1 - np.sin(np.radians(60)) / 2 * R_C_max) * (a_difference * a_difference + b_difference * b_difference) / (S_C_max * S_C_max)
@@ -1,9 +1,13 @@
-from typing import Callable
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
 
 import moviepy.editor as mp
 import numpy as np
 from PIL import Image
 
+from .utils import get_chunks_view, get_workers_count
+
 def process_video_with_pil(video: mp.VideoFileClip, process_frame: Callable) -> mp.VideoFileClip:
 	# Get the original frame rate and audio
 	audio = video.audio
@@ -28,4 +32,140 @@ def process_video_with_pil(video: mp.VideoFileClip, process_frame: Callable) ->
 	processed_video = processed_video.set_audio(audio)
 
 	# Save the modified video with the same frame rate and audio
-	return processed_video
\ No newline at end of file
+	return processed_video
+
+# Frame processing function of the current worker process and the function returning its stats delta, set once by _init_worker,
+# so the palette and lookup table state isn't sent along with every frame.
+_worker_process_frame: Optional[Callable] = None
+_worker_pop_stats: Optional[Callable[[], Dict[str, Any]]] = None
+
+def _init_worker(process_frame: Callable, pop_stats: Optional[Callable[[], Dict[str, Any]]] = None) -> None:
+	global _worker_process_frame, _worker_pop_stats
+	_worker_process_frame = process_frame
+	_worker_pop_stats = pop_stats
+
+def _process_frame_in_worker(frame: np.ndarray):
+	converted = np.array(_worker_process_frame(Image.fromarray(frame)))
+	return converted, _worker_pop_stats() if _worker_pop_stats is not None else None
+
+def convert_frames_parallel(frames: Iterable[np.ndarray], process_frame: Callable, workers: int = 0, max_pending: int = 0,
+		pop_stats: Optional[Callable[[], Dict[str, Any]]] = None, merge_stats: Optional[Callable[[Dict[str, Any]], None]] = None) -> Iterator[np.ndarray]:
+	'''Converts frames across a pool of worker processes, and yields them in the original order.
+	At most max_pending frames (2 per worker by default) are decoded and not yet yielded at once,
+	so memory stays bounded for long clips. Workers call pop_stats (like Launch.pop_stats_delta) after every frame,
+	and merge_stats (like Launch.merge_stats_delta) gets the result in this process.'''
+	workers = get_workers_count(workers)
+	max_pending = max_pending or workers * 2
+
+	def get_result(future) -> np.ndarray:
+		converted, stats = future.result()
+		if stats is not None and merge_stats is not None:
+			merge_stats(stats)
+		return converted
+
+	with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(process_frame, pop_stats)) as executor:
+		pending = deque()
+		for frame in frames:
+			pending.append(executor.submit(_process_frame_in_worker, frame))
+			if len(pending) >= max_pending:
+				yield get_result(pending.popleft())
+		while pending:
+			yield get_result(pending.popleft())
+
+class OrderedFrames:
+	'''Serves frames from an iterator by time, for clips that are read sequentially (like when they are written).'''
+	def __init__(self, frames: Iterable[np.ndarray], fps: float) -> None:
+		self.frames = iter(frames)
+		self.fps = fps
+		self.index = -1
+		self.frame = None
+
+	def get_frame(self, t: float) -> np.ndarray:
+		index = int(round(t * self.fps))
+		while self.index < index:
+			try:
+				self.frame = next(self.frames)
+			except StopIteration:
+				break
+			self.index += 1
+		return self.frame
+
+def process_video_parallel(video: mp.VideoFileClip, process_frame: Callable, workers: int = 0, max_pending: int = 0,
+		pop_stats: Optional[Callable[[], Dict[str, Any]]] = None, merge_stats: Optional[Callable[[Dict[str, Any]], None]] = None) -> mp.VideoClip:
+	'''Same as process_video_with_pil, but frames are converted by a pool of worker processes, see convert_frames_parallel.
+	process_frame has to be picklable, every worker gets its own copy once when it starts.'''
+	frames = convert_frames_parallel(video.iter_frames(), process_frame, workers, max_pending, pop_stats, merge_stats)
+	ordered_frames = OrderedFrames(frames, video.fps)
+
+	processed_video = mp.VideoClip(ordered_frames.get_frame, duration=video.duration)
+	processed_video = processed_video.set_audio(video.audio)
+	return processed_video
+
+class TemporalFrameConverter:
+	'''Converts consecutive video frames, matching only chunks that changed since they were last matched.
+	Other chunks reuse their previous block index and rendered tile.
+
+	A chunk counts as changed when the mean absolute difference of its pixels, against the pixels it was last matched with,
+	is above threshold. Comparing against the last matched pixels (and not the previous frame) keeps slow changes from drifting away.
+	With threshold 0 only identical chunks are reused, so the output is the same as converting every frame.'''
+	def __init__(self, launch: Any, threshold: float = 0) -> None:
+		self.launch = launch
+		self.threshold = threshold
+
+		self.reference: Optional[np.ndarray] = None
+		self.index_matrix: Optional[np.ndarray] = None
+		self.output: Optional[np.ndarray] = None
+
+		self.chunks_total = 0
+		self.chunks_reused = 0
+
+	@property
+	def reused_fraction(self) -> float:
+		'''Fraction of chunks that reused the block of the previous frame.'''
+		return self.chunks_reused / self.chunks_total if self.chunks_total else 0.0
+
+	def get_changed_chunks(self, image: np.ndarray, chunk_size: int = 16) -> np.ndarray:
+		'''Returns a (chunks_x, chunks_y) mask of chunks that have to be matched again.'''
+		chunks = get_chunks_view(image, chunk_size)
+		if self.reference is None or self.reference.shape != image.shape:
+			return np.ones(chunks.shape[:2], dtype=bool)
+		difference = np.abs(image.astype(np.int16) - self.reference)
+		return get_chunks_view(difference, chunk_size).mean(axis=(2, 3, 4)) > self.threshold
+
+	def convert_frame(self, frame: np.ndarray) -> np.ndarray:
+		textures = self.launch.textures
+		stats = self.launch.stats
+		chunk_size = 16
+		with stats.stage("preprocess"):
+			image = np.asarray(self.launch.preprocess_image(Image.fromarray(frame)))
+			changed = self.get_changed_chunks(image, chunk_size)
+		chunks_x, chunks_y = changed.shape
+
+		if self.reference is None or self.reference.shape != image.shape:
+			self.reference = image.copy()
+			self.index_matrix = np.zeros((chunks_x, chunks_y), dtype=np.intp)
+			self.output = np.empty((chunks_y * textures.shape[1], chunks_x * textures.shape[2], 3), dtype=np.uint8)
+		else:
+			get_chunks_view(self.reference, chunk_size)[changed] = get_chunks_view(image, chunk_size)[changed]
+
+		with stats.stage("medians"):
+			medians = self.launch.get_chunk_colors(get_chunks_view(image, chunk_size)[changed])
+		with stats.stage("matching"):
+			closest = self.launch.method_settings.find_closest_blocks(medians, self.launch.method_name)
+		self.index_matrix[changed] = closest
+		with stats.stage("rendering"):
+			get_chunks_view(self.output, textures.shape[1])[changed] = textures[closest]
+
+		with stats.lock:
+			stats.chunks += changed.size
+			stats.chunks_total += changed.size
+			stats.chunks_reused += changed.size - len(closest)
+		self.chunks_total += changed.size
+		self.chunks_reused += changed.size - len(closest)
+		return self.output.copy()
+
+def process_video_incremental(video: mp.VideoFileClip, converter: TemporalFrameConverter) -> mp.VideoFileClip:
+	'''Same as process_video_with_pil, but frames are converted by a TemporalFrameConverter.'''
+	processed_video = video.fl_image(converter.convert_frame)
+	processed_video = processed_video.set_audio(video.audio)
+	return processed_video
@@ -0,0 +1,76 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+DITHERING = ["none", "ordered", "floyd_steinberg"]
+
+def get_bayer_matrix(size: int = 8) -> np.ndarray:
+	'''Returns (size, size) Bayer threshold matrix with values from 0 to size * size - 1, size has to be a power of two.'''
+	matrix = np.zeros((1, 1), dtype=np.int64)
+	while len(matrix) < size:
+		matrix = np.block([[4 * matrix, 4 * matrix + 2], [4 * matrix + 3, 4 * matrix + 1]])
+	return matrix
+
+def get_palette_spread(palette: np.ndarray) -> float:
+	'''Returns median distance from a block to its closest other block, which is how far apart palette colors usually are.'''
+	if len(palette) < 2:
+		return 0.0
+	distances = np.sqrt(((palette[:, None, :] - palette[None, :, :]) ** 2).sum(axis=2))
+	np.fill_diagonal(distances, np.inf)
+	distances = distances.min(axis=1)
+	return float(np.median(distances[np.isfinite(distances)]))
+
+def ordered_dither(medians: np.ndarray, palette: np.ndarray, row_offset: int = 0, size: int = 8) -> np.ndarray:
+	'''Returns (chunks_x, chunks_y, 3) medians with a Bayer pattern added to them, scaled by the palette spread,
+	so that matching them gives an ordered dithering of the image. row_offset is the row of the first chunk, for strips.'''
+	chunks_x, chunks_y = medians.shape[:2]
+	thresholds = (get_bayer_matrix(size) + 0.5) / (size * size) - 0.5
+	rows = (np.arange(chunks_y) + row_offset) % size
+	columns = np.arange(chunks_x) % size
+	offsets = thresholds[rows[None, :], columns[:, None]] * get_palette_spread(palette)
+	return np.clip(medians + offsets[..., None], 0, 255)
+
+def floyd_steinberg(medians: np.ndarray, method_settings, method: str, previous_errors: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+	'''Matches (chunks_x, chunks_y, 3) medians with Floyd-Steinberg error diffusion, rows top to bottom and chunks left to right.
+	Returns the (chunks_x, chunks_y) index matrix, and the errors of the last row, which can be passed as previous_errors
+	of the next strip of rows to continue diffusing into it.
+
+	Every chunk only depends on the chunk to its left and the three above it, so all chunks on a line where x + 2 * y is the same
+	are independent, and are matched together. This takes chunks_x + 2 * chunks_y steps instead of one step per chunk.'''
+	chunks_x, chunks_y = medians.shape[:2]
+	palette = method_settings.palette
+	index_matrix = np.empty((chunks_x, chunks_y), dtype=np.intp)
+	if medians.size == 0:
+		return index_matrix, np.zeros((chunks_x, 3))
+
+	# Errors of every chunk, with an extra row above (errors of the previous strip) and a column of zeros on both sides
+	errors = np.zeros((chunks_y + 1, chunks_x + 2, 3))
+	if previous_errors is not None:
+		errors[0, 1:-1] = previous_errors
+
+	for step in range(chunks_x + 2 * (chunks_y - 1)):
+		ys = np.arange(max(0, (step - chunks_x + 2) // 2), min(chunks_y - 1, step // 2) + 1)
+		xs = step - 2 * ys
+		# Positions in errors are shifted by one row and one column
+		rows, columns = ys + 1, xs + 1
+		values = (medians[xs, ys]
+			+ errors[rows, columns - 1] * (7 / 16)
+			+ errors[rows - 1, columns + 1] * (3 / 16)
+			+ errors[rows - 1, columns] * (5 / 16)
+			+ errors[rows - 1, columns - 1] * (1 / 16))
+		values = np.clip(values, 0, 255)
+		closest = method_settings.find_closest_blocks(values, method)
+		index_matrix[xs, ys] = closest
+		errors[rows, columns] = values - palette[closest]
+	return index_matrix, errors[-1, 1:-1].copy()
+
+def dither(medians: np.ndarray, method_settings, method: str, dithering: str = "none", row_offset: int = 0, previous_errors: Optional[np.ndarray] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+	'''Returns (chunks_x, chunks_y) index matrix of medians matched with dithering (one of DITHERING), and errors to pass as
+	previous_errors of the next strip (only for floyd_steinberg, None otherwise). row_offset is the row of the first chunk of a strip.'''
+	if dithering == "none":
+		return method_settings.find_closest_blocks(medians, method), None
+	if dithering == "ordered":
+		return method_settings.find_closest_blocks(ordered_dither(medians, method_settings.palette, row_offset), method), None
+	if dithering == "floyd_steinberg":
+		return floyd_steinberg(medians, method_settings, method, previous_errors)
+	raise ValueError(f"Unknown dithering {dithering!r}, expected one of {DITHERING}")
@@ -1,23 +1,77 @@
+import os
 import re
-from typing import List, Dict
-import requests
+from typing import Iterator, List, Dict
 
-from .utils import resource_path
+from .utils import resource_path, get_execution_folder
+
+LINK_TO_BLOCKS_LIST = "https://raw.githubusercontent.com/Yurihaia/mc-nbtdoc/master/minecraft/generated/item.nbtdoc"
+BUNDLED_BLOCKS_LIST_FILENAME = "minecraft_valid_blocks.txt"
+CACHED_NBTDOC_FILENAME = "item.nbtdoc"
+# Seconds to wait for the server to connect, and between received chunks
+DOWNLOAD_TIMEOUT = 30
+
+def download_nbtdoc(path: str, link: str = LINK_TO_BLOCKS_LIST, timeout: float = DOWNLOAD_TIMEOUT) -> None:
+	'''Downloads .nbtdoc file to path, streaming it to disk. Raises TimeoutError if the server doesn't connect
+	or stops sending data for timeout seconds.'''
+	import requests
+	from urllib3.exceptions import ReadTimeoutError
+	temp_path = path + ".part"
+	try:
+		with requests.get(link, stream=True, timeout=timeout) as response:
+			response.raise_for_status()
+			with open(temp_path, "wb") as f:
+				for chunk in response.iter_content(chunk_size=64 * 1024):
+					f.write(chunk)
+	except requests.exceptions.RequestException as e:
+		if os.path.exists(temp_path):
+			os.remove(temp_path)
+		# Timeouts while reading the body are raised as ConnectionError
+		if not isinstance(e, requests.exceptions.Timeout) and not isinstance(e.__context__, ReadTimeoutError):
+			raise
+		raise TimeoutError(f"Downloading {link} timed out after {timeout} s, try again later, "
+			"or pass a list of blocks with --valid_blocks_filename") from None
+	os.replace(temp_path, path)
+
+def get_valid_blocks_filename(valid_blocks_filename: str = None, refresh: bool = False) -> str:
+	'''Returns the file valid blocks are read from: the given file if any, otherwise .nbtdoc downloaded by a previous refresh,
+	otherwise the block list bundled with the program. With refresh, the .nbtdoc is downloaded again first.'''
+	cached_nbtdoc = os.path.join(get_execution_folder(), CACHED_NBTDOC_FILENAME)
+	if refresh:
+		download_nbtdoc(cached_nbtdoc)
+	if valid_blocks_filename:
+		return valid_blocks_filename
+	if os.path.exists(cached_nbtdoc):
+		return cached_nbtdoc
+	return resource_path(BUNDLED_BLOCKS_LIST_FILENAME)
 
 class ValidBlocksClient:
-	def __init__(self, txt_atlas_filename: str) -> None:
-		self.LINK_TO_BLOCKS_LIST = "https://raw.githubusercontent.com/Yurihaia/mc-nbtdoc/master/minecraft/generated/item.nbtdoc"
+	def __init__(self, txt_atlas_filename: str, valid_blocks_filename: str = None) -> None:
+		self.LINK_TO_BLOCKS_LIST = LINK_TO_BLOCKS_LIST
 		self.BLOCK_INFO_PLACE_PATTERN = r"minecraft:block/([\w]+)	x=(\d+)	y=(\d+)"
 		self.NBTDOC_START = '::minecraft::item::blockitem::BlockItem describes minecraft:item['
 		self.NBTDOC_END = '];'
 		self.TXT_ATLAS_FILENAME = txt_atlas_filename
-		self.response = requests.get(self.LINK_TO_BLOCKS_LIST)
+		self.VALID_BLOCKS_FILENAME = get_valid_blocks_filename(valid_blocks_filename)
+
+	def _iter_lines(self) -> Iterator[str]:
+		'''Reads valid blocks file line by line, without loading all of it.'''
+		with open(self.VALID_BLOCKS_FILENAME, "r", encoding="utf-8") as blocks_fp:
+			for line in blocks_fp:
+				yield line.rstrip("\r\n")
 
 	def _get_valid_blocks_list_from_response(self) -> List[str]:
-		'''Function for reading .nbtdoc file, and getting list of all valid blocks (that can be placed)'''
-		start = False
+		'''Function for reading .nbtdoc file, and getting list of all valid blocks (that can be placed).
+		Any other file is read as a plain list with one block on every line, lines starting with # are skipped.'''
 		valid_blocks = list()
-		for line in self.response.text.split("\n"):
+		if not self.VALID_BLOCKS_FILENAME.endswith(".nbtdoc"):
+			for line in self._iter_lines():
+				line = line.strip()
+				if line and not line.startswith("#"):
+					valid_blocks.append(line.removeprefix("minecraft:"))
+			return valid_blocks
+
+		start = False
+		for line in self._iter_lines():
 			if line == self.NBTDOC_END:
 				start = False
 			if start:
@@ -1,135 +1,453 @@
-from typing import Tuple, Callable, Any
+from typing import Callable, Dict, List
+from functools import partial
 
+import numpy as np
 from PIL import Image, ImageStat
-from scipy.spatial.distance import cosine
-
-def generate_color_variations(color_dict, max_abs_difference=16):
-	'''Creates color combinations in given max_abs_difference.'''
-	new_dict = {}
-	
-	for rgb_tuple, value in color_dict.items():
-		r, g, b = rgb_tuple
-		
-		for dr in range(-max_abs_difference, max_abs_difference + 1):
-			new_r = r + dr
-			
-			if not 0 <= new_r <= 255:
-				continue
-			
-			for dg in range(-max_abs_difference, max_abs_difference + 1):
-				new_g = g + dg
-				
-				if not 0 <= new_g <= 255:
-					continue
-				
-				for db in range(-max_abs_difference, max_abs_difference + 1):
-					new_b = b + db
-					
-					if 0 <= new_b <= 255:
-						total_diff = abs(new_r - r) + abs(new_g - g) + abs(new_b - b)
-						
-						if total_diff <= max_abs_difference:
-							new_rgb_tuple = (new_r, new_g, new_b)
-							new_dict[new_rgb_tuple] = value
-	return new_dict
+
+from .color import rgb_to_lab, delta_e_2000, delta_e_2000_lower_bound
+from .utils import get_signatures
+from .shared import create_shared_array
+from .threads import get_bands, thread_map
+
+# Amount of colors compared against the whole palette at once,
+# bounds the size of the (batch, n_blocks, 3) distance arrays.
+BATCH_SIZE = 4096
+# Amount of nearest blocks queried from the palette index, which are then compared exactly.
+INDEX_CANDIDATES = 8
+# Candidates this close to the best one are treated as a possible tie,
+# which might continue outside of the queried candidates.
+INDEX_TOLERANCE = 1e-9
+# Amount of colors compared with CIEDE2000 at once, small enough for the (batch, n_blocks) arrays to stay in CPU cache.
+DELTA_E_BATCH_SIZE = 64
+# Blocks with the lowest lower bound, whose exact CIEDE2000 difference is the upper bound for pruning the rest.
+DELTA_E_CANDIDATES = 4
+# Smallest amount of lookup table cells matched by a thread, fewer are matched in the calling thread.
+MIN_THREAD_CELLS = 256
+# Iterations of k-means building the clusters of PaletteClusters.
+CLUSTER_ITERATIONS = 20
+
+def get_lut_step(compression_level: int) -> int:
+	'''Returns the biggest power of two quantization step of the color lookup table,
+	where every color is at most compression_level (sum of absolute RGB differences)
+	away from the color its cell was matched with.'''
+	step = 1
+	while step < 128 and 3 * (step * 2) // 2 <= compression_level:
+		step *= 2
+	return step
+
+def rgb_abs_diff(medians: np.ndarray, palette: np.ndarray) -> np.ndarray:
+	'''For each channel finds the block with the closest value in that channel,
+	then out of these three blocks picks the one with the lowest sum of absolute differences.'''
+	candidates = np.abs(medians[:, None, :] - palette[None, :, :]).argmin(axis=1)
+	candidates_diff = np.abs(palette[candidates] - medians[:, None, :]).sum(axis=2)
+	return candidates[np.arange(len(medians)), candidates_diff.argmin(axis=1)]
+
+def minkowski_distance(medians: np.ndarray, palette: np.ndarray, p: int = 2) -> np.ndarray:
+	'''Returns index of the block with the lowest Minkowski distance for every median.'''
+	distances = (np.abs(medians[:, None, :] - palette[None, :, :]) ** p).sum(axis=2) ** (1 / p)
+	return distances.argmin(axis=1)
+
+def cosine_similarity(medians: np.ndarray, palette: np.ndarray) -> np.ndarray:
+	'''Returns index of the block with the highest cosine similarity for every median,
+	calculated the same way as 1 - scipy.spatial.distance.cosine.'''
+	uv = medians @ palette.T
+	uu = (medians * medians).sum(axis=1)
+	vv = (palette * palette).sum(axis=1)
+	with np.errstate(divide="ignore", invalid="ignore"):
+		similarity = 1 - np.clip(1 - uv / np.sqrt(uu[:, None] * vv[None, :]), 0.0, 2.0)
+	# Black medians or blocks have no direction, so they are never the most similar.
+	similarity[np.isnan(similarity)] = -np.inf
+	return similarity.argmax(axis=1)
+
+def hamming_distance(medians: np.ndarray, palette: np.ndarray) -> np.ndarray:
+	'''Returns index of the block with the least amount of different channels for every median.'''
+	return (medians[:, None, :] != palette[None, :, :]).sum(axis=2).argmin(axis=1)
+
+def canberra_distance(medians: np.ndarray, palette: np.ndarray) -> np.ndarray:
+	'''Returns index of the block with the lowest Canberra distance for every median.'''
+	numerator = np.abs(medians[:, None, :] - palette[None, :, :])
+	denominator = np.abs(medians[:, None, :]) + np.abs(palette[None, :, :])
+	with np.errstate(divide="ignore", invalid="ignore"):
+		distances = np.where(denominator != 0, numerator / denominator, np.inf).sum(axis=2)
+	return distances.argmin(axis=1)
+
+def delta_e76_lab(medians: np.ndarray, palette: np.ndarray) -> np.ndarray:
+	'''Same as delta_e76, for medians and palette already converted to Lab.'''
+	return minkowski_distance(medians, palette, p=2)
+
+def delta_e2000_lab(medians: np.ndarray, palette: np.ndarray) -> np.ndarray:
+	'''Same as delta_e2000, for medians and palette already converted to Lab.
+	CIEDE2000 is only calculated for blocks whose lower bound is within the difference of the best of a few likely candidates,
+	which are usually less than a tenth of the palette. The result is the same as comparing with every block.'''
+	closest = np.empty(len(medians), dtype=np.intp)
+	candidates_count = min(DELTA_E_CANDIDATES, len(palette))
+	for start in range(0, len(medians), DELTA_E_BATCH_SIZE):
+		batch = medians[start:start + DELTA_E_BATCH_SIZE]
+		lower_bound = delta_e_2000_lower_bound(batch, palette)
+		candidates = np.argpartition(lower_bound, candidates_count - 1, axis=1)[:, :candidates_count]
+		upper_bound = delta_e_2000(batch[:, None, :], palette[candidates]).min(axis=1)
+
+		# Small margin for rounding errors of the bound
+		rows, blocks = np.nonzero(lower_bound <= (upper_bound[:, None] + 1e-6) ** 2)
+		differences = np.full(lower_bound.shape, np.inf)
+		differences[rows, blocks] = delta_e_2000(batch[rows], palette[blocks])
+		closest[start:start + DELTA_E_BATCH_SIZE] = differences.argmin(axis=1)
+	return closest
+
+def delta_e76(medians: np.ndarray, palette: np.ndarray) -> np.ndarray:
+	'''Returns index of the block with the lowest CIE76 difference (euclidean distance in CIELAB) for every median.'''
+	return delta_e76_lab(rgb_to_lab(medians), rgb_to_lab(palette))
+
+def delta_e2000(medians: np.ndarray, palette: np.ndarray) -> np.ndarray:
+	'''Returns index of the block with the lowest CIEDE2000 difference for every median.'''
+	return delta_e2000_lab(rgb_to_lab(medians), rgb_to_lab(palette))
+
+KERNELS: Dict[str, Callable[[np.ndarray, np.ndarray], np.ndarray]] = {
+	"abs_diff": rgb_abs_diff,
+	"euclidean": partial(minkowski_distance, p=2),
+	"chebyshev_distance": partial(minkowski_distance, p=3),
+	"manhattan_distance": partial(minkowski_distance, p=1),
+	"cosine_similarity": cosine_similarity,
+	"hamming_distance": hamming_distance,
+	"canberra_distance": canberra_distance,
+	"taxicab_distance": partial(minkowski_distance, p=4),
+	"delta_e76": delta_e76,
+	"delta_e2000": delta_e2000,
+}
+METHODS = ["abs_diff", "euclidean", "chebyshev_distance", "manhattan_distance", "cosine_similarity", "hamming_distance", "canberra_distance", "delta_e76", "delta_e2000"]
+# Matches texture signatures (utils.get_signatures) of chunks against those of block textures, instead of medians
+TEXTURE_METHOD = "texture"
+# Methods that compare with every block and get the coarse cluster level. abs_diff and hamming_distance are cheap and
+# don't pick the closest block by a distance clusters could follow, Minkowski, cosine and CIE76 use the exact palette index
+CLUSTERED_METHODS = ["canberra_distance", "delta_e2000"]
+MINKOWSKI_METHODS = {1: "manhattan_distance", 2: "euclidean", 3: "chebyshev_distance", 4: "taxicab_distance"}
+MINKOWSKI_P = {method: p for p, method in MINKOWSKI_METHODS.items()}
+
+class PaletteIndex:
+	'''Nearest neighbour index over block medians, built once per palette.
+	Minkowski distances are queried from a k-d tree over unique medians,
+	and cosine similarity from a k-d tree over normalized medians, as the closest direction is the most similar one.
+	A few nearest candidates are compared exactly, so the result (including ties) is the same as a linear scan.'''
+	def __init__(self, palette: np.ndarray) -> None:
+		from scipy.spatial import cKDTree
+		self.palette = palette
+
+		unique, first = np.unique(palette, axis=0, return_index=True)
+		self.minkowski_blocks = first
+		self.minkowski_tree = cKDTree(unique)
+
+		norms = np.sqrt((palette * palette).sum(axis=1))
+		self.cosine_blocks = np.flatnonzero(norms > 0)
+		self.cosine_tree = cKDTree(palette[self.cosine_blocks] / norms[self.cosine_blocks, None])
+
+	def _pick(self, colors: np.ndarray, candidates: np.ndarray, scores: np.ndarray, tree_size: int, kernel: Callable[[np.ndarray, np.ndarray], np.ndarray]) -> np.ndarray:
+		'''Picks the candidate with the lowest score, preferring the first block on ties.
+		Rows where every candidate is as good as the best one are matched with a linear scan.'''
+		best = scores.min(axis=1)
+		closest = np.where(scores == best[:, None], candidates, len(self.palette)).min(axis=1)
+		if candidates.shape[1] < tree_size:
+			unsure = scores.max(axis=1) - best <= INDEX_TOLERANCE
+			if unsure.any():
+				closest[unsure] = kernel(colors[unsure], self.palette)
+		return closest
+
+	def minkowski_distance(self, colors: np.ndarray, p: int = 2) -> np.ndarray:
+		'''Returns index of the block with the lowest Minkowski distance for every color.'''
+		tree_size = self.minkowski_tree.n
+		k = min(INDEX_CANDIDATES, tree_size)
+		_, nearest = self.minkowski_tree.query(colors, k=k, p=p)
+		candidates = self.minkowski_blocks[np.reshape(nearest, (len(colors), k))]
+		scores = (np.abs(colors[:, None, :] - self.palette[candidates]) ** p).sum(axis=2) ** (1 / p)
+		return self._pick(colors, candidates, scores, tree_size, partial(minkowski_distance, p=p))
+
+	def cosine_similarity(self, colors: np.ndarray) -> np.ndarray:
+		'''Returns index of the block with the highest cosine similarity for every color.'''
+		tree_size = self.cosine_tree.n
+		norms = np.sqrt((colors * colors).sum(axis=1))
+		closest = np.empty(len(colors), dtype=np.intp)
+		directed = norms > 0
+		if tree_size == 0 or not directed.all():
+			closest[~directed] = cosine_similarity(colors[~directed], self.palette)
+			if tree_size == 0:
+				closest[directed] = cosine_similarity(colors[directed], self.palette)
+				return closest
+
+		colors = colors[directed]
+		k = min(INDEX_CANDIDATES, tree_size)
+		_, nearest = self.cosine_tree.query(colors / norms[directed, None], k=k)
+		candidates = self.cosine_blocks[np.reshape(nearest, (len(colors), k))]
+		uv = (colors[:, None, :] * self.palette[candidates]).sum(axis=2)
+		uu = (colors * colors).sum(axis=1)
+		vv = (self.palette[candidates] * self.palette[candidates]).sum(axis=2)
+		similarity = 1 - np.clip(1 - uv / np.sqrt(uu[:, None] * vv), 0.0, 2.0)
+		closest[directed] = self._pick(colors, candidates, -similarity, tree_size, cosine_similarity)
+		return closest
+
+def get_clusters(points: np.ndarray, n_clusters: int, iterations: int = CLUSTER_ITERATIONS):
+	'''Returns (centroids, labels) of k-means clustering of points. Starts from the first point and the points farthest
+	from the centroids picked before, so the result doesn't depend on a random seed. Clusters that end up empty are dropped.'''
+	n_clusters = min(n_clusters, len(points))
+	first = [0]
+	distances = ((points - points[0]) ** 2).sum(axis=1)
+	for _ in range(n_clusters - 1):
+		first.append(int(distances.argmax()))
+		distances = np.minimum(distances, ((points - points[first[-1]]) ** 2).sum(axis=1))
+	centroids = points[first]
+	for _ in range(iterations):
+		labels = ((points[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+		used = np.unique(labels)
+		new_centroids = np.array([points[labels == cluster].mean(axis=0) for cluster in used])
+		if len(new_centroids) == len(centroids) and np.array_equal(new_centroids, centroids):
+			break
+		centroids = new_centroids
+	labels = ((points[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+	return centroids, labels
+
+class PaletteClusters:
+	'''Coarse level over the palette for methods that compare with every block: blocks are split into k-means clusters,
+	and every color is compared only with blocks of the probes clusters whose centroids are the closest to it.
+	This is approximate, a block in a cluster that wasn't probed can't be picked even if it would be the closest.'''
+	def __init__(self, palette: np.ndarray, n_clusters: int, probes: int = 3) -> None:
+		self.palette = palette
+		self.centroids, labels = get_clusters(palette, n_clusters)
+		self.members = [np.flatnonzero(labels == cluster) for cluster in range(len(self.centroids))]
+		self.probes = max(1, min(probes, len(self.centroids)))
+
+	def match(self, colors: np.ndarray, kernel: Callable[[np.ndarray, np.ndarray], np.ndarray]) -> np.ndarray:
+		'''Returns index of the block picked by kernel for every color, out of blocks of its closest clusters.
+		Colors with the same closest clusters are compared together.'''
+		distances = ((colors[:, None, :] - self.centroids[None, :, :]) ** 2).sum(axis=2)
+		probed = np.sort(np.argsort(distances, axis=1, kind="stable")[:, :self.probes], axis=1)
+		groups, inverse = np.unique(probed, axis=0, return_inverse=True)
+		inverse = inverse.reshape(-1)
+		order = np.argsort(inverse, kind="stable")
+		bounds = np.searchsorted(inverse[order], np.arange(len(groups) + 1))
+		closest = np.empty(len(colors), dtype=np.intp)
+		for group, clusters in enumerate(groups):
+			rows = order[bounds[group]:bounds[group + 1]]
+			# Sorted, so ties still go to the first block of the palette
+			candidates = np.sort(np.concatenate([self.members[cluster] for cluster in clusters]))
+			closest[rows] = candidates[kernel(colors[rows], self.palette[candidates])]
+		return closest
 
 class Method:
-	def __init__(self, blocks, compression_level: int = 16) -> None:
+	def __init__(self, blocks, compression_level: int = 16, signatures: np.ndarray = None, clusters: int = 0, cluster_probes: int = 3) -> None:
 		self.compression_level = compression_level
-		self.cache = dict()
 		self.blocks = blocks
+		self.names = list(blocks)
+		self.palette = np.array([blocks[block]["median"][:3] for block in self.names], dtype=np.float64).reshape(-1, 3)
+		# Palette in CIELAB for the perceptual methods, converted once
+		self.palette_lab = rgb_to_lab(self.palette)
+		# Texture signatures of blocks, in the same order, for TEXTURE_METHOD
+		self.signatures = signatures
+		self._index = None
+		self._lab_index = None
+		self._signature_tree = None
+		# Amount of clusters of the coarse level for CLUSTERED_METHODS, 0 compares with every block
+		self.clusters = clusters
+		self.cluster_probes = cluster_probes
+		self._palette_clusters = None
+		self._lab_palette_clusters = None
+		# Threads matching cells of the lookup table and querying signatures, 1 matches in the calling thread
+		self.threads = 1
+
+		# Color lookup tables, one per method. Colors are quantized by lut_step in every channel,
+		# and each cell holds 1 + index of the closest block to the center of the cell, or 0 if it wasn't matched yet.
+		self.lut_step = get_lut_step(compression_level)
+		self.lut_levels = 256 // self.lut_step
+		self.luts: Dict[str, np.ndarray] = dict()
+		# Chunks answered by a filled cell, chunks whose cell had to be matched first, and amount of filled cells
+		self.lut_hits = 0
+		self.lut_misses = 0
+		self.lut_entries = 0
+
+	@property
+	def index(self) -> PaletteIndex:
+		'''Nearest neighbour index of the palette, built the first time a method that uses it needs it.'''
+		if self._index is None:
+			self._index = PaletteIndex(self.palette)
+		return self._index
+
+	@property
+	def lab_index(self) -> PaletteIndex:
+		'''Nearest neighbour index of the palette in CIELAB, where euclidean distance is the CIE76 difference.'''
+		if self._lab_index is None:
+			self._lab_index = PaletteIndex(self.palette_lab)
+		return self._lab_index
+
+	@property
+	def palette_clusters(self) -> PaletteClusters:
+		'''Clusters of the palette, built the first time one of CLUSTERED_METHODS needs them.'''
+		if self._palette_clusters is None:
+			self._palette_clusters = PaletteClusters(self.palette, self.clusters, self.cluster_probes)
+		return self._palette_clusters
+
+	@property
+	def lab_palette_clusters(self) -> PaletteClusters:
+		'''Clusters of the palette in CIELAB, for CIEDE2000.'''
+		if self._lab_palette_clusters is None:
+			self._lab_palette_clusters = PaletteClusters(self.palette_lab, self.clusters, self.cluster_probes)
+		return self._lab_palette_clusters
+
+	@property
+	def signature_tree(self):
+		'''k-d tree over texture signatures of blocks, built the first time TEXTURE_METHOD is used.'''
+		if self._signature_tree is None:
+			if self.signatures is None:
+				raise ValueError(f"{TEXTURE_METHOD} method needs texture signatures of the palette")
+			from scipy.spatial import cKDTree
+			self._signature_tree = cKDTree(np.asarray(self.signatures, dtype=np.float64))
+		return self._signature_tree
+
+	def find_closest_signatures(self, signatures: np.ndarray) -> np.ndarray:
+		'''Returns an array with index (in self.names) of the block with the closest (euclidean) texture signature
+		for every signature in a (..., signature_size) array. These have too many dimensions for a lookup table,
+		so all of them are queried from the k-d tree at once.'''
+		signatures = np.asarray(signatures, dtype=np.float64)
+		flat = signatures.reshape(-1, signatures.shape[-1])
+		closest = np.empty(len(flat), dtype=np.intp)
+		for start in range(0, len(flat), BATCH_SIZE):
+			_, closest[start:start + BATCH_SIZE] = self.signature_tree.query(flat[start:start + BATCH_SIZE], workers=self.threads)
+		return closest.reshape(signatures.shape[:-1])
+
+	@property
+	def lut_nbytes(self) -> int:
+		'''Size of a single lookup table in bytes, known before it is created.'''
+		return self.lut_levels ** 3 * np.dtype(np.uint16).itemsize
+
+	def share_luts(self, methods: List[str]) -> None:
+		'''Moves lookup tables of the given methods into shared memory, keeping their cells.
+		Worker processes that get this Method afterwards (forked, or pickled for them) read and fill the same tables,
+		so cells matched by one worker are hits in all others. Cells are filled without locks: every process writes
+		the same value into a cell, and a 2 byte write can't be seen half done.'''
+		for method in methods:
+			if method == TEXTURE_METHOD:
+				continue
+			lut = create_shared_array(self.lut_levels ** 3, np.uint16)
+			if method in self.luts:
+				lut[:] = self.luts[method]
+			self.luts[method] = lut
+
+	def get_lut(self, method: str) -> np.ndarray:
+		'''Returns flat lookup table of the method, creating an empty one if needed.'''
+		if method not in self.luts:
+			self.luts[method] = np.zeros(self.lut_levels ** 3, dtype=np.uint16)
+		return self.luts[method]
+
+	def _cell_keys(self, colors: np.ndarray) -> np.ndarray:
+		cells = colors // self.lut_step
+		return (cells[:, 0] * self.lut_levels + cells[:, 1]) * self.lut_levels + cells[:, 2]
+
+	def match(self, colors: np.ndarray, method: str) -> np.ndarray:
+		'''Returns index of the closest block for every color in a (n, 3) float array, without the lookup table.
+		Minkowski distances and cosine similarity are queried from the palette index, which is exact and already sublinear.
+		Other methods scan the whole palette, CLUSTERED_METHODS only the closest clusters of it if clusters is set.'''
+		if method in MINKOWSKI_P:
+			return self.index.minkowski_distance(colors, MINKOWSKI_P[method])
+		if method == "cosine_similarity":
+			return self.index.cosine_similarity(colors)
+		if method == "delta_e76":
+			return self.lab_index.minkowski_distance(rgb_to_lab(colors), 2)
+		if method == "delta_e2000":
+			if self.clusters and method in CLUSTERED_METHODS:
+				return self.lab_palette_clusters.match(rgb_to_lab(colors), delta_e2000_lab)
+			return delta_e2000_lab(rgb_to_lab(colors), self.palette_lab)
+		if self.clusters and method in CLUSTERED_METHODS:
+			return self.palette_clusters.match(colors, KERNELS[method])
+		return KERNELS[method](colors, self.palette)
+
+	def _prepare(self, method: str) -> None:
+		'''Builds the index or clusters that match uses for the method, so threads don't build them at the same time.'''
+		if method in MINKOWSKI_P or method == "cosine_similarity":
+			self.index
+		elif method == "delta_e76":
+			self.lab_index
+		elif self.clusters and method == "delta_e2000":
+			self.lab_palette_clusters
+		elif self.clusters and method in CLUSTERED_METHODS:
+			self.palette_clusters
+
+	def _fill_cells(self, method: str, keys: np.ndarray, show_progress: bool = False) -> None:
+		'''Matches centers of the given lookup table cells against the palette.
+		With threads, cells are split into bands matched in parallel, keys are unique so no cell is written twice.'''
+		lut = self.get_lut(method)
+		levels = self.lut_levels
+		cells = np.stack([keys // (levels * levels), keys // levels % levels, keys % levels], axis=1)
+		centers = (cells * self.lut_step + self.lut_step // 2).astype(np.float64)
+
+		def fill(band) -> None:
+			for start in range(band[0], band[1], BATCH_SIZE):
+				stop = min(start + BATCH_SIZE, band[1])
+				lut[keys[start:stop]] = self.match(centers[start:stop], method) + 1
+
+		bands = get_bands(len(keys), self.threads, MIN_THREAD_CELLS)
+		if len(bands) > 1 and not show_progress:
+			self._prepare(method)
+			thread_map(fill, bands, self.threads)
+		else:
+			batches = range(0, len(keys), BATCH_SIZE)
+			if show_progress:
+				from tqdm import tqdm
+				batches = tqdm(batches)
+			for start in batches:
+				fill((start, min(start + BATCH_SIZE, len(keys))))
+		self.lut_entries += len(keys)
+
+	def build_lut(self, method: str, show_progress: bool = False) -> np.ndarray:
+		'''Fills every cell of the lookup table of the method, so all further lookups are plain indexing.'''
+		lut = self.get_lut(method)
+		self._fill_cells(method, np.flatnonzero(lut == 0), show_progress)
+		return lut
+
+	def find_closest_blocks(self, medians: np.ndarray, method: str, show_progress: bool = False) -> np.ndarray:
+		'''Returns an array with index (in self.names) of the closest block for every median in a (..., 3) array.
+		Cells of the lookup table that weren't used before are matched first.
+		With TEXTURE_METHOD medians are texture signatures instead, see find_closest_signatures.'''
+		if method == TEXTURE_METHOD:
+			return self.find_closest_signatures(medians)
+		lut = self.get_lut(method)
+		keys = self._cell_keys(np.asarray(medians, dtype=np.int64).reshape(-1, 3))
+		closest = lut[keys]
+		missing = closest == 0
+		misses = int(np.count_nonzero(missing))
+		self.lut_hits += len(keys) - misses
+		self.lut_misses += misses
+		if misses:
+			self._fill_cells(method, np.unique(keys[missing]), show_progress)
+			closest = lut[keys]
+		return (closest.astype(np.intp) - 1).reshape(np.shape(medians)[:-1])
+
+	def find_closest_block(self, chunk: Image, method: str) -> str:
+		'''Returns the block closest to the median of a single chunk.'''
+		img_median = np.array(ImageStat.Stat(chunk).median[:3])
+		return self.names[self.find_closest_blocks(img_median, method)]
 
-	def add_to_caching(self, median_rgb: Tuple[int, int, int], closest_block: str):
-		self.cache[median_rgb] = closest_block
-		new_dict = dict()
-		new_dict[median_rgb] = closest_block
-		all_permutations = generate_color_variations(new_dict, self.compression_level)
-		self.cache.update(all_permutations)
-
-	def check_caching(func: Callable[..., Any]):
-		'''Checks if chunk was already cached, and if so returns cached closest block.'''
-		def wrapper(self, chunk, *args, **kwargs):
-			img_median = tuple(ImageStat.Stat(chunk).median)
-			if img_median in self.cache:
-				return self.cache[img_median]
-			else:
-				return func(self, chunk, *args, **kwargs)
-		return wrapper
-
-	@check_caching
 	def find_closest_block_rgb_abs_diff(self, chunk: Image) -> str:
 		'''Calculates the median value of an input image.
 		Then compares this median to the medians for each block,
 		and returns the block with the closest match based on the sum of absolute differences between its RGB values and the median of the input image.
 		If there are multiple blocks with equal minimum difference, it will return the first one encountered.
 		'''
-		img_median = tuple(ImageStat.Stat(chunk).median)
-
-		rgb_closests_diff = []
-		for channel in range(3):
-			min_diff = float('inf')
-			for block in self.blocks:
-				diff = abs(img_median[channel] - self.blocks[block]["median"][channel])
-				if diff < min_diff:
-					min_diff = diff
-					min_diff_block = block
-			rgb_closests_diff.append(min_diff_block)
-		
-		lowest_difference = float("inf")
-		closest_block = None
-		for block in rgb_closests_diff:
-			difference = sum(abs(a - b) for a, b in zip(self.blocks[block]["median"], img_median))
-			if difference < lowest_difference:
-				lowest_difference = difference
-				closest_block = block
-		
-		self.add_to_caching(img_median, closest_block)
-		return closest_block
-
-	@check_caching
+		return self.find_closest_block(chunk, "abs_diff")
+
 	def find_closest_block_cosine_similarity(self, chunk: Image) -> str:
 		'''Calculates the median value of an input image.
 		Then compares this median to the medians for each block,
 		and returns the block with the closest match based on the cosine similarity between its RGB values and the median of the input image.
 		If there are multiple blocks with equal maximum similarity, it will return the first one encountered.
 		'''
-		img_median = tuple(ImageStat.Stat(chunk).median)
-
-		closest_block = None
-		max_similarity = -1
-		
-		for block in self.blocks:
-			block_rgb = self.blocks[block]["median"]
-			similarity = 1 - cosine(img_median, block_rgb)
-			
-			if similarity > max_similarity:
-				max_similarity = similarity
-				closest_block = block
-		
-		self.add_to_caching(img_median, closest_block)
-		return closest_block
-
-	@check_caching
+		return self.find_closest_block(chunk, "cosine_similarity")
+
 	def find_closest_block_minkowski_distance(self, chunk: Image, p: int=2) -> str:
 		'''Calculates the median value of an input image.
 		Then compares this median to the medians for each block,
 		and returns the block with the closest match based on the Minkowski distance between its RGB values and the median of the input image.
 		If there are multiple blocks with equal minimum distance, it will return the first one encountered.
 		'''
-		img_median = tuple(ImageStat.Stat(chunk).median)
-		closest_block = None
-		min_distance = float('inf')
-
-		for block in self.blocks:
-			block_rgb = self.blocks[block]["median"]
-			distance = sum(abs(a - b) ** p for a, b in zip(img_median, block_rgb)) ** (1 / p)
-
-			if distance < min_distance:
-				min_distance = distance
-				closest_block = block
-
-		self.add_to_caching(img_median, closest_block)
-		return closest_block
+		if p in MINKOWSKI_METHODS:
+			return self.find_closest_block(chunk, MINKOWSKI_METHODS[p])
+		img_median = np.array([ImageStat.Stat(chunk).median[:3]], dtype=np.float64)
+		return self.names[self.index.minkowski_distance(img_median, p)[0]]
 
 	def find_closest_block_manhattan_distance(self, chunk: Image) -> str:
 		return self.find_closest_block_minkowski_distance(chunk, 1)
@@ -143,50 +461,42 @@ class Method:
 	def find_closest_block_taxicab_distance(self, chunk: Image) -> str:
 		return self.find_closest_block_minkowski_distance(chunk, 4)
 
-	@check_caching
 	def find_closest_block_hamming_distance(self, chunk: Image) -> str:
 		'''Calculates the median value of an input image.
 		Then compares this median to the medians for each block,
 		and returns the block with the closest match based on the Hamming distance between its RGB values and the median of the input image.
 		If there are multiple blocks with equal minimum distance, it will return the first one encountered.
 		'''
-		img_median = tuple(ImageStat.Stat(chunk).median)
-
-		closest_block = None
-		min_distance = float('inf')
-
-		for block in self.blocks:
-			block_rgb = self.blocks[block]["median"]
-			distance = sum(a != b for a, b in zip(img_median, block_rgb))
+		return self.find_closest_block(chunk, "hamming_distance")
 
-			if distance < min_distance:
-				min_distance = distance
-				closest_block = block
-
-		self.add_to_caching(img_median, closest_block)
-		return closest_block
-
-	@check_caching
 	def find_closest_block_canberra_distance(self, chunk: Image) -> str:
 		'''Calculates the median value of an input image.
 		Then compares this median to the medians for each block,
 		and returns the block with the closest match based on the Canberra distance between its RGB values and the median of the input image.
 		If there are multiple blocks with equal minimum distance, it will return the first one encountered.
 		'''
-		img_median = tuple(ImageStat.Stat(chunk).median)
-		closest_block = None
-		min_distance = float('inf')
-
-		for block in self.blocks:
-			block_rgb = self.blocks[block]["median"]
-			distance = sum(
-				abs(a - b) / (abs(a) + abs(b)) if abs(a) + abs(b) != 0 else float('inf')
-				for a, b in zip(img_median, block_rgb)
-			)
-
-			if distance < min_distance:
-				min_distance = distance
-				closest_block = block
-
-		self.add_to_caching(img_median, closest_block)
-		return closest_block
\ No newline at end of file
+		return self.find_closest_block(chunk, "canberra_distance")
+
+	def find_closest_block_delta_e76(self, chunk: Image) -> str:
+		'''Calculates the median value of an input image.
+		Then compares this median to the medians for each block in CIELAB,
+		and returns the block with the closest match based on the CIE76 color difference (euclidean distance in CIELAB).
+		If there are multiple blocks with equal minimum difference, it will return the first one encountered.
+		'''
+		return self.find_closest_block(chunk, "delta_e76")
+
+	def find_closest_block_delta_e2000(self, chunk: Image) -> str:
+		'''Calculates the median value of an input image.
+		Then compares this median to the medians for each block in CIELAB,
+		and returns the block with the closest match based on the CIEDE2000 color difference, which follows human perception of colors the closest.
+		If there are multiple blocks with equal minimum difference, it will return the first one encountered.
+		'''
+		return self.find_closest_block(chunk, "delta_e2000")
+
+	def find_closest_block_texture(self, chunk: Image) -> str:
+		'''Calculates the texture signature of an input image, mean colors of its quarters and standard deviation of every channel.
+		Then compares it to the signatures of each block texture,
+		and returns the block with the closest match based on the euclidean distance between signatures.
+		'''
+		signature = get_signatures(np.asarray(chunk.convert("RGB")))
+		return self.names[self.find_closest_signatures(signature)]
@@ -1,23 +1,139 @@
-import os
-from typing import List
+import gzip
+import struct
+from typing import BinaryIO, List
 
-import mcschematic
+import numpy as np
 
-def create_2d_schematic(blocks: List[List[str]], output_path: str, bottom_block="black_wool"):
-	width = len(blocks[0])
-	height = len(blocks)
+# DataVersion of Minecraft Java Edition 1.20.1
+DATA_VERSION = 3465
+# Rows of the index matrix encoded and compressed at once
+ROWS_PER_WRITE = 256
+
+TAG_END = 0
+TAG_SHORT = 2
+TAG_INT = 3
+TAG_BYTE_ARRAY = 7
+TAG_STRING = 8
+TAG_LIST = 9
+TAG_COMPOUND = 10
+
+def _write_string(f: BinaryIO, string: str) -> None:
+	data = string.encode("utf-8")
+	f.write(struct.pack(">H", len(data)))
+	f.write(data)
+
+def _write_tag_header(f: BinaryIO, tag_type: int, name: str) -> None:
+	f.write(struct.pack(">B", tag_type))
+	_write_string(f, name)
+
+def _write_int(f: BinaryIO, name: str, value: int) -> None:
+	_write_tag_header(f, TAG_INT, name)
+	f.write(struct.pack(">i", value))
+
+def _write_short(f: BinaryIO, name: str, value: int) -> None:
+	_write_tag_header(f, TAG_SHORT, name)
+	f.write(struct.pack(">h", value))
+
+def get_varint_table(count: int) -> np.ndarray:
+	'''Returns (count, max_length) table with varint bytes of every number below count.
+	Unused bytes of shorter varints are left as 0.'''
+	numbers = np.arange(count, dtype=np.int64)
+	max_length = 1
+	while count - 1 >= 1 << (7 * max_length):
+		max_length += 1
+
+	table = np.zeros((count, max_length), dtype=np.uint8)
+	for byte in range(max_length):
+		value = numbers >> (7 * byte)
+		continues = value >= 128
+		table[:, byte] = np.where(value > 0, (value & 127) | (continues << 7), 0)
+	return table
+
+def get_varint_lengths(count: int) -> np.ndarray:
+	'''Returns amount of bytes in varints of every number below count.'''
+	numbers = np.arange(count, dtype=np.int64)
+	lengths = np.ones(count, dtype=np.int64)
+	while True:
+		numbers >>= 7
+		if not numbers.any():
+			return lengths
+		lengths += numbers > 0
+
+def encode_varints(ids: np.ndarray, table: np.ndarray, lengths: np.ndarray) -> bytes:
+	'''Encodes palette ids as varints, ids have to be below len(table).'''
+	ids = ids.ravel()
+	id_lengths = lengths[ids]
+	if table.shape[1] == 1:
+		return table[ids, 0].tobytes()
 
-	schematic = mcschematic.MCSchematic()
+	encoded = np.empty(int(id_lengths.sum()), dtype=np.uint8)
+	starts = np.cumsum(id_lengths) - id_lengths
+	for byte in range(table.shape[1]):
+		has_byte = id_lengths > byte
+		encoded[starts[has_byte] + byte] = table[ids[has_byte], byte]
+	return encoded.tobytes()
 
-	for y in range(height):
-		for x in range(width):
-			schematic.setBlock((x, 0, y), bottom_block)
+def write_2d_schematic(index_matrix: np.ndarray, names: List[str], output_path: str, bottom_block: str = "black_wool") -> None:
+	'''Writes Sponge .schem file (version 2) of a 2 blocks high layer: bottom_block under the blocks of the image.
+	index_matrix is a (chunks_x, chunks_y) matrix of indices into names, in the same layout as Launch.get_blocks_index_matrix,
+	so its first axis goes along Z and the second one along X, like create_2d_schematic always placed them.
 
-	for y in range(height):
-		for x in range(width):
-			block = blocks[y][x]
-			schematic.setBlock((x, 1, y), block)
+	The palette only holds blocks that are used, numbered the same way as setting blocks one by one would:
+	air, bottom_block, then every block in the order it first appears. BlockData is encoded for whole rows at once,
+	and compressed while it's written.'''
+	index_matrix = np.asarray(index_matrix)
+	length, width = index_matrix.shape
 
-	schem_name = os.path.splitext(os.path.basename(output_path))[0]
-	output_folder = os.path.dirname(output_path)
-	schematic.save(output_folder, schem_name, mcschematic.Version.JE_1_20_1)
+	# Palette ids of used blocks, in the order of their first appearance
+	used, first_positions, inverse = np.unique(index_matrix.ravel(), return_index=True, return_inverse=True)
+	palette = ["minecraft:air", bottom_block]
+	ids_of_used = np.empty(len(used), dtype=np.int64)
+	for i in np.argsort(first_positions, kind="stable"):
+		name = names[used[i]]
+		if name not in palette:
+			palette.append(name)
+		ids_of_used[i] = palette.index(name)
+	ids = ids_of_used[inverse].reshape(length, width)
+
+	table = get_varint_table(len(palette))
+	lengths = get_varint_lengths(len(palette))
+	block_data_length = int(lengths[1]) * length * width + int(lengths[ids].sum())
+
+	with gzip.open(output_path, "wb") as f:
+		_write_tag_header(f, TAG_COMPOUND, "Schematic")
+		_write_int(f, "Version", 2)
+		_write_int(f, "DataVersion", DATA_VERSION)
+
+		_write_tag_header(f, TAG_COMPOUND, "Metadata")
+		_write_int(f, "WEOffsetX", 0)
+		_write_int(f, "WEOffsetY", 0)
+		_write_int(f, "WEOffsetZ", 0)
+		f.write(struct.pack(">B", TAG_END))
+
+		_write_short(f, "Height", 2)
+		_write_short(f, "Length", length)
+		_write_short(f, "Width", width)
+
+		_write_int(f, "PaletteMax", len(palette))
+		_write_tag_header(f, TAG_COMPOUND, "Palette")
+		for palette_id, name in enumerate(palette):
+			_write_int(f, name, palette_id)
+		f.write(struct.pack(">B", TAG_END))
+
+		# Blocks are ordered by Y, then Z, then X, which is the C order of (height, length, width)
+		_write_tag_header(f, TAG_BYTE_ARRAY, "BlockData")
+		f.write(struct.pack(">i", block_data_length))
+		bottom_row = encode_varints(np.ones(width, dtype=np.int64), table, lengths)
+		for top in range(0, length, ROWS_PER_WRITE):
+			f.write(bottom_row * (min(top + ROWS_PER_WRITE, length) - top))
+		for top in range(0, length, ROWS_PER_WRITE):
+			f.write(encode_varints(ids[top:top + ROWS_PER_WRITE], table, lengths))
+
+		_write_tag_header(f, TAG_LIST, "BlockEntities")
+		f.write(struct.pack(">Bi", TAG_COMPOUND, 0))
+		f.write(struct.pack(">B", TAG_END))
+
+def create_2d_schematic(blocks: List[List[str]], output_path: str, bottom_block="black_wool"):
+	'''Writes .schem file from a matrix of block names, see write_2d_schematic.'''
+	names, index_matrix = np.unique(np.array(blocks, dtype=object), return_inverse=True)
+	write_2d_schematic(index_matrix.reshape(len(blocks), len(blocks[0])), names.tolist(), output_path, bottom_block)
@@ -0,0 +1,157 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from . import calculate_minecraft_blocks_median
+from . import download
+from .render import get_block_textures
+from .utils import resource_path, get_signatures
+
+# Bump when the layout of cache entries changes, so entries written by older versions are rebuilt.
+CACHE_VERSION = 2
+STATISTICS = ["median", "mean"]
+# Blocks in the palette whose model doesn't fill the whole block space, deduplication keeps full blocks over them
+PARTIAL_BLOCKS = {"comparator", "repeater", "farmland", "snow", "anvil", "chorus_plant", "chorus_flower", "dragon_egg"}
+
+def is_full_block(name: str) -> bool:
+	return name not in PARTIAL_BLOCKS and not name.endswith("_trapdoor")
+
+class Palette:
+	'''Blocks that can be used for conversion, with their atlas coordinates, statistic, textures and texture signatures, all in the same order.
+	medians hold whichever statistic the palette was built with. Signatures are calculated from textures if not given.'''
+	def __init__(self, names: List[str], coordinates: np.ndarray, medians: np.ndarray, textures: np.ndarray, signatures: Optional[np.ndarray] = None) -> None:
+		self.names = names
+		self.coordinates = coordinates
+		self.medians = medians
+		self.textures = textures
+		self.signatures = signatures if signatures is not None else get_signatures(np.asarray(textures))
+
+	def to_blocks(self) -> Dict:
+		'''Returns blocks in the same format as CalculateMinecraftBlocksMedian.get_blocks_with_rgb_medians.'''
+		blocks = dict()
+		for name, (x, y), median in zip(self.names, self.coordinates.tolist(), self.medians.tolist()):
+			blocks.update({name: {"x": x, "y": y, "median": median}})
+		return blocks
+
+	def subset(self, names: List[str]) -> "Palette":
+		'''Returns palette with only the given blocks, keeping the original order. Unknown names are ignored.'''
+		names = set(names)
+		indices = [i for i, name in enumerate(self.names) if name in names]
+		return Palette([self.names[i] for i in indices], self.coordinates[indices], self.medians[indices], self.textures[indices], self.signatures[indices])
+
+	def deduplicate(self, tolerance: int) -> "Palette":
+		'''Returns palette without blocks whose statistic is at most tolerance (sum of absolute RGB differences, like compression_level)
+		away from a block that is kept. Blocks are kept in a fixed order: full blocks first, then ones with the most uniform texture,
+		then by name, so the same palette always gives the same result. The original order is kept.'''
+		medians = np.asarray(self.medians, dtype=np.float64)[:, :3]
+		uniformity = np.asarray(self.signatures)[:, -3:].sum(axis=1)
+		order = sorted(range(len(self.names)), key=lambda i: (not is_full_block(self.names[i]), float(uniformity[i]), self.names[i]))
+		kept = list()
+		for i in order:
+			if not kept or np.abs(medians[kept] - medians[i]).sum(axis=1).min() > tolerance:
+				kept.append(i)
+		return self.subset([self.names[i] for i in kept])
+
+def get_cache_key(png_atlas_filename: str, txt_atlas_filename: str, filter: Optional[List[str]] = None, statistic: str = "median", valid_blocks_filename: str = None,
+		dedupe_tolerance: Optional[int] = None) -> str:
+	'''Returns hash of the atlas and valid blocks content, the filter set, the statistic and the deduplication tolerance, that identifies a cache entry.'''
+	key = hashlib.sha256()
+	for filename in (png_atlas_filename, txt_atlas_filename, download.get_valid_blocks_filename(valid_blocks_filename)):
+		with open(resource_path(filename), "rb") as f:
+			key.update(hashlib.sha256(f.read()).digest())
+	key.update(json.dumps({"version": CACHE_VERSION, "filter": sorted(set(filter)) if filter else None, "statistic": statistic,
+		"dedupe_tolerance": dedupe_tolerance}).encode())
+	return key.hexdigest()
+
+def save_palette(cache_folder: str, key: str, palette: Palette) -> None:
+	'''Writes palette to its own folder of .npy files, which is moved into place atomically.
+	Several processes can build the same entry at once (workers, or tools sharing the cache): the first one to move
+	its folder into place wins, and the others keep its entry. An existing entry is only replaced if it's invalid.'''
+	os.makedirs(cache_folder, exist_ok=True)
+	temp_folder = tempfile.mkdtemp(dir=cache_folder)
+	try:
+		np.save(os.path.join(temp_folder, "coordinates.npy"), palette.coordinates)
+		np.save(os.path.join(temp_folder, "medians.npy"), palette.medians)
+		np.save(os.path.join(temp_folder, "textures.npy"), palette.textures)
+		np.save(os.path.join(temp_folder, "signatures.npy"), palette.signatures)
+		with open(os.path.join(temp_folder, "meta.json"), "w") as f:
+			json.dump({"version": CACHE_VERSION, "key": key, "names": palette.names}, f)
+
+		entry_folder = os.path.join(cache_folder, key)
+		try:
+			os.replace(temp_folder, entry_folder)
+		except OSError:
+			# Another process placed the entry first, or a broken entry is in the way
+			if load_cached_palette(cache_folder, key) is None:
+				shutil.rmtree(entry_folder, ignore_errors=True)
+				try:
+					os.replace(temp_folder, entry_folder)
+				except OSError:
+					pass
+	finally:
+		shutil.rmtree(temp_folder, ignore_errors=True)
+
+def load_cached_palette(cache_folder: str, key: str) -> Optional[Palette]:
+	'''Returns memory mapped palette from the cache, or None if the entry is missing or invalid.'''
+	entry_folder = os.path.join(cache_folder, key)
+	try:
+		with open(os.path.join(entry_folder, "meta.json"), "r") as f:
+			meta = json.load(f)
+		if meta["version"] != CACHE_VERSION or meta["key"] != key:
+			return None
+		names = meta["names"]
+		coordinates = np.load(os.path.join(entry_folder, "coordinates.npy"), mmap_mode="r")
+		medians = np.load(os.path.join(entry_folder, "medians.npy"), mmap_mode="r")
+		textures = np.load(os.path.join(entry_folder, "textures.npy"), mmap_mode="r")
+		signatures = np.load(os.path.join(entry_folder, "signatures.npy"), mmap_mode="r")
+	except (OSError, ValueError, KeyError):
+		return None
+
+	if not len(names) == len(coordinates) == len(medians) == len(textures) == len(signatures):
+		return None
+	return Palette(names, coordinates, medians, textures, signatures)
+
+def build_palette(png_atlas_filename: str, txt_atlas_filename: str, statistic: str = "median", valid_blocks_filename: str = None) -> Palette:
+	'''Re-validates blocks against the valid blocks file, and calculates their statistic and textures from the atlas.'''
+	if statistic not in STATISTICS:
+		raise ValueError(f"Unknown statistic {statistic!r}, expected one of {STATISTICS}")
+
+	valid_client = download.ValidBlocksClient(txt_atlas_filename, valid_blocks_filename)
+	blocks = valid_client.exclude_invalid_blocks()
+	calculate_median = calculate_minecraft_blocks_median.CalculateMinecraftBlocksMedian(blocks, png_atlas_filename)
+	statistics = calculate_median.get_blocks_statistics((statistic, "transparent"))
+	opaque = ~statistics["transparent"]
+
+	names = [name for name, is_opaque in zip(blocks, opaque) if is_opaque]
+	coordinates = np.array([[blocks[name]["x"], blocks[name]["y"]] for name in names], dtype=np.int32).reshape(-1, 2)
+	medians = statistics[statistic][opaque]
+	with Image.open(resource_path(png_atlas_filename), "r") as blocks_image:
+		textures = get_block_textures(blocks_image, blocks, names)
+	return Palette(names, coordinates, medians, textures, get_signatures(textures))
+
+def load_palette(cache_folder: str, png_atlas_filename: str, txt_atlas_filename: str, filter: Optional[List[str]] = None, statistic: str = "median", valid_blocks_filename: str = None,
+		dedupe_tolerance: Optional[int] = None) -> Palette:
+	'''Returns palette for the atlas from the cache, building it (and the unfiltered palette it comes from) if needed.
+	With dedupe_tolerance, the palette is deduplicated (see Palette.deduplicate) and cached as its own entry,
+	so it's memory mapped like any other palette.'''
+	key = get_cache_key(png_atlas_filename, txt_atlas_filename, filter, statistic, valid_blocks_filename, dedupe_tolerance)
+	palette = load_cached_palette(cache_folder, key)
+	if palette is not None:
+		return palette
+
+	if dedupe_tolerance is not None:
+		palette = load_palette(cache_folder, png_atlas_filename, txt_atlas_filename, filter, statistic, valid_blocks_filename).deduplicate(dedupe_tolerance)
+	elif filter:
+		palette = load_palette(cache_folder, png_atlas_filename, txt_atlas_filename, None, statistic, valid_blocks_filename).subset(filter)
+	else:
+		palette = build_palette(png_atlas_filename, txt_atlas_filename, statistic, valid_blocks_filename)
+	save_palette(cache_folder, key, palette)
+	# Another process might have just replaced a broken entry, the palette built here is the same
+	cached = load_cached_palette(cache_folder, key)
+	return cached if cached is not None else palette
@@ -0,0 +1,200 @@
+import re
+import shutil
+import subprocess
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+from .utils import get_chunks_view
+from .dithering import dither
+from .find_closest import TEXTURE_METHOD
+
+def get_ffmpeg_exe() -> str:
+	'''Returns ffmpeg bundled with imageio-ffmpeg (a moviepy dependency), or the one on PATH.'''
+	try:
+		from imageio_ffmpeg import get_ffmpeg_exe as get_bundled_ffmpeg_exe
+		return get_bundled_ffmpeg_exe()
+	except (ImportError, RuntimeError):
+		ffmpeg = shutil.which("ffmpeg")
+		if ffmpeg is None:
+			raise RuntimeError("ffmpeg wasn't found, install imageio-ffmpeg or put ffmpeg on PATH")
+		return ffmpeg
+
+def parse_video_info(ffmpeg_output: str) -> Tuple[int, int, float, bool]:
+	'''Returns width, height, frame rate and whether there is an audio stream, from what ffmpeg -i prints about the input.'''
+	video = re.search(r"Stream #\S+.*?: Video: (.*)", ffmpeg_output)
+	if video is None:
+		raise ValueError("No video stream found")
+	size = re.search(r", (\d+)x(\d+)", video.group(1))
+	fps = re.search(r", ([\d.]+) (?:fps|tbr)", video.group(1))
+	if size is None or fps is None:
+		raise ValueError(f"Can't read size and frame rate of the video stream: {video.group(1)}")
+	has_audio = re.search(r"Stream #\S+.*?: Audio:", ffmpeg_output) is not None
+	return int(size.group(1)), int(size.group(2)), float(fps.group(1)), has_audio
+
+def probe_video(path: str, ffmpeg: str) -> Tuple[int, int, float, bool]:
+	'''Returns width, height, frame rate and whether there is an audio stream of a video file.'''
+	result = subprocess.run([ffmpeg, "-hide_banner", "-i", path], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+	return parse_video_info(result.stderr.decode("utf-8", "replace"))
+
+def get_scaled_size(width: int, height: int, scale_factor: float = 0) -> Tuple[int, int]:
+	'''Returns size of frames after scaling, same as utils.resize_image.'''
+	if scale_factor > 0:
+		return int(width * scale_factor), int(height * scale_factor)
+	if scale_factor < 0:
+		return int(width / abs(scale_factor)), int(height / abs(scale_factor))
+	return width, height
+
+def read_into(stream, buffer: np.ndarray) -> bool:
+	'''Fills buffer with bytes from stream, returns False if the stream ended first.'''
+	view = memoryview(buffer).cast("B")
+	filled = 0
+	while filled < len(view):
+		read = stream.readinto(view[filled:])
+		if not read:
+			return False
+		filled += read
+	return True
+
+class RawFrameConverter:
+	'''Converts (height, width, 3) frames into rendered blocks with buffers allocated once for the frame size.
+	With median methods and no dithering, frames go through medians, lookup table and rendering in place,
+	so converting a frame doesn't allocate anything once every color of it was matched before.
+	Other methods and target_blocks use the same functions as Launch.get_blocks_index_matrix.'''
+	def __init__(self, launch: Any, width: int, height: int, chunk_size: int = 16) -> None:
+		self.launch = launch
+		self.method_settings = launch.method_settings
+		self.method = launch.method_name
+		self.chunk_size = chunk_size
+		self.frame = np.empty((height, width, 3), dtype=np.uint8)
+
+		if launch.target_blocks is not None:
+			self.chunks_x, self.chunks_y = launch.get_target_blocks(width, height)
+		else:
+			self.chunks_x, self.chunks_y = width // chunk_size, height // chunk_size
+		self.in_place = launch.target_blocks is None and launch.dithering == "none" and self.method != TEXTURE_METHOD
+		if self.in_place:
+			self.chunks = np.empty((self.chunks_x, self.chunks_y, chunk_size * chunk_size, 3), dtype=np.uint8)
+			self.cells = np.empty((self.chunks_y, self.chunks_x, 3), dtype=np.int64)
+			self.keys = np.empty((self.chunks_y, self.chunks_x), dtype=np.int64)
+			self.lut_values = np.empty((self.chunks_y, self.chunks_x), dtype=np.uint16)
+			self.index_matrix = np.empty((self.chunks_y, self.chunks_x), dtype=np.intp)
+
+		textures = launch.textures
+		block_size = textures.shape[1]
+		self.block_size = block_size
+		# Row r of every texture, so rendering copies whole texture rows into the output
+		self.texture_rows = np.ascontiguousarray(np.transpose(textures, (1, 0, 2, 3)).reshape(block_size, len(textures), block_size * 3))
+		self.output = np.empty((self.chunks_y * block_size, self.chunks_x * block_size, 3), dtype=np.uint8)
+
+	def match_in_place(self) -> np.ndarray:
+		'''Returns (chunks_y, chunks_x) index matrix of self.frame from the lookup table, matching colors that aren't in it yet.'''
+		stats = self.launch.stats
+		settings = self.method_settings
+		with stats.stage("medians"):
+			np.copyto(self.chunks.reshape(self.chunks_x, self.chunks_y, self.chunk_size, self.chunk_size, 3), get_chunks_view(self.frame, self.chunk_size))
+			self.chunks.partition(len(self.chunks[0, 0]) // 2, axis=2)
+			medians = self.chunks[:, :, len(self.chunks[0, 0]) // 2]
+
+		with stats.stage("matching"):
+			lut = settings.get_lut(self.method)
+			np.floor_divide(medians.transpose(1, 0, 2), settings.lut_step, out=self.cells)
+			levels = settings.lut_levels
+			np.copyto(self.keys, self.cells[..., 0])
+			self.keys *= levels
+			self.keys += self.cells[..., 1]
+			self.keys *= levels
+			self.keys += self.cells[..., 2]
+			np.take(lut, self.keys, out=self.lut_values)
+			misses = self.lut_values.size - np.count_nonzero(self.lut_values)
+			if misses:
+				# Fills the missing cells, which is the only time a frame allocates
+				settings.find_closest_blocks(medians, self.method)
+				np.take(lut, self.keys, out=self.lut_values)
+			else:
+				settings.lut_hits += self.lut_values.size
+			np.subtract(self.lut_values, 1, out=self.index_matrix, casting="unsafe")
+		return self.index_matrix
+
+	def match(self) -> np.ndarray:
+		'''Returns (chunks_y, chunks_x) index matrix of self.frame.'''
+		if self.in_place:
+			return self.match_in_place()
+		launch = self.launch
+		with launch.stats.stage("medians"):
+			if launch.target_blocks is not None:
+				medians = launch.get_area_colors(self.frame)
+			else:
+				medians = launch.get_chunk_colors(get_chunks_view(self.frame, self.chunk_size))
+		with launch.stats.stage("matching"):
+			index_matrix, _ = dither(medians, self.method_settings, self.method, launch.dithering)
+		return index_matrix.T
+
+	def convert(self) -> np.ndarray:
+		'''Converts self.frame into self.output, and returns it.'''
+		index_matrix = self.match()
+		with self.launch.stats.stage("rendering"):
+			# Every output row is a contiguous array of texture rows, so take writes straight into it without a buffer
+			output_rows = self.output.reshape(self.chunks_y, self.block_size, self.chunks_x, self.block_size * 3)
+			for chunk_row, output_row in zip(index_matrix, output_rows):
+				for row in range(self.block_size):
+					np.take(self.texture_rows[row], chunk_row, axis=0, out=output_row[row], mode="clip")
+		self.launch.stats.chunks += index_matrix.size
+		return self.output
+
+def get_reader_command(ffmpeg: str, path: str, scaled_size: Tuple[int, int], size: Tuple[int, int]) -> List[str]:
+	'''Returns ffmpeg command writing frames of path, scaled to scaled_size and cropped to size from the top left corner,
+	as raw RGB to stdout.'''
+	filters = f"scale={scaled_size[0]}:{scaled_size[1]},crop={size[0]}:{size[1]}:0:0"
+	return [ffmpeg, "-v", "error", "-i", path, "-an", "-vf", filters, "-f", "rawvideo", "-pix_fmt", "rgb24", "-"]
+
+def get_writer_command(ffmpeg: str, output_path: str, size: Tuple[int, int], fps: float, audio_path: Optional[str] = None) -> List[str]:
+	'''Returns ffmpeg command encoding raw RGB frames from stdin into output_path (H.264, same as moviepy),
+	with audio of audio_path if given.'''
+	command = [ffmpeg, "-y", "-v", "error", "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{size[0]}x{size[1]}", "-r", f"{fps}", "-i", "-"]
+	if audio_path is not None:
+		command += ["-i", audio_path, "-map", "0:v", "-map", "1:a", "-c:a", "aac", "-shortest"]
+	# yuv420p needs even width and height, which blocks smaller than 2 pixels might not have
+	return command + ["-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-c:v", "libx264", "-pix_fmt", "yuv420p", output_path]
+
+def convert_video(launch: Any, path: str, output_path: str, show_progress: bool = True) -> None:
+	'''Converts video with frames read from an ffmpeg pipe into a buffer, converted by a RawFrameConverter,
+	and written as raw RGB into another ffmpeg pipe, that encodes them with the audio of the source.'''
+	ffmpeg = get_ffmpeg_exe()
+	source_width, source_height, fps, has_audio = probe_video(path, ffmpeg)
+	chunk_size = 16
+	scaled_size = (source_width, source_height)
+	size = scaled_size
+	if launch.target_blocks is None:
+		scaled_size = get_scaled_size(source_width, source_height, launch.scale_factor)
+		size = (scaled_size[0] - scaled_size[0] % chunk_size, scaled_size[1] - scaled_size[1] % chunk_size)
+	if size[0] <= 0 or size[1] <= 0:
+		raise ValueError(f"Video is too small to fit a single block: {source_width}x{source_height}")
+
+	converter = RawFrameConverter(launch, size[0], size[1], chunk_size)
+	output_size = (converter.output.shape[1], converter.output.shape[0])
+	reader = subprocess.Popen(get_reader_command(ffmpeg, path, scaled_size, size), stdout=subprocess.PIPE)
+	writer = subprocess.Popen(get_writer_command(ffmpeg, output_path, output_size, fps, path if has_audio else None), stdin=subprocess.PIPE)
+	progress = None
+	if show_progress:
+		from tqdm import tqdm
+		progress = tqdm(unit="frame")
+	try:
+		while True:
+			with launch.stats.stage("decode"):
+				if not read_into(reader.stdout, converter.frame):
+					break
+			output = converter.convert()
+			with launch.stats.stage("encode"):
+				writer.stdin.write(memoryview(output).cast("B"))
+			if progress is not None:
+				progress.update()
+	finally:
+		if progress is not None:
+			progress.close()
+		reader.stdout.close()
+		writer.stdin.close()
+		reader.wait()
+		writer.wait()
+	if reader.returncode != 0 or writer.returncode != 0:
+		raise RuntimeError(f"ffmpeg failed converting {path!r} (reader exit code {reader.returncode}, writer exit code {writer.returncode})")
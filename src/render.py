@@ -0,0 +1,33 @@
+from typing import Dict, List
+
+import numpy as np
+from PIL import Image
+
+from .threads import get_bands, thread_map
+
+def get_block_textures(blocks_image: Image, blocks: Dict, names: List[str], block_size: int = 16) -> np.ndarray:
+	'''Slices textures of the given blocks out of the atlas, into a contiguous (n_blocks, block_size, block_size, 3) array.
+	Textures are in the same order as names, so they can be indexed with a block index matrix.'''
+	atlas = np.asarray(blocks_image.convert("RGB"))
+	textures = np.empty((len(names), block_size, block_size, 3), dtype=np.uint8)
+	for i, name in enumerate(names):
+		x, y = blocks[name]["x"], blocks[name]["y"]
+		textures[i] = atlas[y:y + block_size, x:x + block_size]
+	return textures
+
+def render_blocks(index_matrix: np.ndarray, textures: np.ndarray, threads: int = 1) -> np.ndarray:
+	'''Builds a (height, width, 3) image array from a (chunks_x, chunks_y) block index matrix,
+	with a single gather of textures and one transpose into the final layout.
+	With threads, bands of chunk rows are rendered in parallel straight into the output.'''
+	chunks_x, chunks_y = index_matrix.shape
+	_, block_height, block_width, channels = textures.shape
+	bands = get_bands(chunks_y, threads)
+	if len(bands) > 1:
+		output = np.empty((chunks_y * block_height, chunks_x * block_width, channels), dtype=textures.dtype)
+		rows = output.reshape(chunks_y, block_height, chunks_x, block_width, channels)
+		def render_band(band) -> None:
+			rows[band[0]:band[1]] = textures[index_matrix[:, band[0]:band[1]].T].transpose(0, 2, 1, 3, 4)
+		thread_map(render_band, bands, threads)
+		return output
+	tiles = textures[index_matrix.T]
+	return tiles.transpose(0, 2, 1, 3, 4).reshape(chunks_y * block_height, chunks_x * block_width, channels)
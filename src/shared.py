@@ -0,0 +1,43 @@
+import os
+import mmap
+import weakref
+import tempfile
+from multiprocessing.reduction import ForkingPickler
+from typing import Tuple
+
+import numpy as np
+
+# Shared arrays live in files in memory on Linux, and in the default temporary folder elsewhere
+SHARED_FOLDER = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+def _remove_file(filename: str, owner_pid: int) -> None:
+	# Forked workers have the finalizer too, only the process that created the file removes it
+	if os.getpid() == owner_pid:
+		try:
+			os.remove(filename)
+		except OSError:
+			pass
+
+def create_shared_array(shape: Tuple[int, ...], dtype: np.dtype) -> np.memmap:
+	'''Returns a zeroed array mapped from a temporary file, that worker processes map too when it is sent to them,
+	so all of them read and write the same memory. The file is removed when the array is garbage collected.'''
+	fd, filename = tempfile.mkstemp(prefix="image2mcblock_", suffix=".bin", dir=SHARED_FOLDER)
+	os.close(fd)
+	array = np.memmap(filename, dtype=dtype, mode="w+", shape=shape)
+	weakref.finalize(array, _remove_file, filename, os.getpid())
+	return array
+
+def _open_memmap(filename: str, dtype: np.dtype, mode: str, offset: int, shape: Tuple[int, ...], order: str) -> np.memmap:
+	return np.memmap(filename, dtype=dtype, mode=mode, offset=offset, shape=shape, order=order)
+
+def _reduce_memmap(array: np.memmap):
+	'''Sends whole memory mapped arrays (like cached palettes and shared lookup tables) to worker processes by file name,
+	so they map the same file instead of receiving a copy. Parts of a mapping and copy-on-write mappings are copied as usual.'''
+	if isinstance(array.base, mmap.mmap) and array.filename is not None and array.mode in ("r", "r+", "w+"):
+		order = "F" if array.flags.f_contiguous and not array.flags.c_contiguous else "C"
+		mode = "r" if array.mode == "r" else "r+"
+		return _open_memmap, (array.filename, array.dtype, mode, array.offset, array.shape, order)
+	return np.asarray(array).__reduce__()
+
+# Only affects pickling for worker processes, regular pickles still hold the data
+ForkingPickler.register(np.memmap, _reduce_memmap)
@@ -0,0 +1,119 @@
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+STAGES = ["decode", "preprocess", "medians", "matching", "rendering", "encode", "schematic_save", "video_io"]
+FORMATS = ["text", "json"]
+
+class Stats:
+	'''Wall time of conversion stages and amount of converted chunks, summed over all conversions of a Launch.
+	chunks_total counts chunks of video frames converted with reuse (see TemporalFrameConverter), and chunks_reused those of them
+	that kept the block of the previous frame.
+	on_convert is called with the snapshot (as returned by to_dict) after every Launch.convert.'''
+	def __init__(self, on_convert: Optional[Callable[[Dict[str, Any]], None]] = None) -> None:
+		self.on_convert = on_convert
+		# Stages can run in several threads at once, like in batch.run_jobs_pipelined
+		self.lock = threading.Lock()
+		self.reset()
+
+	def __getstate__(self) -> Dict[str, Any]:
+		# Locks can't be pickled, worker processes get their own
+		state = self.__dict__.copy()
+		del state["lock"]
+		return state
+
+	def __setstate__(self, state: Dict[str, Any]) -> None:
+		self.__dict__.update(state)
+		self.lock = threading.Lock()
+
+	def reset(self) -> None:
+		self.stages: Dict[str, float] = dict()
+		self.conversions = 0
+		self.chunks = 0
+		self.chunks_total = 0
+		self.chunks_reused = 0
+
+	@contextmanager
+	def stage(self, name: str) -> Iterator[None]:
+		'''Adds wall time of the with block to the stage.'''
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			with self.lock:
+				self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+	def pop_delta(self, method_settings: Any = None) -> Dict[str, Any]:
+		'''Returns everything counted since the last call (with lookup table counters of method_settings if given), and resets it.
+		Worker processes send these to the parent with every result, which adds them up with merge.'''
+		with self.lock:
+			delta = {"stages": self.stages, "conversions": self.conversions, "chunks": self.chunks,
+				"chunks_total": self.chunks_total, "chunks_reused": self.chunks_reused}
+			self.reset()
+		if method_settings is not None:
+			delta["lut"] = {"hits": method_settings.lut_hits, "misses": method_settings.lut_misses, "entries": method_settings.lut_entries}
+			method_settings.lut_hits = method_settings.lut_misses = method_settings.lut_entries = 0
+		return delta
+
+	def merge(self, delta: Dict[str, Any], method_settings: Any = None) -> None:
+		'''Adds counts returned by pop_delta (of a worker process) to these stats, and lookup table counters to method_settings.'''
+		with self.lock:
+			for name, seconds in delta["stages"].items():
+				self.stages[name] = self.stages.get(name, 0.0) + seconds
+			self.conversions += delta["conversions"]
+			self.chunks += delta["chunks"]
+			self.chunks_total += delta["chunks_total"]
+			self.chunks_reused += delta["chunks_reused"]
+			if method_settings is not None and "lut" in delta:
+				method_settings.lut_hits += delta["lut"]["hits"]
+				method_settings.lut_misses += delta["lut"]["misses"]
+				method_settings.lut_entries += delta["lut"]["entries"]
+
+	def to_dict(self, method_settings: Any = None) -> Dict[str, Any]:
+		'''Returns stats as a dict that can be dumped to JSON, with lookup table counters of method_settings (find_closest.Method) if given.'''
+		stats = {
+			"conversions": self.conversions,
+			"chunks": self.chunks,
+			"stages": {name: self.stages[name] for name in STAGES if name in self.stages},
+			"total_seconds": sum(self.stages.values()),
+		}
+		if self.chunks_total:
+			stats["reuse"] = {
+				"chunks_total": self.chunks_total,
+				"chunks_reused": self.chunks_reused,
+				"reused_fraction": self.chunks_reused / self.chunks_total,
+			}
+		if method_settings is not None:
+			lookups = method_settings.lut_hits + method_settings.lut_misses
+			stats["lut"] = {
+				"hits": method_settings.lut_hits,
+				"misses": method_settings.lut_misses,
+				"hit_rate": method_settings.lut_hits / lookups if lookups else 0.0,
+				"entries": method_settings.lut_entries,
+				"bytes": sum(lut.nbytes for lut in method_settings.luts.values()),
+				"tables": len(method_settings.luts),
+				"step": method_settings.lut_step,
+				"palette_blocks": len(method_settings.names),
+			}
+		return stats
+
+def format_stats(stats: Dict[str, Any], format: str = "text") -> str:
+	'''Returns stats dict as JSON, or as lines of text.'''
+	if format == "json":
+		return json.dumps(stats)
+	if format not in FORMATS:
+		raise ValueError(f"Unknown stats format {format!r}, expected one of {FORMATS}")
+
+	lines = [f"Converted {stats['chunks']} chunks in {stats['conversions']} conversions, {stats['total_seconds']:.3f} s"]
+	for name, seconds in stats["stages"].items():
+		lines.append(f"  {name:<15} {seconds * 1000:10.1f} ms")
+	if "reuse" in stats:
+		reuse = stats["reuse"]
+		lines.append(f"Reused {reuse['chunks_reused']} of {reuse['chunks_total']} video chunks ({reuse['reused_fraction']:.1%}) from previous frames")
+	if "lut" in stats:
+		lut = stats["lut"]
+		lines.append(f"Lookup table: {lut['hits']} hits, {lut['misses']} misses ({lut['hit_rate']:.1%} hit rate), "
+			f"{lut['entries']} entries, {lut['bytes'] / 1024 / 1024:.1f} MB in {lut['tables']} tables")
+	return "\n".join(lines)
@@ -0,0 +1,191 @@
+import zlib
+import struct
+from contextlib import contextmanager
+from typing import Iterator, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Raw modes that can be read straight from the file, with their amount of channels.
+RAW_MODES = {"RGB": 3, "RGBA": 4, "RGBX": 4, "L": 1}
+
+def to_rgb(array: np.ndarray) -> np.ndarray:
+	'''Converts (height, width) gray, or (height, width, 3 or 4) RGB(A) array to RGB, the same way Image.convert("RGB") does.'''
+	if array.ndim == 2:
+		array = array[..., None]
+	if array.shape[2] == 1:
+		return np.repeat(array, 3, axis=2)
+	return np.ascontiguousarray(array[..., :3])
+
+@contextmanager
+def no_pixel_limit() -> Iterator[None]:
+	'''Turns off Pillow's decompression bomb check inside the with block. Streaming reads local files picked by the user,
+	and exists for images above the limit.'''
+	max_pixels = Image.MAX_IMAGE_PIXELS
+	Image.MAX_IMAGE_PIXELS = None
+	try:
+		yield
+	finally:
+		Image.MAX_IMAGE_PIXELS = max_pixels
+
+class StripReader:
+	'''Reads an image in horizontal strips.
+	.npy files and images stored uncompressed in a single raw tile (like .ppm, .pgm and uncompressed .tif) are read
+	from the file strip by strip, so only the strips being read are in memory. Other formats (like .png and .jpg)
+	can't be decoded partially, so they are decoded in full once, and only converted to RGB strip by strip.'''
+	def __init__(self, path: str) -> None:
+		self.image = None
+		self.file = None
+		self.offset = 0
+		self.shape = None
+
+		if path.endswith(".npy"):
+			self.file = open(path, "rb")
+			version = np.lib.format.read_magic(self.file)
+			read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+			shape, fortran_order, dtype = read_header(self.file)
+			if dtype != np.uint8 or fortran_order or len(shape) not in (2, 3):
+				raise ValueError(f"Expected (height, width[, channels]) uint8 array in {path!r}")
+			self.offset = self.file.tell()
+			self.shape = shape if len(shape) == 3 else shape + (1,)
+			return
+
+		with no_pixel_limit():
+			self.image = Image.open(path, "r")
+		width, height = self.image.size
+		if len(self.image.tile) == 1:
+			decoder, _, offset, args = self.image.tile[0]
+			if isinstance(args, str):
+				args = (args,)
+			rawmode, stride, orientation = (*args, 0, 1)[:3]
+			if decoder == "raw" and rawmode == self.image.mode and rawmode in RAW_MODES and stride == 0 and orientation == 1:
+				self.file = open(path, "rb")
+				self.offset = offset
+				self.shape = (height, width, RAW_MODES[rawmode])
+				self.image.close()
+				self.image = None
+				return
+		with no_pixel_limit():
+			self.image.load()
+
+	@property
+	def size(self) -> Tuple[int, int]:
+		if self.file is not None:
+			return self.shape[1], self.shape[0]
+		return self.image.size
+
+	def read(self, top: int, bottom: int) -> np.ndarray:
+		'''Returns rows from top to bottom as (rows, width, 3) RGB array.'''
+		if self.file is not None:
+			_, width, channels = self.shape
+			row_size = width * channels
+			self.file.seek(self.offset + top * row_size)
+			rows = np.fromfile(self.file, dtype=np.uint8, count=(bottom - top) * row_size)
+			return to_rgb(rows.reshape(bottom - top, width, channels))
+		strip = self.image.crop((0, top, self.image.width, bottom))
+		if strip.mode != "RGB":
+			strip = strip.convert("RGB")
+		return np.asarray(strip)
+
+	def close(self) -> None:
+		if self.image is not None:
+			self.image.close()
+		if self.file is not None:
+			self.file.close()
+
+	def __enter__(self) -> "StripReader":
+		return self
+
+	def __exit__(self, *args) -> None:
+		self.close()
+
+def paeth_filter(rows: np.ndarray, previous_row: np.ndarray) -> np.ndarray:
+	'''Applies PNG Paeth filter to (rows, width * channels) bytes, previous_row is the row above the first one.
+	Filtering only depends on unfiltered bytes, so all rows are filtered at once.'''
+	channels = 3
+	current = rows.astype(np.int16)
+	up = np.vstack((previous_row[None, :], rows[:-1])).astype(np.int16)
+	left = np.zeros_like(current)
+	left[:, channels:] = current[:, :-channels]
+	up_left = np.zeros_like(current)
+	up_left[:, channels:] = up[:, :-channels]
+
+	estimate = left + up - up_left
+	distance_left = np.abs(estimate - left)
+	distance_up = np.abs(estimate - up)
+	distance_up_left = np.abs(estimate - up_left)
+	predictor = np.where((distance_left <= distance_up) & (distance_left <= distance_up_left), left,
+		np.where(distance_up <= distance_up_left, up, up_left))
+	return ((current - predictor) & 255).astype(np.uint8)
+
+class PngStripWriter:
+	'''Writes RGB PNG strips of rows at a time, compressing every strip as soon as it is written.'''
+	def __init__(self, path: str, width: int, height: int, compress_level: int = 6) -> None:
+		self.file = open(path, "wb")
+		self.width = width
+		self.height = height
+		self.compressor = zlib.compressobj(compress_level)
+		self.previous_row = np.zeros(width * 3, dtype=np.uint8)
+
+		self.file.write(b"\x89PNG\r\n\x1a\n")
+		self._write_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+	def _write_chunk(self, chunk_type: bytes, data: bytes) -> None:
+		self.file.write(struct.pack(">I", len(data)))
+		self.file.write(chunk_type)
+		self.file.write(data)
+		self.file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(chunk_type)) & 0xFFFFFFFF))
+
+	def write(self, strip: np.ndarray) -> None:
+		'''Writes (rows, width, 3) RGB strip under the previous one.'''
+		rows = np.ascontiguousarray(strip, dtype=np.uint8).reshape(len(strip), self.width * 3)
+		filtered = paeth_filter(rows, self.previous_row)
+		# Every row starts with its filter type, 4 is Paeth
+		data = np.hstack((np.full((len(rows), 1), 4, dtype=np.uint8), filtered))
+		compressed = self.compressor.compress(data.tobytes())
+		if compressed:
+			self._write_chunk(b"IDAT", compressed)
+		self.previous_row = rows[-1].copy()
+
+	def close(self) -> None:
+		if self.file.closed:
+			return
+		self._write_chunk(b"IDAT", self.compressor.flush())
+		self._write_chunk(b"IEND", b"")
+		self.file.close()
+
+	def __enter__(self) -> "PngStripWriter":
+		return self
+
+	def __exit__(self, *args) -> None:
+		self.close()
+
+class NpyStripWriter:
+	'''Writes strips of rows into a memory mapped (height, width, 3) .npy file.'''
+	def __init__(self, path: str, width: int, height: int) -> None:
+		self.array = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=(height, width, 3))
+		self.row = 0
+
+	def write(self, strip: np.ndarray) -> None:
+		'''Writes (rows, width, 3) RGB strip under the previous one.'''
+		self.array[self.row:self.row + len(strip)] = strip
+		self.row += len(strip)
+
+	def close(self) -> None:
+		if self.array is not None:
+			self.array.flush()
+			self.array = None
+
+	def __enter__(self) -> "NpyStripWriter":
+		return self
+
+	def __exit__(self, *args) -> None:
+		self.close()
+
+def open_strip_writer(path: str, width: int, height: int, compress_level: int = 6):
+	'''Returns strip writer for the output format, .png (compressed with zlib compress_level) or .npy.'''
+	if path.endswith(".npy"):
+		return NpyStripWriter(path, width, height)
+	if path.endswith(".png"):
+		return PngStripWriter(path, width, height, compress_level)
+	raise ValueError(f"Streaming can only write .png or .npy files, not {path!r}")
@@ -0,0 +1,39 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Smallest amount of rows (chunk rows, lookup table cells) given to a thread, below it splitting costs more than it saves
+MIN_BAND_ROWS = 4
+
+# One pool per process and amount of threads, forked worker processes don't get the threads of their parent
+_executors: Dict[Tuple[int, int], ThreadPoolExecutor] = dict()
+
+def get_threads_count(threads: int, workers: int = 1) -> int:
+	'''Returns amount of threads converting a single image, 0 means one per CPU core, divided between worker processes.'''
+	if threads > 0:
+		return threads
+	if workers == 1:
+		return os.cpu_count() or 1
+	return 1
+
+def get_executor(threads: int) -> ThreadPoolExecutor:
+	key = (os.getpid(), threads)
+	if key not in _executors:
+		_executors[key] = ThreadPoolExecutor(threads, thread_name_prefix="image2mcblock")
+	return _executors[key]
+
+def get_bands(size: int, threads: int, min_rows: int = MIN_BAND_ROWS) -> List[Tuple[int, int]]:
+	'''Splits size rows into up to threads (start, stop) bands of nearly equal size, none smaller than min_rows.'''
+	count = max(1, min(threads, size // max(min_rows, 1)))
+	bounds = [size * i // count for i in range(count + 1)]
+	return [(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+def thread_map(function: Callable[[T], R], items: Sequence[T], threads: int) -> List[R]:
+	'''Returns [function(item) for item in items], calculated in a pool of threads if there is more than one item.
+	Only worth it when function spends its time in NumPy (or other code) that releases the GIL.'''
+	if threads <= 1 or len(items) <= 1:
+		return [function(item) for item in items]
+	return list(get_executor(threads).map(function, items))
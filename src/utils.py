@@ -2,6 +2,7 @@ import sys
 import os
 import mimetypes
 
+import numpy as np
 from PIL import Image
 
 def resize_image(image: Image, scale_factor: int) -> Image:
@@ -29,6 +30,110 @@ def crop_to_make_divisible(image: Image, divisible_by=16) -> Image:
 	cropped = image.crop([0,0, x, y])
 	return cropped
 
+def get_chunks_view(array: np.ndarray, chunk_size: int = 16) -> np.ndarray:
+	'''Returns a (chunks_x, chunks_y, chunk_size, chunk_size, channels) view of a (height, width, channels) array,
+	without copying it. Pixels that don't fill a whole chunk are left out.'''
+	height, width, channels = array.shape
+	chunks_x = width // chunk_size
+	chunks_y = height // chunk_size
+	array = array[:chunks_y * chunk_size, :chunks_x * chunk_size]
+	return array.reshape(chunks_y, chunk_size, chunks_x, chunk_size, channels).transpose(2, 0, 1, 3, 4)
+
+def get_medians(chunks: np.ndarray) -> np.ndarray:
+	'''Returns medians of (..., chunk_size, chunk_size, channels) chunks,
+	calculated the same way as ImageStat.Stat(chunk).median.'''
+	*shape, chunk_height, chunk_width, channels = chunks.shape
+	pixels = chunks.reshape(*shape, chunk_height * chunk_width, channels)
+	half = pixels.shape[-2] // 2
+	return np.partition(pixels, half, axis=-2)[..., half, :]
+
+def get_chunk_medians(array: np.ndarray, chunk_size: int = 16) -> np.ndarray:
+	'''Returns a (chunks_x, chunks_y, channels) array with the median of every chunk.'''
+	return get_medians(get_chunks_view(array, chunk_size))
+
+def get_signatures(chunks: np.ndarray, grid: int = 2) -> np.ndarray:
+	'''Returns (..., grid * grid * 3 + 3) float32 texture signatures of (..., chunk_size, chunk_size, 3) chunks:
+	mean color of every cell of a grid x grid split of the chunk, followed by the standard deviation of every channel.
+	chunk_size has to be divisible by grid.'''
+	*shape, chunk_height, chunk_width, channels = chunks.shape
+	cell_height, cell_width = chunk_height // grid, chunk_width // grid
+	# Reducing one axis at a time is a lot faster than reducing both at once on a strided view.
+	# Sums stay in integers, 255 ** 2 still fits into uint16, and 256 of them into uint32
+	sums = chunks.reshape(*shape, grid, cell_height, chunk_width, channels).sum(axis=-3, dtype=np.uint32)
+	sums = sums.reshape(*shape, grid, grid, cell_width, channels).sum(axis=-2)
+	squares = chunks.astype(np.uint16)
+	squares *= squares
+	square_sums = squares.sum(axis=-3, dtype=np.uint32).sum(axis=-2)
+
+	pixels = chunk_height * chunk_width
+	means = sums.reshape(*shape, grid * grid * channels).astype(np.float32) / (cell_height * cell_width)
+	mean = sums.sum(axis=(-3, -2)) / pixels
+	std = np.sqrt(np.maximum(square_sums / pixels - mean * mean, 0)).astype(np.float32)
+	return np.concatenate([means, std], axis=-1)
+
+def get_chunk_signatures(array: np.ndarray, chunk_size: int = 16, grid: int = 2) -> np.ndarray:
+	'''Returns a (chunks_x, chunks_y, grid * grid * 3 + 3) array with the texture signature of every chunk.'''
+	return get_signatures(get_chunks_view(array, chunk_size), grid)
+
+def reduce_area(array: np.ndarray, target: int, axis: int = 0, square: bool = False) -> np.ndarray:
+	'''Returns float64 array where axis is reduced to target length, every element being the sum of an equal
+	(size / target long, possibly fractional) span of the original elements, pixels on the edges of a span
+	are counted by the fraction of them inside it. Spans can be shorter than a pixel, when target is above size. Takes a single pass over array, without resizing it.
+	With square, squares of the elements are summed, squaring one span at a time instead of copying the whole array.'''
+	array = np.moveaxis(array, axis, 0)
+	size = len(array)
+	if target <= 0:
+		raise ValueError(f"Can't reduce {size} pixels to {target}")
+	sum_dtype = np.uint64 if np.issubdtype(array.dtype, np.integer) else np.float64
+
+	def get_values(span: np.ndarray) -> np.ndarray:
+		if not square:
+			return span
+		span = span.astype(sum_dtype)
+		span *= span
+		return span
+
+	if size % target == 0 and not square:
+		sums = array.reshape(target, size // target, *array.shape[1:]).sum(axis=1, dtype=sum_dtype)
+		return np.moveaxis(sums.astype(np.float64), 0, axis)
+
+	# Span i starts at starts[i] + fractions[i], kept as integers and exact fractions
+	spans = np.arange(target + 1) * size
+	starts, fractions = spans // target, (spans % target) / target
+	# Summing span by span is a lot faster than np.add.reduceat, integers are summed exactly
+	sums = np.empty((target,) + array.shape[1:], dtype=np.float64)
+	for i in range(target):
+		sums[i] = get_values(array[starts[i]:starts[i + 1]]).sum(axis=0, dtype=sum_dtype)
+	edges = get_values(array[np.minimum(starts, size - 1)]) * fractions.reshape(-1, *[1] * (array.ndim - 1))
+	sums += edges[1:] - edges[:-1]
+	return np.moveaxis(sums, 0, axis)
+
+def get_area_means(array: np.ndarray, blocks_x: int, blocks_y: int, square: bool = False) -> np.ndarray:
+	'''Returns a (blocks_x, blocks_y, channels) array with the mean color of every one of blocks_x * blocks_y equal areas
+	of a (height, width, channels) array. Areas don't have to be whole pixels, so the image doesn't have to be cropped or resized.
+	With square, means of squared colors, see reduce_area.'''
+	height, width = array.shape[:2]
+	# Rows are reduced first, so the second pass only goes over blocks_y rows
+	sums = reduce_area(reduce_area(array, blocks_y, axis=0, square=square), blocks_x, axis=1)
+	return sums.transpose(1, 0, 2) * (blocks_x * blocks_y / (width * height))
+
+def get_area_signatures(array: np.ndarray, blocks_x: int, blocks_y: int, grid: int = 2) -> np.ndarray:
+	'''Same as get_chunk_signatures, for blocks_x * blocks_y equal areas of the array, see get_area_means.'''
+	means = get_area_means(array, blocks_x * grid, blocks_y * grid).reshape(blocks_x, grid, blocks_y, grid, -1)
+	means = means.transpose(0, 2, 3, 1, 4).reshape(blocks_x, blocks_y, -1)
+	mean = get_area_means(array, blocks_x, blocks_y)
+	std = np.sqrt(np.maximum(get_area_means(array, blocks_x, blocks_y, square=True) - mean * mean, 0))
+	return np.concatenate([means, std], axis=-1).astype(np.float32)
+
+def get_preview_textures(textures: np.ndarray, block_pixels: int) -> np.ndarray:
+	'''Returns (n_blocks, block_pixels, block_pixels, 3) uint8 textures, with the mean color of every area of the original ones.
+	1 pixel per block gives the mean color of every block.'''
+	textures = np.asarray(textures)
+	if block_pixels == textures.shape[1]:
+		return textures
+	sums = reduce_area(reduce_area(textures, block_pixels, axis=1), block_pixels, axis=2)
+	return np.round(sums * (block_pixels * block_pixels / (textures.shape[1] * textures.shape[2]))).astype(np.uint8)
+
 def has_transparency(img: Image) -> bool:
 	if img.info.get("transparency", None) is not None:
 		return True
@@ -63,6 +168,12 @@ def resource_path(relative_path: str) -> str:
 
 	return os.path.join(base_path, relative_path)
 
+def get_workers_count(workers: int) -> int:
+	'''Returns amount of worker processes, 0 means one per CPU core.'''
+	if workers <= 0:
+		return os.cpu_count() or 1
+	return workers
+
 def get_execution_folder() -> str:
 	if getattr(sys, 'frozen', False):
 		# If the script is running as a bundled executable (e.g., PyInstaller)
@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+# Blocks shared by the tests, with their atlas coordinates and medians, see make_atlas
+BLOCKS = {
+    "black_wool": {"x": 0, "y": 0, "median": [20, 21, 25]},
+    "white_wool": {"x": 16, "y": 0, "median": [233, 236, 236]},
+    "red_wool": {"x": 32, "y": 0, "median": [160, 39, 34]},
+    "green_wool": {"x": 48, "y": 0, "median": [84, 109, 27]},
+    "blue_wool": {"x": 64, "y": 0, "median": [53, 57, 157]},
+    "gray_wool": {"x": 80, "y": 0, "median": [62, 68, 71]},
+}
+
+def get_blocks(*names):
+    '''Returns the given BLOCKS (all of them by default), in the same order.'''
+    return {name: dict(BLOCKS[name]) for name in names or BLOCKS}
+
+def make_textures(blocks=BLOCKS):
+    '''Returns (n_blocks, 16, 16, 3) textures filled with the median of every block.'''
+    return np.array([np.full((16, 16, 3), block["median"], dtype=np.uint8) for block in blocks.values()])
+
+def make_atlas(blocks=BLOCKS):
+    '''Returns RGBA atlas where every block is filled with its median, and everything else is transparent.'''
+    width = max(block["x"] for block in blocks.values()) + 16
+    height = max(block["y"] for block in blocks.values()) + 16
+    atlas = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    for block in blocks.values():
+        atlas.paste(tuple(block["median"]) + (255,), (block["x"], block["y"], block["x"] + 16, block["y"] + 16))
+    return atlas
+
+def write_atlas(folder, blocks=BLOCKS):
+    '''Writes make_atlas as .png, its .txt and a valid blocks list to folder, and returns their filenames.'''
+    png = os.path.join(folder, "atlas.png")
+    txt = os.path.join(folder, "atlas.txt")
+    valid_blocks = os.path.join(folder, "valid_blocks.txt")
+    make_atlas(blocks).save(png)
+    with open(txt, "w") as f:
+        for name, block in blocks.items():
+            f.write(f"minecraft:block/{name}\tx={block['x']}\ty={block['y']}\tw=16\th=16\n")
+    with open(valid_blocks, "w") as f:
+        f.write("\n".join(blocks) + "\n")
+    return png, txt, valid_blocks
+
+#-------------------------------------------------------------------------
+@pytest.fixture
+def blocks():
+    return get_blocks()
+
+@pytest.fixture
+def atlas():
+    return make_atlas()
+
+@pytest.fixture
+def make_launch(tmp_path, monkeypatch):
+    '''Returns function creating a real Launch on the write_atlas blocks, with its palette cache in tmp_path.'''
+    import main
+    monkeypatch.setattr(main, "get_execution_folder", lambda: str(tmp_path))
+    png, txt, valid_blocks = write_atlas(str(tmp_path))
+
+    def make(**kwargs):
+        kwargs.setdefault("method", "euclidean")
+        return main.Launch(png_atlas_filename=png, txt_atlas_filename=txt, valid_blocks_filename=valid_blocks, **kwargs)
+    return make
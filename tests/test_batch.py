@@ -0,0 +1,145 @@
+import io
+import os
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.batch import parse_job_line, get_jobs, run_jobs, get_summary
+
+class FakeLaunch:
+    def __init__(self):
+        self.workers = 1
+        self.converted = []
+
+    def convert(self, path, output_path, show_progress=True):
+        if path == "missing.png":
+            raise FileNotFoundError(path)
+        self.converted.append((path, output_path))
+
+#-------------------------------------------------------------------------
+def test_parse_job_line():
+    assert parse_job_line("in.png\tout.png\n") == ("in.png", "out.png")
+    assert parse_job_line("# comment") is None
+    assert parse_job_line("   ") is None
+    with pytest.raises(ValueError):
+        parse_job_line("in.png out.png")
+
+def test_get_jobs(tmp_path):
+    for name in ("a.jpg", "b.jpg", "c.txt"):
+        (tmp_path / name).write_bytes(b"")
+    jobs = get_jobs(str(tmp_path / "*.jpg"), "out", ".png")
+    assert jobs == [(str(tmp_path / "a.jpg"), os.path.join("out", "a.png")), (str(tmp_path / "b.jpg"), os.path.join("out", "b.png"))]
+
+    manifest = tmp_path / "jobs.txt"
+    manifest.write_text("# input\toutput\na.jpg\ta.png\n\nb.jpg\tb.schem\n")
+    assert get_jobs(str(manifest)) == [("a.jpg", "a.png"), ("b.jpg", "b.schem")]
+
+    assert list(get_jobs("-", stdin=io.StringIO("a.jpg\ta.png\n"))) == [("a.jpg", "a.png")]
+
+    with pytest.raises(ValueError):
+        get_jobs(str(tmp_path / "*.jpg"))
+
+#-------------------------------------------------------------------------
+def test_run_jobs():
+    launch = FakeLaunch()
+    reported = []
+    results = run_jobs(launch, [("a.png", "a_out.png"), ("missing.png", "b_out.png")], on_result=reported.append)
+
+    assert results == reported
+    assert launch.converted == [("a.png", "a_out.png")]
+    assert results[0].error is None
+    assert results[1].error.startswith("FileNotFoundError")
+    assert "1/2 jobs" in get_summary(results, 1.0)
+
+def test_run_jobs_merges_worker_stats(tmp_path, make_launch):
+    launch = make_launch()
+    launch.share()
+    jobs = []
+    for name in ("a", "b"):
+        Image.new("RGB", (32, 32), (160, 39, 34)).save(tmp_path / f"{name}.png")
+        jobs.append((str(tmp_path / f"{name}.png"), str(tmp_path / f"{name}_out.png")))
+
+    results = run_jobs(launch, jobs, workers=2)
+    assert all(result.error is None and result.stats is None for result in results)
+    result = launch.stats.to_dict(launch.method_settings)
+    assert result["conversions"] == 2 and result["chunks"] == 2 * 4
+    assert result["lut"]["hits"] + result["lut"]["misses"] == 2 * 4
+
+def test_run_jobs_in_workers_match_one_process(tmp_path, make_launch):
+    launch = make_launch()
+    launch.share()
+    rng = np.random.default_rng(0)
+    jobs = {1: [], 2: []}
+    for name in ("a", "b", "c"):
+        Image.fromarray(rng.integers(0, 256, (48, 32, 3), dtype=np.uint8)).save(tmp_path / f"{name}.png")
+        for workers in jobs:
+            jobs[workers].append((str(tmp_path / f"{name}.png"), str(tmp_path / f"{name}_{workers}.png")))
+    jobs[2].append((str(tmp_path / "missing.png"), str(tmp_path / "missing_2.png")))
+
+    run_jobs(launch, jobs[1], workers=1)
+    results = sorted(run_jobs(launch, jobs[2], workers=2), key=lambda result: result.input_path)
+
+    assert [result.error is None for result in results] == [True, True, True, False]
+    assert results[-1].error.startswith("FileNotFoundError")
+    for (_, expected), (_, output_path) in zip(jobs[1], jobs[2]):
+        assert np.array_equal(np.asarray(Image.open(output_path)), np.asarray(Image.open(expected)))
+
+class PipelineLaunch(FakeLaunch):
+    def __init__(self):
+        super().__init__()
+        self.decoded = []
+        self.encoded = []
+        self.conversions = 0
+
+    def is_image_job(self, path, output_path):
+        return not path.endswith(".mp4")
+
+    def decode(self, path):
+        if path == "missing.png":
+            raise FileNotFoundError(path)
+        self.decoded.append(path)
+        return path.upper()
+
+    def convert_decoded(self, image, output_path, show_progress=False):
+        return image + "!"
+
+    def encode(self, converted, output_path):
+        if output_path == "readonly.png":
+            raise PermissionError(output_path)
+        self.encoded.append((converted, output_path))
+
+    def count_conversion(self):
+        self.conversions += 1
+
+def test_run_jobs_pipelined():
+    launch = PipelineLaunch()
+    jobs = [("a.png", "a_out.png"), ("missing.png", "b_out.png"), ("c.mp4", "c_out.mp4"), ("d.png", "readonly.png"), ("e.png", "e_out.png")]
+    reported = []
+    results = run_jobs(launch, iter(jobs), on_result=reported.append, prefetch=2)
+
+    assert results == reported
+    assert sorted((result.input_path, result.error is None) for result in results) == [
+        ("a.png", True), ("c.mp4", True), ("d.png", False), ("e.png", True), ("missing.png", False)]
+    assert launch.decoded == ["a.png", "d.png", "e.png"]
+    assert launch.encoded == [("A.PNG!", "a_out.png"), ("E.PNG!", "e_out.png")]
+    assert launch.converted == [("c.mp4", "c_out.mp4")]
+    assert launch.conversions == 2
+
+def test_run_jobs_pipelined_converts_streamed_jobs_before_eof():
+    launch = PipelineLaunch()
+    read_fd, write_fd = os.pipe()
+    reported = threading.Event()
+    with os.fdopen(read_fd, "r") as stdin:
+        runner = threading.Thread(target=run_jobs, args=(launch, get_jobs("-", stdin=stdin)),
+            kwargs={"on_result": lambda result: reported.set(), "prefetch": 2})
+        runner.start()
+        with os.fdopen(write_fd, "w") as writer:
+            writer.write("a.png\ta_out.png\n")
+            writer.flush()
+            # The pipe stays open, the job must not wait for more of them
+            assert reported.wait(10)
+            assert launch.encoded == [("A.PNG!", "a_out.png")]
+        runner.join(10)
+        assert not runner.is_alive()
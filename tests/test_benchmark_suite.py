@@ -0,0 +1,35 @@
+import os
+import sys
+import json
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#-------------------------------------------------------------------------
+def test_suite_smoke(tmp_path):
+    output = str(tmp_path / "results.json")
+    baseline = str(tmp_path / "baseline.json")
+    keys = ["match/cold compression=16 method=euclidean palette=wool size=32", "match/warm compression=16 method=euclidean palette=wool size=32"]
+    # Cold matching took forever in the baseline, and warm matching took no time
+    with open(baseline, "w") as f:
+        json.dump({"results": [
+            {"name": "match/cold", "params": {"compression": 16, "method": "euclidean", "palette": "wool", "size": 32}, "seconds": 1000.0},
+            {"name": "match/warm", "params": {"compression": 16, "method": "euclidean", "palette": "wool", "size": 32}, "seconds": 1e-12},
+        ]}, f)
+
+    command = [sys.executable, os.path.join("benchmarks", "suite.py"), "--only", "match", "--sizes", "32", "--compression_levels", "16",
+        "--methods", "euclidean", "--repeat", "1", "--output", output, "--compare", baseline]
+    process = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    assert process.returncode != 0
+    assert "Some benchmarks got slower than the baseline" in process.stderr
+
+    compared = process.stdout.split(f"Compared with {baseline}")[1].splitlines()[1:]
+    assert [line.split()[-1] for line in compared] == ["faster", "slower"]
+    assert [line[:70].strip() for line in compared] == keys
+
+    with open(output, "r") as f:
+        results = {result["name"] + result["params"]["palette"]: result for result in json.load(f)["results"]}
+    for palette in ("full", "wool"):
+        # Cold lookup tables miss at least the first chunk, warm ones answer every chunk
+        assert 0 <= results["match/cold" + palette]["lut_hit_rate"] < 1
+        assert results["match/warm" + palette]["lut_hit_rate"] == 1
@@ -0,0 +1,52 @@
+import gzip
+
+import numpy as np
+import pytest
+
+from src.block_matrix import BlockMatrix
+from src.generate_schematic import write_2d_schematic
+from src.render import render_blocks
+
+NAMES = ["black_wool", "white_wool", "red_wool"]
+
+def make_matrix():
+    rng = np.random.default_rng(0)
+    return BlockMatrix(rng.integers(0, 3, (5, 4)), NAMES)
+
+#-------------------------------------------------------------------------
+def test_save_and_load(tmp_path):
+    matrix = make_matrix()
+    assert matrix.indices.dtype == np.uint16
+    matrix.save(str(tmp_path / "blocks.npz"))
+    loaded = BlockMatrix.load(str(tmp_path / "blocks.npz"))
+
+    assert loaded.names == NAMES
+    assert np.array_equal(loaded.indices, matrix.indices)
+    assert loaded.to_names()[1][2] == NAMES[matrix.indices[1, 2]]
+
+    np.savez(tmp_path / "other.npz", values=np.zeros(3))
+    with pytest.raises(ValueError):
+        BlockMatrix.load(str(tmp_path / "other.npz"))
+
+def test_indices_have_to_match_names():
+    with pytest.raises(ValueError):
+        BlockMatrix(np.array([[0, 3]]), NAMES)
+
+#-------------------------------------------------------------------------
+def test_render_with_another_palette():
+    matrix = make_matrix()
+    textures = np.arange(3 * 16 * 16 * 3, dtype=np.uint8).reshape(3, 16, 16, 3)
+    palette_names = ["red_wool", "white_wool", "black_wool", "blue_wool"]
+    palette_textures = np.concatenate([textures[::-1], np.zeros((1, 16, 16, 3), dtype=np.uint8)])
+
+    assert np.array_equal(matrix.render(textures), render_blocks(matrix.indices, textures))
+    assert np.array_equal(matrix.render(palette_textures, palette_names), render_blocks(matrix.indices, textures))
+    with pytest.raises(ValueError, match="red_wool"):
+        matrix.render(textures[:2], NAMES[:2])
+
+def test_write_schematic(tmp_path):
+    matrix = make_matrix()
+    matrix.write_schematic(str(tmp_path / "matrix.schem"))
+    write_2d_schematic(matrix.indices.astype(np.intp), NAMES, str(tmp_path / "direct.schem"))
+    with gzip.open(tmp_path / "matrix.schem") as f, gzip.open(tmp_path / "direct.schem") as g:
+        assert f.read() == g.read()
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageStat
+
+from src.calculate_minecraft_blocks_median import CalculateMinecraftBlocksMedian, STATISTICS
+
+from tests.conftest import get_blocks, make_atlas
+
+BLOCKS = get_blocks("black_wool", "white_wool", "red_wool", "green_wool")
+
+#-------------------------------------------------------------------------
+@pytest.fixture
+def atlas_filename(tmp_path):
+    atlas = np.array(make_atlas(BLOCKS))
+    # Second block has a single half transparent pixel, third one is fully transparent
+    atlas[0, 16, 3] = 128
+    atlas[0:16, 32:48, 3] = 0
+    filename = str(tmp_path / "atlas.png")
+    Image.fromarray(atlas).save(filename)
+    return filename
+
+def test_get_blocks_with_rgb_medians(atlas_filename):
+    blocks = CalculateMinecraftBlocksMedian(BLOCKS, atlas_filename).get_blocks_with_rgb_medians()
+    assert list(blocks) == ["black_wool", "green_wool"]
+
+    with Image.open(atlas_filename) as atlas:
+        for block in blocks.values():
+            cropped = atlas.crop([block["x"], block["y"], block["x"] + 16, block["y"] + 16])
+            assert block["median"] == ImageStat.Stat(cropped).median[:3]
+
+def test_get_blocks_statistics(atlas_filename):
+    statistics = CalculateMinecraftBlocksMedian(BLOCKS, atlas_filename).get_blocks_statistics(STATISTICS)
+    assert statistics["transparent"].tolist() == [False, True, True, False]
+    assert statistics["alpha_coverage"].tolist() == [1.0, 1.0, 0.0, 1.0]
+    assert statistics["mean"].shape == (4, 3)
+
+    with pytest.raises(ValueError):
+        CalculateMinecraftBlocksMedian(BLOCKS, atlas_filename).get_blocks_statistics(["mode"])
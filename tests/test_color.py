@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from src.color import rgb_to_lab, delta_e_76, delta_e_2000, delta_e_2000_lower_bound
+from src.find_closest import delta_e2000_lab
+
+# Test data from Sharma, Wu and Dalal, "The CIEDE2000 color-difference formula" (2005)
+SHARMA_PAIRS = [
+    ((50.0000, 2.6772, -79.7751), (50.0000, 0.0000, -82.7485), 2.0425),
+    ((50.0000, 3.1571, -77.2803), (50.0000, 0.0000, -82.7485), 2.8615),
+    ((50.0000, 0.0000, 0.0000), (50.0000, -1.0000, 2.0000), 2.3669),
+    ((50.0000, 2.4900, -0.0010), (50.0000, -2.4900, 0.0009), 7.1792),
+    ((50.0000, -0.0010, 2.4900), (50.0000, 0.0011, -2.4900), 4.7461),
+    ((50.0000, 2.5000, 0.0000), (50.0000, 0.0000, -2.5000), 4.3065),
+    ((50.0000, 2.5000, 0.0000), (73.0000, 25.0000, -18.0000), 27.1492),
+    ((60.2574, -34.0099, 36.2677), (60.4626, -34.1751, 39.4387), 1.2644),
+    ((22.7233, 20.0904, -46.6940), (23.0331, 14.9730, -42.5619), 2.0373),
+    ((90.9257, -0.5406, -0.9208), (88.6381, -0.8985, -0.7239), 1.5381),
+    ((2.0776, 0.0795, -1.1350), (0.9033, -0.0636, -0.5514), 0.9082),
+]
+
+#-------------------------------------------------------------------------
+def test_rgb_to_lab():
+    lab = rgb_to_lab(np.array([[255, 255, 255], [0, 0, 0], [255, 0, 0]]))
+    assert np.allclose(lab, [[100, 0, 0], [0, 0, 0], [53.2408, 80.0925, 67.2032]], atol=1e-3)
+
+@pytest.mark.parametrize("lab1, lab2, expected", SHARMA_PAIRS)
+def test_delta_e_2000(lab1, lab2, expected):
+    lab1, lab2 = np.array(lab1), np.array(lab2)
+    assert delta_e_2000(lab1, lab2) == pytest.approx(expected, abs=1e-4)
+    assert delta_e_2000(lab2, lab1) == pytest.approx(expected, abs=1e-4)
+
+def test_delta_e_76():
+    assert delta_e_76(np.array([50, 0, 0]), np.array([53, 4, 0])) == 5
+
+#-------------------------------------------------------------------------
+def test_lower_bound_and_pruned_search():
+    rng = np.random.default_rng(4)
+    colors = rgb_to_lab(rng.integers(0, 256, (3000, 3)))
+    palette = rgb_to_lab(rng.integers(0, 256, (120, 3)))
+    palette[1] = palette[0]
+    differences = delta_e_2000(colors[:, None, :], palette[None, :, :])
+
+    assert (delta_e_2000_lower_bound(colors, palette) <= differences ** 2 + 1e-9).all()
+    assert np.array_equal(delta_e2000_lab(colors, palette), differences.argmin(axis=1))
@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+import numpy as np
+from PIL import Image
+
+from src.convert_video import TemporalFrameConverter, convert_frames_parallel
+from src.find_closest import Method
+from src.render import render_blocks
+from src.stats import Stats
+from src.utils import get_chunk_medians, get_medians
+
+from tests.conftest import BLOCKS, make_textures
+
+#-------------------------------------------------------------------------
+def make_launch():
+    return SimpleNamespace(
+        textures=make_textures(),
+        method_name="euclidean",
+        method_settings=Method(BLOCKS, compression_level=0),
+        preprocess_image=lambda image: image,
+        get_chunk_colors=get_medians,
+        stats=Stats())
+
+def convert_frame(launch, frame):
+    index_matrix = launch.method_settings.find_closest_blocks(get_chunk_medians(frame), launch.method_name)
+    return render_blocks(index_matrix, launch.textures)
+
+def test_temporal_converter_reuses_unchanged_chunks():
+    launch = make_launch()
+    converter = TemporalFrameConverter(launch, threshold=0)
+
+    first = np.zeros((32, 64, 3), dtype=np.uint8)
+    second = first.copy()
+    second[0:16, 16:32] = (170, 40, 30)
+
+    assert np.array_equal(converter.convert_frame(first), convert_frame(launch, first))
+    assert np.array_equal(converter.convert_frame(second), convert_frame(launch, second))
+    assert converter.chunks_total == 16
+    assert converter.chunks_reused == 7
+    assert converter.reused_fraction == 7 / 16
+    assert launch.stats.to_dict()["reuse"] == {"chunks_total": 16, "chunks_reused": 7, "reused_fraction": 7 / 16}
+
+def test_temporal_converter_threshold_does_not_drift():
+    launch = make_launch()
+    converter = TemporalFrameConverter(launch, threshold=10)
+
+    converter.convert_frame(np.zeros((16, 16, 3), dtype=np.uint8))
+    # Every frame is only a bit brighter than the previous one, but far from the first one
+    for value in range(8, 200, 8):
+        output = converter.convert_frame(np.full((16, 16, 3), value, dtype=np.uint8))
+    assert (output == BLOCKS["white_wool"]["median"]).all()
+
+#-------------------------------------------------------------------------
+def invert(image):
+    return Image.fromarray(255 - np.asarray(image))
+
+def test_parallel_frames_keep_order_and_bound_pending():
+    frames = [np.full((4, 4, 3), value, dtype=np.uint8) for value in range(12)]
+    read = []
+
+    def read_frames():
+        for frame in frames:
+            read.append(frame)
+            yield frame
+
+    for index, converted in enumerate(convert_frames_parallel(read_frames(), invert, workers=2, max_pending=3)):
+        assert (converted == 255 - index).all()
+        # Frame index was read, and at most max_pending - 1 after it
+        assert len(read) <= index + 3
+    assert len(read) == len(frames)
+
+def test_parallel_frames_match_single_process(make_launch):
+    launch = make_launch()
+    launch.share()
+    rng = np.random.default_rng(1)
+    frames = [rng.integers(0, 256, (48, 32, 3), dtype=np.uint8) for _ in range(5)]
+
+    converted = list(convert_frames_parallel(frames, launch.convert_image, workers=2))
+    expected = [np.array(launch.convert_image(Image.fromarray(frame))) for frame in frames]
+    assert all(a.tobytes() == b.tobytes() for a, b in zip(converted, expected)) and len(converted) == len(expected)
+
+def test_parallel_frames_merge_worker_stats(make_launch):
+    launch = make_launch()
+    launch.share()
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (32, 48, 3), dtype=np.uint8) for _ in range(4)]
+
+    list(convert_frames_parallel(frames, launch.convert_image, workers=2,
+        pop_stats=launch.pop_stats_delta, merge_stats=launch.merge_stats_delta))
+
+    result = launch.stats.to_dict(launch.method_settings)
+    assert result["chunks"] == 4 * 6
+    assert result["stages"]["matching"] > 0 and result["stages"]["rendering"] > 0
+    assert result["lut"]["hits"] + result["lut"]["misses"] == 4 * 6
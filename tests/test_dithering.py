@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from src.dithering import get_bayer_matrix, ordered_dither, floyd_steinberg, dither
+from src.find_closest import Method
+
+from tests.conftest import get_blocks
+
+# Pure black and white, so dithered blocks average to the input exactly
+BLOCKS = get_blocks("black_wool", "white_wool")
+BLOCKS["black_wool"]["median"] = [0, 0, 0]
+BLOCKS["white_wool"]["median"] = [255, 255, 255]
+
+def floyd_steinberg_reference(medians, method_settings, method):
+    chunks_x, chunks_y = medians.shape[:2]
+    values = medians.astype(np.float64)
+    index_matrix = np.empty((chunks_x, chunks_y), dtype=np.intp)
+    for y in range(chunks_y):
+        for x in range(chunks_x):
+            value = np.clip(values[x, y], 0, 255)
+            closest = method_settings.find_closest_blocks(value[None], method)[0]
+            index_matrix[x, y] = closest
+            error = value - method_settings.palette[closest]
+            for dx, dy, weight in ((1, 0, 7), (-1, 1, 3), (0, 1, 5), (1, 1, 1)):
+                if 0 <= x + dx < chunks_x and y + dy < chunks_y:
+                    values[x + dx, y + dy] += error * weight / 16
+    return index_matrix
+
+#-------------------------------------------------------------------------
+def test_get_bayer_matrix():
+    matrix = get_bayer_matrix(8)
+    assert matrix.shape == (8, 8)
+    assert sorted(matrix.ravel()) == list(range(64))
+    assert get_bayer_matrix(2).tolist() == [[0, 2], [3, 1]]
+
+def test_ordered_dither_mixes_blocks_on_flat_gray():
+    method_settings = Method(BLOCKS)
+    medians = np.full((16, 16, 3), 128, dtype=np.uint8)
+    index_matrix, errors = dither(medians, method_settings, "euclidean", "ordered")
+    assert errors is None
+    assert 0.4 < index_matrix.mean() < 0.6
+
+    # Strips continue the pattern of rows above them
+    strips = [dither(medians[:, top:top + 5], method_settings, "euclidean", "ordered", top)[0] for top in range(0, 16, 5)]
+    assert np.array_equal(np.concatenate(strips, axis=1), index_matrix)
+    assert np.array_equal(ordered_dither(medians, method_settings.palette)[:, 8:], ordered_dither(medians[:, 8:], method_settings.palette, 8))
+
+#-------------------------------------------------------------------------
+@pytest.mark.parametrize("shape", [(1, 1), (1, 9), (9, 1), (7, 5), (13, 20)])
+def test_floyd_steinberg_matches_sequential_diffusion(shape):
+    method_settings = Method(get_blocks("black_wool", "white_wool", "red_wool", "blue_wool"))
+    rng = np.random.default_rng(2)
+    medians = rng.integers(0, 256, shape + (3,), dtype=np.uint8)
+    index_matrix, _ = floyd_steinberg(medians, method_settings, "euclidean")
+    assert np.array_equal(index_matrix, floyd_steinberg_reference(medians, method_settings, "euclidean"))
+
+def test_floyd_steinberg_keeps_mean_and_continues_across_strips():
+    method_settings = Method(BLOCKS)
+    medians = np.repeat(np.linspace(0, 255, 32).astype(np.uint8)[:, None], 24, axis=1)[..., None].repeat(3, axis=2)
+    index_matrix, _ = dither(medians, method_settings, "euclidean", "floyd_steinberg")
+    assert abs(index_matrix.mean() * 255 - medians.mean()) < 8
+
+    strips, errors = [], None
+    for top in range(0, 24, 7):
+        strip, errors = dither(medians[:, top:top + 7], method_settings, "euclidean", "floyd_steinberg", top, errors)
+        strips.append(strip)
+    assert np.array_equal(np.concatenate(strips, axis=1), index_matrix)
+
+def test_dither_rejects_unknown_name():
+    with pytest.raises(ValueError):
+        dither(np.zeros((1, 1, 3)), Method(BLOCKS), "euclidean", "random")
@@ -0,0 +1,66 @@
+import os
+import socket
+import threading
+
+import pytest
+
+from src.download import ValidBlocksClient, download_nbtdoc
+
+ATLAS = "minecraft:block/stone\tx=0\ty=0\tw=16\th=16\nminecraft:block/dirt\tx=16\ty=0\tw=16\th=16\nminecraft:block/fire\tx=32\ty=0\tw=16\th=16\n"
+NBTDOC = """::minecraft::item::Other describes minecraft:item[
+\tminecraft:fire,
+];
+::minecraft::item::blockitem::BlockItem describes minecraft:item[
+\tminecraft:dirt,
+\tminecraft:stone,
+\tminecraft:oak_log,
+];
+"""
+
+#-------------------------------------------------------------------------
+def make_client(folder, filename, content):
+    atlas = os.path.join(folder, "atlas.txt")
+    with open(atlas, "w") as f:
+        f.write(ATLAS)
+    valid_blocks = os.path.join(folder, filename)
+    with open(valid_blocks, "w") as f:
+        f.write(content)
+    return ValidBlocksClient(atlas, valid_blocks)
+
+def test_nbtdoc_valid_blocks(tmp_path):
+    client = make_client(str(tmp_path), "item.nbtdoc", NBTDOC)
+    assert client._get_valid_blocks_list_from_response() == ["dirt", "stone", "oak_log"]
+    assert client.exclude_invalid_blocks() == {"dirt": {"x": 16, "y": 0}, "stone": {"x": 0, "y": 0}}
+
+def test_plain_list_valid_blocks(tmp_path):
+    client = make_client(str(tmp_path), "blocks.txt", "# comment\nstone\n\nminecraft:dirt\n")
+    assert client._get_valid_blocks_list_from_response() == ["stone", "dirt"]
+    assert list(client.exclude_invalid_blocks()) == ["stone", "dirt"]
+
+#-------------------------------------------------------------------------
+def stalling_server(send_headers):
+    '''Returns link to a local server that accepts one request, optionally sends the start of a response, and then stalls.'''
+    server = socket.create_server(("127.0.0.1", 0))
+    stop = threading.Event()
+
+    def serve():
+        connection, _ = server.accept()
+        connection.recv(65536)
+        if send_headers:
+            connection.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: 100\r\n\r\nabc")
+        stop.wait(10)
+        connection.close()
+        server.close()
+    threading.Thread(target=serve, daemon=True).start()
+    return f"http://127.0.0.1:{server.getsockname()[1]}/item.nbtdoc", stop
+
+@pytest.mark.parametrize("send_headers", [False, True])
+def test_download_nbtdoc_times_out(tmp_path, send_headers):
+    link, stop = stalling_server(send_headers)
+    path = str(tmp_path / "item.nbtdoc")
+    try:
+        with pytest.raises(TimeoutError, match="timed out"):
+            download_nbtdoc(path, link, timeout=0.2)
+    finally:
+        stop.set()
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,147 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageStat
+
+from src.find_closest import Method, METHODS, KERNELS, TEXTURE_METHOD, CLUSTERED_METHODS, get_clusters
+from src.utils import get_chunks_view, get_chunk_medians, get_chunk_signatures, get_signatures
+
+from tests.conftest import BLOCKS
+
+#-------------------------------------------------------------------------
+def test_get_chunks_view_is_not_a_copy():
+    array = np.zeros((48, 40, 3), dtype=np.uint8)
+    chunks = get_chunks_view(array, 16)
+    assert chunks.shape == (2, 3, 16, 16, 3)
+    assert np.shares_memory(chunks, array)
+
+def test_get_chunk_medians_matches_imagestat():
+    rng = np.random.default_rng(0)
+    array = rng.integers(0, 256, (48, 64, 3), dtype=np.uint8)
+    image = Image.fromarray(array)
+    medians = get_chunk_medians(array, 16)
+
+    for x in range(4):
+        for y in range(3):
+            chunk = image.crop((x * 16, y * 16, x * 16 + 16, y * 16 + 16))
+            assert list(medians[x, y]) == ImageStat.Stat(chunk).median
+
+def test_get_chunk_signatures():
+    rng = np.random.default_rng(0)
+    array = rng.integers(0, 256, (48, 64, 3), dtype=np.uint8)
+    signatures = get_chunk_signatures(array, 16)
+    assert signatures.shape == (4, 3, 15)
+
+    chunk = array[16:32, 48:64].astype(np.float64)
+    quarters = [chunk[:8, :8], chunk[:8, 8:], chunk[8:, :8], chunk[8:, 8:]]
+    expected = np.concatenate([quarter.mean(axis=(0, 1)) for quarter in quarters] + [chunk.std(axis=(0, 1))])
+    assert np.allclose(signatures[3, 1], expected, atol=1e-3)
+
+#-------------------------------------------------------------------------
+@pytest.mark.parametrize("method", METHODS)
+def test_find_closest_blocks_matches_single_chunk(method):
+    rng = np.random.default_rng(1)
+    medians = rng.integers(0, 256, (10, 5, 3), dtype=np.uint8)
+    medians[0, 0] = (0, 0, 0)
+
+    settings = Method(BLOCKS, compression_level=0)
+    closest = settings.find_closest_blocks(medians, method)
+    assert closest.shape == (10, 5)
+
+    single_chunk = {
+        "abs_diff": settings.find_closest_block_rgb_abs_diff,
+        "euclidean": settings.find_closest_block_euclidean_distance,
+        "chebyshev_distance": settings.find_closest_block_chebyshev_distance,
+        "manhattan_distance": settings.find_closest_block_manhattan_distance,
+        "cosine_similarity": settings.find_closest_block_cosine_similarity,
+        "hamming_distance": settings.find_closest_block_hamming_distance,
+        "canberra_distance": settings.find_closest_block_canberra_distance,
+        "delta_e76": settings.find_closest_block_delta_e76,
+        "delta_e2000": settings.find_closest_block_delta_e2000,
+    }[method]
+    for x in range(10):
+        for y in range(5):
+            chunk = Image.new("RGB", (16, 16), tuple(int(c) for c in medians[x, y]))
+            assert settings.names[closest[x, y]] == single_chunk(chunk)
+
+def test_find_closest_blocks_exact_color():
+    settings = Method(BLOCKS, compression_level=0)
+    medians = np.array([[160, 39, 34], [233, 236, 236]], dtype=np.uint8)
+    closest = settings.find_closest_blocks(medians, "euclidean")
+    assert [settings.names[i] for i in closest] == ["red_wool", "white_wool"]
+
+#-------------------------------------------------------------------------
+@pytest.mark.parametrize("compression_level, expected_step", [
+    (0, 1),
+    (2, 1),
+    (3, 2),
+    (16, 8),
+    (24, 16)])
+
+def test_lut_step(compression_level, expected_step):
+    settings = Method(BLOCKS, compression_level=compression_level)
+    assert settings.lut_step == expected_step
+    assert settings.lut_nbytes == (256 // expected_step) ** 3 * 2
+
+def test_lut_does_not_depend_on_order():
+    rng = np.random.default_rng(2)
+    medians = rng.integers(0, 256, (500, 3), dtype=np.uint8)
+
+    forward = Method(BLOCKS, compression_level=16).find_closest_blocks(medians, "euclidean")
+    backward = Method(BLOCKS, compression_level=16).find_closest_blocks(medians[::-1], "euclidean")[::-1]
+    built = Method(BLOCKS, compression_level=16)
+    built.build_lut("euclidean")
+    assert np.array_equal(forward, backward)
+    assert np.array_equal(forward, built.find_closest_blocks(medians, "euclidean"))
+
+#-------------------------------------------------------------------------
+@pytest.mark.parametrize("method", ["euclidean", "manhattan_distance", "chebyshev_distance", "cosine_similarity", "delta_e76", "delta_e2000"])
+def test_palette_index_matches_linear_scan(method):
+    rng = np.random.default_rng(3)
+    blocks = dict(BLOCKS)
+    # Duplicated, black and equally distant medians, to check ties
+    blocks["black_concrete"] = {"x": 96, "y": 0, "median": [20, 21, 25]}
+    blocks["void"] = {"x": 112, "y": 0, "median": [0, 0, 0]}
+    blocks["light_gray_wool"] = {"x": 128, "y": 0, "median": [124, 124, 124]}
+    blocks["gray_concrete"] = {"x": 144, "y": 0, "median": [128, 128, 128]}
+    settings = Method(blocks, compression_level=0)
+
+    colors = rng.integers(0, 256, (2000, 3)).astype(np.float64)
+    colors[:50] = rng.integers(0, 256, (50, 1))
+    colors[50] = 0
+    assert np.array_equal(settings.match(colors, method), KERNELS[method](colors, settings.palette))
+
+#-------------------------------------------------------------------------
+def test_texture_method_matches_patterns_that_share_a_median():
+    checkered = np.zeros((16, 16, 3), dtype=np.uint8)
+    checkered[::2, ::2] = checkered[1::2, 1::2] = 255
+    flat = np.full((16, 16, 3), 127, dtype=np.uint8)
+    halves = np.zeros((16, 16, 3), dtype=np.uint8)
+    halves[:, 8:] = 255
+    textures = np.stack([flat, checkered, halves])
+    blocks = {name: {"x": 16 * i, "y": 0, "median": [127, 127, 127]} for i, name in enumerate(["flat", "checkered", "halves"])}
+    settings = Method(blocks, signatures=get_signatures(textures))
+
+    chunks = np.stack([halves, checkered, flat, checkered])
+    assert settings.find_closest_blocks(get_signatures(chunks), TEXTURE_METHOD).tolist() == [2, 1, 0, 1]
+    assert settings.find_closest_block_texture(Image.fromarray(halves)) == "halves"
+    with pytest.raises(ValueError):
+        Method(blocks).find_closest_blocks(get_signatures(chunks), TEXTURE_METHOD)
+
+#-------------------------------------------------------------------------
+def test_get_clusters_is_deterministic():
+    rng = np.random.default_rng(4)
+    points = np.concatenate([rng.normal(center, 3, (20, 3)) for center in (0, 100, 200)])
+    centroids, labels = get_clusters(points, 3)
+    assert len(centroids) == 3
+    assert len(set(labels[:20])) == len(set(labels[20:40])) == len(set(labels[40:])) == 1
+    assert np.array_equal(labels, get_clusters(points, 3)[1])
+
+@pytest.mark.parametrize("method", CLUSTERED_METHODS)
+def test_clusters_probing_every_cluster_match_whole_palette(method):
+    rng = np.random.default_rng(5)
+    colors = rng.integers(0, 256, (500, 3)).astype(np.float64)
+    exact = Method(BLOCKS, compression_level=0).match(colors, method)
+    assert np.array_equal(Method(BLOCKS, compression_level=0, clusters=3, cluster_probes=3).match(colors, method), exact)
+
+    closest = Method(BLOCKS, compression_level=0, clusters=3, cluster_probes=1).match(colors, method)
+    assert ((0 <= closest) & (closest < len(BLOCKS))).all()
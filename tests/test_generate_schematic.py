@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.generate_schematic import create_2d_schematic, write_2d_schematic, get_varint_table, get_varint_lengths, encode_varints
+
+nbtlib = pytest.importorskip("nbtlib")
+mcschematic = pytest.importorskip("mcschematic")
+
+#-------------------------------------------------------------------------
+def test_varints():
+    table = get_varint_table(20000)
+    lengths = get_varint_lengths(20000)
+    ids = np.array([0, 1, 127, 128, 300, 16383, 16384, 19999])
+    expected = bytearray()
+    for number in ids.tolist():
+        while True:
+            byte = number & 127
+            number >>= 7
+            expected.append(byte | 128 if number else byte)
+            if not number:
+                break
+    assert encode_varints(ids, table, lengths) == bytes(expected)
+
+#-------------------------------------------------------------------------
+def create_with_mcschematic(blocks, output_path, bottom_block="black_wool"):
+    schematic = mcschematic.MCSchematic()
+    for y in range(len(blocks)):
+        for x in range(len(blocks[0])):
+            schematic.setBlock((x, 0, y), bottom_block)
+    for y in range(len(blocks)):
+        for x in range(len(blocks[0])):
+            schematic.setBlock((x, 1, y), blocks[y][x])
+    schem_name = os.path.splitext(os.path.basename(output_path))[0]
+    schematic.save(os.path.dirname(output_path), schem_name, mcschematic.Version.JE_1_20_1)
+
+@pytest.mark.parametrize("palette_size", [3, 200])
+def test_same_as_mcschematic(tmp_path, palette_size):
+    rng = np.random.default_rng(0)
+    names = [f"block_{i}" for i in range(palette_size)] + ["black_wool"]
+    index_matrix = rng.integers(0, len(names), (7, 11))
+    blocks = np.array(names, dtype=object)[index_matrix].tolist()
+
+    write_2d_schematic(index_matrix, names, str(tmp_path / "fast.schem"))
+    create_with_mcschematic(blocks, str(tmp_path / "slow.schem"))
+    fast = nbtlib.load(str(tmp_path / "fast.schem"))
+    slow = nbtlib.load(str(tmp_path / "slow.schem"))
+
+    for key in ("Version", "DataVersion", "Height", "Length", "Width", "PaletteMax", "Palette", "BlockData"):
+        assert fast[key] == slow[key]
+
+    create_2d_schematic(blocks, str(tmp_path / "names.schem"))
+    assert nbtlib.load(str(tmp_path / "names.schem"))["BlockData"] == slow["BlockData"]
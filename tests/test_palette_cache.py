@@ -0,0 +1,113 @@
+import os
+import multiprocessing
+
+import numpy as np
+from PIL import Image
+
+from src import palette_cache
+from src.palette_cache import Palette
+
+#-------------------------------------------------------------------------
+def make_palette():
+    names = ["red_wool", "blue_wool", "white_wool"]
+    coordinates = np.array([[0, 0], [16, 0], [0, 16]], dtype=np.int32)
+    medians = np.array([[255, 0, 0], [0, 0, 255], [255, 255, 255]], dtype=np.uint8)
+    textures = np.repeat(medians[:, None, None, :], 16, axis=1).repeat(16, axis=2)
+    return Palette(names, coordinates, medians, textures)
+
+def test_deduplicate_prefers_full_uniform_blocks():
+    names = ["oak_trapdoor", "red_wool", "red_concrete", "blue_wool", "dark_red_wool"]
+    medians = np.array([[200, 0, 0], [201, 1, 0], [200, 0, 2], [0, 0, 255], [150, 0, 0]], dtype=np.uint8)
+    textures = np.repeat(medians[:, None, None, :], 16, axis=1).repeat(16, axis=2)
+    # Noise keeps the median color of red_wool, and makes red_concrete the most uniform block
+    textures[1, ::2] = 0
+    palette = Palette(names, np.zeros((5, 2), dtype=np.int32), medians, textures)
+
+    assert palette.deduplicate(0).names == names
+    assert palette.deduplicate(4).names == ["red_concrete", "blue_wool", "dark_red_wool"]
+    assert palette.deduplicate(1000).names == ["blue_wool"]
+
+def make_atlas(folder):
+    png = os.path.join(folder, "atlas.png")
+    txt = os.path.join(folder, "atlas.txt")
+    Image.new("RGBA", (32, 32), (255, 0, 0, 255)).save(png)
+    with open(txt, "w") as f:
+        f.write("minecraft:block/red_wool\tx=0\ty=0\tw=16\th=16\n")
+    return png, txt
+
+def test_save_and_load_palette(tmp_path):
+    palette = make_palette()
+    palette_cache.save_palette(str(tmp_path), "key", palette)
+    loaded = palette_cache.load_cached_palette(str(tmp_path), "key")
+
+    assert loaded.names == palette.names
+    assert isinstance(loaded.textures, np.memmap)
+    assert np.array_equal(loaded.textures, palette.textures)
+    assert np.array_equal(loaded.signatures, palette.signatures)
+    assert np.array_equal(loaded.signatures[2], [255] * 12 + [0] * 3)
+    assert loaded.to_blocks()["blue_wool"] == {"x": 16, "y": 0, "median": [0, 0, 255]}
+
+def test_invalid_entry_is_not_loaded(tmp_path):
+    palette_cache.save_palette(str(tmp_path), "key", make_palette())
+    assert palette_cache.load_cached_palette(str(tmp_path), "other_key") is None
+
+    os.remove(os.path.join(tmp_path, "key", "textures.npy"))
+    assert palette_cache.load_cached_palette(str(tmp_path), "key") is None
+
+def test_cache_key_changes_with_atlas_and_filter(tmp_path):
+    png, txt = make_atlas(str(tmp_path))
+    key = palette_cache.get_cache_key(png, txt)
+    assert key == palette_cache.get_cache_key(png, txt)
+    assert key != palette_cache.get_cache_key(png, txt, ["red_wool"])
+    assert key != palette_cache.get_cache_key(png, txt, dedupe_tolerance=0)
+    assert palette_cache.get_cache_key(png, txt, ["a", "b"]) == palette_cache.get_cache_key(png, txt, ["b", "a"])
+
+    with open(txt, "a") as f:
+        f.write("minecraft:block/blue_wool\tx=16\ty=0\tw=16\th=16\n")
+    assert key != palette_cache.get_cache_key(png, txt)
+
+def test_filtered_palette_comes_from_cached_palette(tmp_path):
+    cache_folder = os.path.join(tmp_path, "cache")
+    png, txt = make_atlas(str(tmp_path))
+    palette_cache.save_palette(cache_folder, palette_cache.get_cache_key(png, txt), make_palette())
+
+    palette = palette_cache.load_palette(cache_folder, png, txt, ["white_wool", "red_wool", "stone"])
+    assert palette.names == ["red_wool", "white_wool"]
+    assert os.path.exists(os.path.join(cache_folder, palette_cache.get_cache_key(png, txt, ["red_wool", "white_wool", "stone"])))
+
+def test_deduplicated_palette_is_cached(tmp_path):
+    cache_folder = os.path.join(tmp_path, "cache")
+    png, txt = make_atlas(str(tmp_path))
+    palette_cache.save_palette(cache_folder, palette_cache.get_cache_key(png, txt), make_palette())
+    key = palette_cache.get_cache_key(png, txt, dedupe_tolerance=1000)
+    assert key != palette_cache.get_cache_key(png, txt, dedupe_tolerance=0)
+
+    palette = palette_cache.load_palette(cache_folder, png, txt, dedupe_tolerance=1000)
+    assert palette.names == make_palette().deduplicate(1000).names
+    assert isinstance(palette.textures, np.memmap)
+    assert palette_cache.load_cached_palette(cache_folder, key).names == palette.names
+
+def load_names(cache_folder, png, txt, barrier, results):
+    # Every process builds the palette at the same time
+    barrier.wait()
+    try:
+        results.put(palette_cache.load_palette(cache_folder, png, txt).names)
+    except Exception as e:
+        results.put(repr(e))
+
+def test_concurrent_cold_starts_share_one_entry(tmp_path):
+    cache_folder = os.path.join(tmp_path, "cache")
+    png, txt = make_atlas(str(tmp_path))
+    context = multiprocessing.get_context()
+    barrier = context.Barrier(12)
+    results = context.Queue()
+    processes = [context.Process(target=load_names, args=(cache_folder, png, txt, barrier, results)) for _ in range(12)]
+    for process in processes:
+        process.start()
+    names = [results.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join()
+
+    assert names == [["red_wool"]] * 12
+    # Folders of the processes that lost the race are removed
+    assert os.listdir(cache_folder) == [palette_cache.get_cache_key(png, txt)]
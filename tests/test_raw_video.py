@@ -0,0 +1,75 @@
+import tracemalloc
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.raw_video import RawFrameConverter, parse_video_info, get_scaled_size, get_writer_command
+from src.find_closest import Method
+from src.render import render_blocks
+from src.stats import Stats
+from src.utils import get_chunk_medians, get_medians
+
+from tests.conftest import BLOCKS
+
+FFMPEG_OUTPUT = """Input #0, mov,mp4,m4a,3gp,3g2,mj2, from 'in.mp4':
+  Duration: 00:00:04.00, start: 0.000000, bitrate: 200 kb/s
+  Stream #0:0[0x1](und): Video: h264 (High) (avc1 / 0x31637661), yuv420p(progressive), 1280x720 [SAR 1:1 DAR 16:9], 120 kb/s, 29.97 fps, 29.97 tbr, 15360 tbn (default)
+  Stream #0:1[0x2](und): Audio: aac (LC) (mp4a / 0x6134706D), 44100 Hz, mono, fltp, 69 kb/s (default)
+At least one output file must be specified"""
+
+#-------------------------------------------------------------------------
+def test_parse_video_info():
+    assert parse_video_info(FFMPEG_OUTPUT) == (1280, 720, 29.97, True)
+    assert parse_video_info(FFMPEG_OUTPUT.replace("Audio", "Data"))[3] is False
+    with pytest.raises(ValueError):
+        parse_video_info("in.mp4: Invalid data found when processing input")
+
+def test_get_scaled_size():
+    assert get_scaled_size(1280, 720) == (1280, 720)
+    assert get_scaled_size(1280, 720, 0.5) == (640, 360)
+    assert get_scaled_size(1280, 720, -3) == (426, 240)
+    assert "pad=ceil(iw/2)*2:ceil(ih/2)*2" in get_writer_command("ffmpeg", "out.mp4", (15, 9), 30.0)
+
+#-------------------------------------------------------------------------
+def make_launch(**settings):
+    rng = np.random.default_rng(0)
+    launch = SimpleNamespace(
+        textures=rng.integers(0, 256, (len(BLOCKS), 16, 16, 3), dtype=np.uint8),
+        method_name="euclidean",
+        method_settings=Method(BLOCKS, compression_level=0),
+        get_chunk_colors=get_medians,
+        target_blocks=None,
+        dithering="none",
+        stats=Stats())
+    launch.__dict__.update(settings)
+    return launch
+
+@pytest.mark.parametrize("dithering", ["none", "ordered"])
+def test_raw_frame_converter_matches_convert_image(dithering):
+    launch = make_launch(dithering=dithering)
+    converter = RawFrameConverter(launch, 64, 48)
+    rng = np.random.default_rng(1)
+    for _ in range(2):
+        converter.frame[:] = rng.integers(0, 256, (48, 64, 3), dtype=np.uint8)
+        medians = get_chunk_medians(converter.frame)
+        if dithering == "ordered":
+            from src.dithering import dither
+            expected, _ = dither(medians, launch.method_settings, "euclidean", "ordered")
+        else:
+            expected = launch.method_settings.find_closest_blocks(medians, "euclidean")
+        assert np.array_equal(converter.convert(), render_blocks(expected, launch.textures))
+    assert launch.stats.chunks == 24
+
+def test_raw_frame_converter_does_not_allocate_when_warm():
+    launch = make_launch()
+    converter = RawFrameConverter(launch, 640, 480)
+    converter.frame[:] = np.random.default_rng(2).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+    converter.convert()
+
+    tracemalloc.start()
+    converter.convert()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # A single copy of the frame would be 900 KB
+    assert peak < 16 * 1024
@@ -0,0 +1,30 @@
+import numpy as np
+from PIL import Image
+
+from src.render import get_block_textures, render_blocks
+
+#-------------------------------------------------------------------------
+def test_get_block_textures(atlas, blocks):
+    textures = get_block_textures(atlas, blocks, ["white_wool", "red_wool"])
+    assert textures.shape == (2, 16, 16, 3)
+    assert (textures[0] == blocks["white_wool"]["median"]).all()
+    assert (textures[1] == blocks["red_wool"]["median"]).all()
+
+def test_render_blocks_matches_paste(atlas, blocks):
+    names = list(blocks)
+    textures = get_block_textures(atlas, blocks, names)
+    index_matrix = np.array([[0, 1], [2, 5], [4, 3]])
+
+    expected = Image.new("RGB", (3 * 16, 2 * 16))
+    for x in range(3):
+        for y in range(2):
+            block = blocks[names[index_matrix[x, y]]]
+            expected.paste(atlas.crop((block["x"], block["y"], block["x"] + 16, block["y"] + 16)), (x * 16, y * 16))
+
+    assert np.array_equal(render_blocks(index_matrix, textures), np.asarray(expected))
+
+def test_render_blocks_in_threads_matches_serial():
+    rng = np.random.default_rng(0)
+    textures = rng.integers(0, 256, (5, 16, 16, 3), dtype=np.uint8)
+    index_matrix = rng.integers(0, 5, (7, 23))
+    assert np.array_equal(render_blocks(index_matrix, textures, threads=4), render_blocks(index_matrix, textures))
@@ -0,0 +1,48 @@
+import os
+import gc
+from multiprocessing.reduction import ForkingPickler
+
+import numpy as np
+
+from src.shared import create_shared_array
+from src.find_closest import Method
+
+from tests.conftest import BLOCKS
+
+#-------------------------------------------------------------------------
+def test_shared_array_is_sent_by_file():
+    array = create_shared_array((1000,), np.uint16)
+    attached = ForkingPickler.loads(ForkingPickler.dumps(array))
+    assert len(ForkingPickler.dumps(array)) < array.nbytes
+    attached[5] = 7
+    assert array[5] == 7
+
+    # Parts of a mapping are copied
+    part = ForkingPickler.loads(ForkingPickler.dumps(array[:10]))
+    part[5] = 8
+    assert array[5] == 7
+
+    filename = array.filename
+    del array, attached, part
+    gc.collect()
+    assert not os.path.exists(filename)
+
+def test_cached_palette_is_sent_by_file(tmp_path):
+    np.save(tmp_path / "textures.npy", np.arange(4096, dtype=np.uint8))
+    textures = np.load(tmp_path / "textures.npy", mmap_mode="r")
+    attached = ForkingPickler.loads(ForkingPickler.dumps(textures))
+    assert isinstance(attached, np.memmap) and not attached.flags.writeable
+    assert np.array_equal(attached, textures)
+
+def test_share_luts_keeps_cells_and_fills_one_table():
+    settings = Method(BLOCKS, compression_level=0)
+    medians = np.array([[0, 0, 0], [250, 250, 250]])
+    expected = settings.find_closest_blocks(medians, "euclidean")
+    settings.share_luts(["euclidean"])
+    assert settings.lut_hits == 0 and np.array_equal(settings.find_closest_blocks(medians, "euclidean"), expected)
+    assert settings.lut_hits == 2
+
+    worker = ForkingPickler.loads(ForkingPickler.dumps(settings))
+    worker.find_closest_blocks(np.array([[160, 39, 34]]), "euclidean")
+    assert settings.find_closest_blocks(np.array([[160, 39, 34]]), "euclidean") == 2
+    assert settings.lut_misses == 2
@@ -0,0 +1,13 @@
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#-------------------------------------------------------------------------
+def test_main_imports_no_heavy_modules():
+    # Video, k-d tree, network and progress bar modules are only imported by the code paths that use them
+    code = "import sys; sys.argv = ['main.py']; import main; print(' '.join(sorted(sys.modules)))"
+    modules = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True).stdout.split()
+    for heavy in ("moviepy", "scipy", "requests", "tqdm"):
+        assert heavy not in modules
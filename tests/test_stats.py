@@ -0,0 +1,78 @@
+import json
+import pickle
+
+import numpy as np
+
+from src.find_closest import Method
+from src.stats import Stats, format_stats
+
+from tests.conftest import get_blocks
+
+BLOCKS = get_blocks("black_wool", "white_wool")
+
+#-------------------------------------------------------------------------
+def test_stages_add_up():
+    reported = []
+    stats = Stats(on_convert=reported.append)
+    for _ in range(2):
+        with stats.stage("matching"):
+            pass
+    with stats.stage("decode"):
+        pass
+    stats.chunks += 5
+
+    result = stats.to_dict()
+    assert list(result["stages"]) == ["decode", "matching"]
+    assert result["total_seconds"] == sum(result["stages"].values())
+    assert result["chunks"] == 5
+    assert json.loads(format_stats(result, "json")) == result
+    assert "5 chunks" in format_stats(result)
+
+    assert "reuse" not in result
+
+    stats.reset()
+    assert stats.to_dict()["stages"] == {}
+
+def test_stats_can_be_sent_to_workers():
+    stats = Stats()
+    with stats.stage("decode"):
+        pass
+    copy = pickle.loads(pickle.dumps(stats))
+    with copy.stage("decode"):
+        pass
+    assert copy.stages["decode"] >= stats.stages["decode"]
+
+#-------------------------------------------------------------------------
+def test_lut_counters():
+    method_settings = Method(BLOCKS, compression_level=16)
+    medians = np.array([[10, 10, 10], [12, 12, 12], [250, 250, 250]])
+    method_settings.find_closest_blocks(medians, "euclidean")
+    method_settings.find_closest_blocks(medians, "euclidean")
+
+    lut = Stats().to_dict(method_settings)["lut"]
+    # Both dark colors share one cell, so only the first lookup of each cell is a miss
+    assert lut["misses"] == 3 and lut["hits"] == 3
+    assert lut["entries"] == 2
+    assert lut["hit_rate"] == 0.5
+    assert lut["bytes"] == method_settings.lut_nbytes
+
+def test_worker_deltas_are_merged():
+    worker_stats, worker_method = Stats(), Method(BLOCKS, compression_level=16)
+    with worker_stats.stage("matching"):
+        worker_method.find_closest_blocks(np.array([[10, 10, 10], [12, 12, 12]]), "euclidean")
+    worker_stats.chunks += 2
+    worker_stats.conversions += 1
+    worker_stats.chunks_total, worker_stats.chunks_reused = 4, 1
+    delta = worker_stats.pop_delta(worker_method)
+    assert worker_stats.chunks == 0 and worker_method.lut_misses == 0
+
+    stats, method_settings = Stats(), Method(BLOCKS, compression_level=16)
+    stats.chunks = 1
+    stats.merge(pickle.loads(pickle.dumps(delta)), method_settings)
+    stats.merge(delta, method_settings)
+    result = stats.to_dict(method_settings)
+    assert result["chunks"] == 5 and result["conversions"] == 2
+    assert result["lut"]["hits"] == 0 and result["lut"]["misses"] == 4 and result["lut"]["entries"] == 2
+    assert result["stages"]["matching"] == 2 * delta["stages"]["matching"]
+    assert result["reuse"] == {"chunks_total": 8, "chunks_reused": 2, "reused_fraction": 0.25}
+    assert "Reused 2 of 8 video chunks (25.0%)" in format_stats(result)
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.streaming import StripReader, open_strip_writer
+
+#-------------------------------------------------------------------------
+@pytest.fixture
+def image_array():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, (40, 24, 3), dtype=np.uint8)
+
+@pytest.mark.parametrize("filename", ["image.png", "image.ppm", "image.npy", "image.tif"])
+def test_strip_reader(tmp_path, image_array, filename):
+    path = str(tmp_path / filename)
+    if filename.endswith(".npy"):
+        np.save(path, image_array)
+    else:
+        Image.fromarray(image_array).save(path)
+
+    with StripReader(path) as reader:
+        assert reader.size == (24, 40)
+        strips = [reader.read(top, min(top + 16, 40)) for top in range(0, 40, 16)]
+    assert np.array_equal(np.vstack(strips), image_array)
+
+def test_strip_reader_gray(tmp_path, image_array):
+    path = str(tmp_path / "image.pgm")
+    Image.fromarray(image_array).convert("L").save(path)
+    with StripReader(path) as reader:
+        assert np.array_equal(reader.read(0, 40), np.asarray(Image.open(path).convert("RGB")))
+
+def test_strip_reader_above_pixel_limit(tmp_path):
+    path = str(tmp_path / "huge.ppm")
+    width, height = 20000, 10000
+    header = f"P6\n{width} {height}\n255\n".encode()
+    # Sparse file, only the last pixel is written
+    with open(path, "wb") as f:
+        f.write(header)
+        f.seek(len(header) + width * height * 3 - 3)
+        f.write(bytes([1, 2, 3]))
+    assert width * height > Image.MAX_IMAGE_PIXELS
+
+    with StripReader(path) as reader:
+        assert reader.size == (width, height)
+        assert not reader.read(0, 16).any()
+        assert reader.read(height - 1, height)[0, -1].tolist() == [1, 2, 3]
+    assert Image.MAX_IMAGE_PIXELS is not None
+
+#-------------------------------------------------------------------------
+@pytest.mark.parametrize("filename", ["output.png", "output.npy"])
+def test_strip_writer(tmp_path, image_array, filename):
+    path = str(tmp_path / filename)
+    with open_strip_writer(path, 24, 40) as writer:
+        for top in range(0, 40, 16):
+            writer.write(image_array[top:top + 16])
+
+    written = np.load(path) if filename.endswith(".npy") else np.asarray(Image.open(path))
+    assert np.array_equal(written, image_array)
+
+def test_strip_writer_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        open_strip_writer(str(tmp_path / "output.jpg"), 16, 16)
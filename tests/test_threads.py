@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from src.threads import get_bands, get_threads_count, thread_map
+from src.find_closest import Method, METHODS, CLUSTERED_METHODS
+
+from tests.conftest import BLOCKS
+
+#-------------------------------------------------------------------------
+def test_get_bands_cover_all_rows():
+    assert get_bands(10, 3, min_rows=1) == [(0, 3), (3, 6), (6, 10)]
+    assert get_bands(10, 8, min_rows=4) == [(0, 5), (5, 10)]
+    assert get_bands(3, 8, min_rows=4) == [(0, 3)]
+    assert get_bands(0, 4) == [(0, 0)]
+
+def test_get_threads_count():
+    assert get_threads_count(3) == 3
+    assert get_threads_count(0) >= 1
+    assert get_threads_count(0, workers=4) == 1
+
+def test_thread_map_keeps_order():
+    assert thread_map(lambda x: x * x, list(range(20)), 4) == [x * x for x in range(20)]
+
+#-------------------------------------------------------------------------
+@pytest.mark.parametrize("method", METHODS)
+def test_lookup_table_filled_in_threads_matches_serial(method):
+    colors = np.random.default_rng(0).integers(0, 256, (3000, 3), dtype=np.uint8)
+    threaded = Method(BLOCKS, compression_level=0, clusters=2 if method in CLUSTERED_METHODS else 0)
+    threaded.threads = 4
+    serial = Method(BLOCKS, compression_level=0, clusters=threaded.clusters)
+    assert np.array_equal(threaded.find_closest_blocks(colors, method), serial.find_closest_blocks(colors, method))
+    assert threaded.lut_entries == serial.lut_entries
@@ -2,10 +2,11 @@ import sys
 import shutil
 import tempfile
 
+import numpy as np
 import pytest
 from PIL import Image
 
-from src.utils import crop_to_make_divisible, resize_image, has_transparency, get_execution_folder
+from src.utils import crop_to_make_divisible, resize_image, has_transparency, get_execution_folder, get_chunks_view, get_chunk_signatures, reduce_area, get_area_means, get_area_signatures, get_preview_textures
 
 #-------------------------------------------------------------------------
 @pytest.mark.parametrize("input_size, divisible_by, expected_size", [
@@ -94,4 +95,35 @@ def test_get_execution_folder_not_frozen_no_argv():
     finally:
         # Clean up: restore the original sys.argv and remove the temporary directory
         sys.argv = original_argv
-        shutil.rmtree(temp_dir)
\ No newline at end of file
+        shutil.rmtree(temp_dir)
+#-------------------------------------------------------------------------
+def test_reduce_area_counts_fractions_of_edge_pixels():
+    array = np.array([1, 2, 3, 4, 5], dtype=np.uint8)
+    assert np.allclose(reduce_area(array, 2), [1 + 2 + 3 * 0.5, 3 * 0.5 + 4 + 5])
+    assert np.allclose(reduce_area(array, 5), array)
+    assert np.allclose(reduce_area(array, 2, square=True), [1 + 4 + 9 * 0.5, 9 * 0.5 + 16 + 25])
+    # Spans shorter than a pixel, when upscaling
+    assert np.allclose(reduce_area(array, 10), array.repeat(2) / 2)
+    assert np.allclose(reduce_area(array, 7)[:2], [5 / 7, 2 / 7 + 2 * 3 / 7])
+    assert np.allclose(reduce_area(array, 10, square=True), (array.astype(np.float64) ** 2).repeat(2) / 2)
+    with pytest.raises(ValueError):
+        reduce_area(array, 0)
+
+def test_get_area_means():
+    rng = np.random.default_rng(0)
+    array = rng.integers(0, 256, (48, 64, 3), dtype=np.uint8)
+    # Whole chunks are plain means, and fractional areas are the same as in a 3 times bigger image
+    assert np.allclose(get_area_means(array, 4, 3), get_chunks_view(array, 16).mean(axis=(2, 3)))
+    upscaled = array.repeat(3, axis=0).repeat(3, axis=1)
+    assert np.allclose(get_area_means(array, 7, 5), get_area_means(upscaled, 7, 5))
+    assert np.allclose(get_area_signatures(array, 4, 3), get_chunk_signatures(array, 16), atol=1e-3)
+    squares = array.astype(np.float64) ** 2
+    assert np.allclose(get_area_means(array, 7, 5, square=True), get_area_means(squares, 7, 5))
+    assert np.allclose(get_area_signatures(array, 7, 5), get_area_signatures(upscaled, 7, 5), atol=1e-3)
+
+def test_get_preview_textures():
+    rng = np.random.default_rng(1)
+    textures = rng.integers(0, 256, (5, 16, 16, 3), dtype=np.uint8)
+    assert get_preview_textures(textures, 16) is textures
+    assert np.array_equal(get_preview_textures(textures, 1)[:, 0, 0], np.round(textures.mean(axis=(1, 2))))
+    assert get_preview_textures(textures, 5).shape == (5, 5, 5, 3)